@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from datetime import datetime
+from metrics import metrics
+
+# How long alerts of one type are collected before they're posted together.
+# 0 disables coalescing and passes every event straight through.
+COALESCE_WINDOW_MS = int(os.environ.get("COALESCE_WINDOW_MS", 0))
+# A batch holding this many alerts is posted right away
+COALESCE_MAX_BATCH = int(os.environ.get("COALESCE_MAX_BATCH", 200))
+
+# Merges events of the same alertTypeId arriving within a short window into
+# one event, so a barrage delivered as many small events becomes a single
+# post instead of one post per event. Sits in front of a PostQueue and
+# exposes the same put() interface.
+class AlertCoalescer:
+    def __init__(self, postQueue, windowMs=COALESCE_WINDOW_MS, maxBatch=COALESCE_MAX_BATCH):
+        self.postQueue = postQueue
+        # Ingest checks this to know whether put() may block
+        self.overflowPolicy = postQueue.overflowPolicy
+        self.window = windowMs / 1000
+        self.maxBatch = maxBatch
+        self.lock = threading.Lock()
+        self.batches = {}
+
+    def put(self, eventData):
+        if self.window <= 0:
+            self.postQueue.put(eventData)
+            return
+
+        if not isinstance(eventData, dict) or "alertTypeId" not in eventData or "alerts" not in eventData:
+            # Nothing to merge it by; the posting side reports what's wrong
+            # with it, as it would without coalescing
+            metrics.increment("coalescer.malformed")
+            self.postQueue.put(eventData)
+            return
+
+        alerts = eventData["alerts"]
+        if not isinstance(alerts, list):
+            alerts = [alerts]
+        alertTypeId = eventData["alertTypeId"]
+
+        with self.lock:
+            batch = self.batches.get(alertTypeId)
+            if batch is None:
+                timer = threading.Timer(self.window, self.flush, args=(alertTypeId,))
+                timer.daemon = True
+                batch = {"alerts": [], "events": 0, "outboxIds": [], "openedAt": time.monotonic(), "timer": timer}
+                self.batches[alertTypeId] = batch
+                timer.start()
+            batch["alerts"].extend(alerts)
+            batch["events"] += 1
+            batch["outboxIds"].extend(eventData.get("outboxIds", ()))
+            full = len(batch["alerts"]) >= self.maxBatch
+
+        if full:
+            self.flush(alertTypeId)
+
+    # Posts whatever was collected for the alert type
+    def flush(self, alertTypeId):
+        with self.lock:
+            batch = self.batches.pop(alertTypeId, None)
+        if batch is None:
+            return
+        batch["timer"].cancel()
+
+        metrics.increment("coalescer.batches")
+        metrics.increment("coalescer.events", batch["events"])
+        if batch["events"] > 1:
+            print(f"{datetime.now()} - Coalesced {batch['events']} events "
+                  f"({len(batch['alerts'])} alerts) of type {alertTypeId}", flush=True)
+        coalesced = {"alertTypeId": alertTypeId, "alerts": batch["alerts"]}
+        if batch["outboxIds"]:
+            coalesced["outboxIds"] = batch["outboxIds"]
+        self.postQueue.put(coalesced)
+
+    def flushAll(self):
+        with self.lock:
+            alertTypeIds = list(self.batches)
+        for alertTypeId in alertTypeIds:
+            self.flush(alertTypeId)
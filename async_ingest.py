@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from post_queue import OVERFLOW_BLOCK
+
+# Returned by the reader thread once the event stream is exhausted
+STREAM_END = object()
+
+# Events are handed to the shared PostQueue, whose workers post them, the
+# same as in sync mode
+class AsyncIngest:
+    def __init__(self, api, postQueue, onKeepAlive=None):
+        self.api = api
+        self.postQueue = postQueue
+        self.onKeepAlive = onKeepAlive
+        # The SSE socket is read on its own thread so that its blocking reads
+        # stay off the event loop
+        self.readerExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sse-reader")
+
+    async def run(self):
+        try:
+            await self.readEvents()
+        finally:
+            self.readerExecutor.shutdown(wait=False)
+
+    # Reader coroutine: pulls events off the stream and queues each one for
+    # posting without waiting for it to be posted
+    async def readEvents(self):
+        loop = asyncio.get_running_loop()
+        events = self.api.streamEvents()
+        while True:
+            eventData = await loop.run_in_executor(self.readerExecutor, next, events, STREAM_END)
+            if eventData is STREAM_END:
+                print(f"{datetime.now()} - Event stream ended.")
+                return
+            await self.dispatch(eventData)
+
+    async def dispatch(self, eventData):
+        if eventData is None:
+            print(f"{datetime.now()} - Event is None.")
+            return
+        if self.api.isKeepAlive(eventData):
+            print(f"{datetime.now()} - DEBUG: Received Keep alive")
+            if self.onKeepAlive is not None:
+                self.onKeepAlive()
+            return
+
+        try:
+            if self.postQueue.overflowPolicy == OVERFLOW_BLOCK:
+                # A full queue may block; wait for it off the event loop
+                await asyncio.to_thread(self.postQueue.put, eventData)
+            else:
+                self.postQueue.put(eventData)
+        except Exception as e:
+            # A bad event mustn't end the stream
+            print(f"{datetime.now()} - Error queueing event: {e}", flush=True)
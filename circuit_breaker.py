@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from datetime import datetime
+from metrics import metrics
+
+# Consecutive failed posts that open a sink's breaker
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", 3))
+# Seconds an open breaker waits before probing the sink again
+BREAKER_RESET_TIMEOUT_SEC = float(os.environ.get("BREAKER_RESET_TIMEOUT_SEC", 30))
+# Events parked per sink while its breaker is open
+BREAKER_RETRY_QUEUE_SIZE = int(os.environ.get("BREAKER_RETRY_QUEUE_SIZE", 500))
+
+# Breaker states:
+#   closed    - posts go through
+#   open      - the sink is failing; posts fail fast without calling it
+#   half-open - a single probe post is allowed through to test the sink
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Tracks one sink's health. Callers ask allowRequest() before posting and
+# report the outcome with record(); the breaker opens after
+# failureThreshold consecutive failures, and once resetTimeout has passed
+# lets a single probe through, closing again if it succeeds.
+class CircuitBreaker:
+    def __init__(self, name, failureThreshold=BREAKER_FAILURE_THRESHOLD, resetTimeout=BREAKER_RESET_TIMEOUT_SEC, clock=time.monotonic):
+        self.name = name
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.openedAt = None
+        self.probing = False
+        metrics.setGauge(f"breaker.{name}.state", CLOSED)
+
+    # True when a post may go out now. In half-open state only one post at a
+    # time is let through, as the probe.
+    def allowRequest(self):
+        with self.lock:
+            if self.state == OPEN and self.clock() - self.openedAt >= self.resetTimeout:
+                self.transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    # Reports a post's outcome. Returns True if it opened the breaker.
+    def record(self, succeeded):
+        with self.lock:
+            self.probing = False
+            if succeeded:
+                self.failures = 0
+                if self.state != CLOSED:
+                    self.transition(CLOSED)
+                return False
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failureThreshold):
+                self.openedAt = self.clock()
+                self.transition(OPEN)
+                return True
+            return False
+
+    # Reports a post that was put aside before it reached the sink, e.g. to
+    # wait out a rate limit. The state is unchanged; a probe slot is freed.
+    def abandon(self):
+        with self.lock:
+            self.probing = False
+
+    # Seconds until an open breaker lets a probe through
+    def retryIn(self):
+        with self.lock:
+            if self.state != OPEN:
+                return 0
+            return max(self.resetTimeout - (self.clock() - self.openedAt), 0)
+
+    # Caller holds the lock
+    def transition(self, state):
+        print(f"{datetime.now()} - {self.name} breaker {self.state} -> {state}", flush=True)
+        self.state = state
+        metrics.setGauge(f"breaker.{self.name}.state", state)
+        metrics.increment(f"breaker.{self.name}.{state.replace('-', '_')}")
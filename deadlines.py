@@ -0,0 +1,62 @@
+import heapq
+import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Alert timestamps are local time in Israel
+ALERT_TIMEZONE = ZoneInfo(os.environ.get("ALERT_TIMEZONE", "Asia/Jerusalem"))
+ALERT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# How long after its countdown ran out an alert is still worth posting
+DEADLINE_GRACE_SEC = float(os.environ.get("DEADLINE_GRACE_SEC", 60))
+
+# What a sink does with an event that missed its deadline, configured per
+# sink with DEADLINE_POLICY_<SINK> (e.g. DEADLINE_POLICY_MASTODON=drop):
+#   send      - post it in full anyway
+#   summarize - post a one-line summary instead of every location
+#   drop      - don't post it
+POLICY_SEND = "send"
+POLICY_SUMMARIZE = "summarize"
+POLICY_DROP = "drop"
+DEADLINE_POLICIES = (POLICY_SEND, POLICY_SUMMARIZE, POLICY_DROP)
+DEFAULT_DEADLINE_POLICY = POLICY_SUMMARIZE
+
+# Epoch seconds after which the alert is no longer useful: its timestamp plus
+# its countdown plus the grace period. None when it has no usable timestamp.
+def alertDeadline(alert, grace=DEADLINE_GRACE_SEC):
+    try:
+        issued = datetime.strptime(alert["timeStamp"], ALERT_TIMESTAMP_FORMAT).replace(tzinfo=ALERT_TIMEZONE)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return issued.timestamp() + float(alert.get("countdownSec") or 0) + grace
+
+# An event is useful for as long as any of its alerts is
+def eventDeadline(eventData, grace=DEADLINE_GRACE_SEC):
+    alerts = eventData.get("alerts")
+    if not isinstance(alerts, list):
+        alerts = [alerts]
+    deadlines = [deadline for deadline in (alertDeadline(alert, grace) for alert in alerts if isinstance(alert, dict)) if deadline is not None]
+    return max(deadlines) if deadlines else None
+
+def isExpired(deadline, now=None):
+    return deadline is not None and (time.time() if now is None else now) > deadline
+
+# Sort key putting the earliest deadline first and events without one last
+def deadlineKey(deadline):
+    return float("inf") if deadline is None else deadline
+
+# Removes and returns the entry to give up when a heap of (deadline key,
+# arrival sequence, ...) entries is full: one already past its deadline if
+# there is any, else the one that arrived first. The earliest deadline
+# alone would pick the freshest alert with the shortest countdown.
+def popOverflow(heap, now=None):
+    if isExpired(heap[0][0], now):
+        return heapq.heappop(heap)
+    index = min(range(len(heap)), key=lambda position: heap[position][1])
+    entry = heap.pop(index)
+    heapq.heapify(heap)
+    return entry
+
+def deadlinePolicy(sinkName):
+    policy = os.environ.get(f"DEADLINE_POLICY_{sinkName.upper()}", DEFAULT_DEADLINE_POLICY).strip().lower()
+    return policy if policy in DEADLINE_POLICIES else DEFAULT_DEADLINE_POLICY
@@ -0,0 +1,65 @@
+import os
+import statistics
+import time
+from collections import deque
+
+# How many standard deviations past the expected keepalive we wait before
+# declaring the stream dead
+WATCHDOG_SIGMAS = float(os.environ.get("WATCHDOG_SIGMAS", 4))
+# Jitter assumed when keepalives arrive almost perfectly on time, so a
+# near-zero standard deviation doesn't make the deadline hair-trigger
+WATCHDOG_MIN_JITTER = float(os.environ.get("WATCHDOG_MIN_JITTER", 2))
+# Keepalive intervals needed before the learned deadline is trusted
+WATCHDOG_MIN_SAMPLES = 3
+# Number of recent keepalive intervals the cadence is learned from
+WATCHDOG_WINDOW = 20
+
+# Learns the server's keepalive cadence and jitter from KEEP_ALIVE arrivals
+# and tells how long the stream may stay silent before it must be
+# considered dead. Until enough keepalives were seen it falls back to the
+# fixed READ_TIMEOUT.
+class KeepAliveWatchdog:
+    def __init__(self, maxTimeout=None, sigmas=WATCHDOG_SIGMAS, minJitter=WATCHDOG_MIN_JITTER,
+                 minSamples=WATCHDOG_MIN_SAMPLES, window=WATCHDOG_WINDOW):
+        if maxTimeout is None:
+            maxTimeout = int(os.environ.get('READ_TIMEOUT', 120))
+        self.maxTimeout = maxTimeout
+        self.sigmas = sigmas
+        self.minJitter = minJitter
+        self.minSamples = minSamples
+        self.intervals = deque(maxlen=window)
+        self.lastKeepAlive = None
+        self.deadlineBase = time.monotonic()
+
+    # A new connection counts as fresh proof of life, but the gap since the
+    # previous connection's keepalive is not a keepalive interval
+    def connected(self, now=None):
+        self.lastKeepAlive = None
+        self.deadlineBase = time.monotonic() if now is None else now
+
+    def recordKeepAlive(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.lastKeepAlive is not None:
+            self.intervals.append(now - self.lastKeepAlive)
+        self.lastKeepAlive = now
+        self.deadlineBase = now
+
+    # Longest silence tolerated after a keepalive
+    def timeout(self):
+        if len(self.intervals) < self.minSamples:
+            return self.maxTimeout
+        mean = statistics.fmean(self.intervals)
+        jitter = max(statistics.pstdev(self.intervals), self.minJitter)
+        return min(self.maxTimeout, mean + self.sigmas * jitter)
+
+    def deadline(self):
+        return self.deadlineBase + self.timeout()
+
+    # Seconds left before the next keepalive is overdue (never below zero)
+    def remaining(self, now=None):
+        now = time.monotonic() if now is None else now
+        return max(self.deadline() - now, 0)
+
+    def isOverdue(self, now=None):
+        now = time.monotonic() if now is None else now
+        return now >= self.deadline()
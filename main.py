@@ -1,18 +1,26 @@
-import requests
-import json
+import asyncio
 import os
 import signal
 import sys
-import time
+import threading
 import faulthandler
 from datetime import datetime
 from pathlib import Path
-from rocket_alert_api import RocketAlertAPI
 from message_manager import MessageManager
+from async_ingest import AsyncIngest
+from upstream_racer import createUpstream
+from post_queue import PostQueue, PostingWorkers
+from alert_coalescer import AlertCoalescer
+from outbox import OUTBOX_PATH, Outbox, OutboxRecorder
+from metrics import metrics
 
 # Heartbeat file for K8s liveness probe
 HEARTBEAT_FILE = Path("/tmp/heartbeat")
 
+# "sync" reads the stream on the main thread, "async" reads it on its own
+# coroutine; both hand events to the posting workers
+INGEST_MODE = os.getenv("INGEST_MODE", "sync").strip().lower()
+
 ##TODO: Use a normal logging library. This is total שכונה
 
 def dump_traceback(sig, frame):
@@ -20,57 +28,59 @@ def dump_traceback(sig, frame):
     faulthandler.dump_traceback()
 
 
+def writeHeartbeat():
+    # Write heartbeat file for K8s liveness probe
+    HEARTBEAT_FILE.write_text(str(datetime.now().timestamp()))
+    metrics.writeToFile()
+
+
+# Reads the stream on the main thread and hands events to the posting
+# workers, so ingest never waits on a sink
+def runSync(api, postQueue):
+    for eventData in api.streamEvents():
+        if eventData is None:
+            print(f"{datetime.now()} - Event is None.")
+        elif api.isKeepAlive(eventData):
+            print(f"{datetime.now()} - DEBUG: Received Keep alive")
+            writeHeartbeat()
+        else:
+            try:
+                postQueue.put(eventData)
+            except Exception as e:
+                # A bad event mustn't end the stream
+                print(f"{datetime.now()} - Error queueing event: {e}", flush=True)
+
+
 def main():
     faulthandler.enable()
     signal.signal(signal.SIGUSR1, dump_traceback)
 
     commit_sha = os.getenv("COMMIT_SHA", "unknown")
     print(f"{datetime.now()} - Starting version: {commit_sha} - Connecting to server and starting listening to events...", flush=True)
-    messageManager = MessageManager()
-
-    while True:
-        try:
-            print("DEBUG: Calling listenToServerEvents...", flush=True)
-            with RocketAlertAPI().listenToServerEvents() as response:
-                print("DEBUG: Connection established. Listening for events...", flush=True)
-                response.encoding = "utf-8"
-                for line in response.iter_lines(decode_unicode=True):
-                    line = line.lstrip("data:")
-                    if line.strip():
-                        print(f"{datetime.now()} - Received server event: {line}")
-                        eventData = json.loads(line)
-                        alerts = eventData["alerts"]
-                        if "KEEP_ALIVE" in alerts[0].get("name", ""):
-                            print(f"{datetime.now()} - DEBUG: Received Keep alive")
-                            # Write heartbeat file for K8s liveness probe
-                            HEARTBEAT_FILE.write_text(str(datetime.now().timestamp()))
-                        elif eventData is None:
-                            print(f"{datetime.now()} - Event is None.")
-                        else:
-                            print(f"{datetime.now()} - Processing event...")
-                            messageManager.postMessage(eventData)
-                            print(f"{datetime.now()} - Event process completed.\n")
+    outbox = Outbox() if OUTBOX_PATH else None
+    messageManager = MessageManager(outbox)
+    api = createUpstream()
+    postQueue = PostQueue()
+    PostingWorkers(postQueue, messageManager.postMessage).start()
+    # Events go through the coalescing window before they're queued
+    ingestQueue = AlertCoalescer(postQueue)
+    if outbox is not None:
+        # Record events before anything else touches them, and finish posting
+        # whatever the previous run didn't get to
+        ingestQueue = OutboxRecorder(outbox, ingestQueue, messageManager.sinks)
+        threading.Thread(target=messageManager.replayOutbox, name="outbox-replay", daemon=True).start()
 
-        except KeyboardInterrupt:
-            print(f"{datetime.now()} - Program terminated")
-            sys.exit(1)
-        except requests.exceptions.ReadTimeout:
-            print(f"{datetime.now()} - Connection timeout (no data received), reconnecting...")
-            continue
-        except requests.exceptions.ConnectionError as e:
-            print(f"{datetime.now()} - Connection error: {e}")
-            time.sleep(5)  # Brief backoff before reconnecting
-            continue
-        except json.JSONDecodeError as e:
-            print(f"{datetime.now()} - Error decoding JSON: {e}")
-            continue  # Reconnect on JSON errors
-        except requests.exceptions.ChunkedEncodingError as err:
-            print(f"{datetime.now()} - Encountered 'InvalidChunkLength' error: {str(err)}")
-            continue
-        except Exception as e:
-            print(f"{datetime.now()} - Error main(): {e}")
-            time.sleep(5)  # Brief backoff on unexpected errors
-            continue  # Always try to reconnect
+    try:
+        if INGEST_MODE == "async":
+            print(f"{datetime.now()} - Using asyncio ingest mode", flush=True)
+            asyncio.run(AsyncIngest(api, ingestQueue, onKeepAlive=writeHeartbeat).run())
+        else:
+            runSync(api, ingestQueue)
+    except KeyboardInterrupt:
+        print(f"{datetime.now()} - Program terminated")
+        if outbox is not None:
+            outbox.close()
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import requests
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from map_cache import MAP_CACHE_SUFFIX, mapKey, writeFile
+from map_packer import MapPacker
+from metrics import metrics
+
+# Static maps pre-rendered for every location and every area by
+# script/prerender_maps.py, so even the first alert for a place needs no
+# Mapbox request. The bundle is a directory of PNGs named by map cache key
+# plus a manifest:
+#   {"format": 1, "version": "...", "style": "dark-v11", "size": "400x400@2x",
+#    "maps": {"city:171": [key], "area:Gaza Envelope": [key, ...], ...}}
+# version is a hash of every key, so it changes whenever a map does.
+MAP_BUNDLE_DIR = os.environ.get("MAP_BUNDLE_DIR", "map_bundle")
+MAP_BUNDLE_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+# Parallel Mapbox requests while pre-rendering
+PRERENDER_WORKERS = int(os.environ.get("PRERENDER_WORKERS", 4))
+PRERENDER_TIMEOUT_SEC = float(os.environ.get("PRERENDER_TIMEOUT_SEC", 30))
+
+def readManifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("format") != MAP_BUNDLE_FORMAT:
+        return None
+    return manifest
+
+# Read-only view of a pre-rendered bundle. Only the manifest is read at
+# startup; an image is read from disk when it's asked for.
+class MapBundle:
+    def __init__(self, directory=MAP_BUNDLE_DIR):
+        self.directory = directory
+        manifest = readManifest(directory) or {"maps": {}}
+        self.version = manifest.get("version")
+        # id ("city:<taCityId>" or "area:<name>") -> map cache keys
+        self.maps = manifest["maps"]
+        self.keys = {key for keys in self.maps.values() for key in keys}
+        metrics.setGauge("map_bundle.maps", len(self.keys))
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Returns the pre-rendered image with the map cache key, None if the
+    # bundle hasn't got it
+    def get(self, key):
+        if key not in self.keys:
+            return None
+        try:
+            with open(os.path.join(self.directory, key + MAP_CACHE_SUFFIX), "rb") as file:
+                image = file.read()
+        except OSError:
+            return None
+        metrics.increment("map_bundle.hits")
+        return image
+
+    # The map cache keys pre-rendered for a location or area id
+    def keysFor(self, bundleId):
+        return self.maps.get(bundleId, [])
+
+# Fetches one map into the bundle. Runs in a worker process.
+def renderMap(url, path, timeout=PRERENDER_TIMEOUT_SEC):
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    writeFile(path, response.content)
+    return len(response.content)
+
+# The static maps an alert for one location, and one for every location of
+# an area, would get: {id: [staticMap, ...]}. Built with the map packer from
+# the city table, so the cache keys are the ones live alerts produce. A
+# live alert's map has a pin at its lat and lon, so a location the table
+# has no coordinates for is left out: its map would never be asked for.
+def bundleMaps(messageBuilder, cities):
+    packer = MapPacker(messageBuilder)
+    records = {}
+    for city in cities:
+        try:
+            if city["lat"] is None or city["lon"] is None:
+                continue
+            records[str(city["taCityId"])] = city
+        except (KeyError, TypeError):
+            continue
+    if not records:
+        raise ValueError("pre-rendering needs a city table with every location's taCityId, lat and lon")
+
+    maps = {}
+    areas = {}
+    for cityId, record in records.items():
+        maps[f"city:{cityId}"] = [staticMap for _, staticMap in packer.pack([record])]
+        area = record.get("areaNameEn") or record.get("areaNameHe")
+        if area is not None:
+            areas.setdefault(area, []).append(record)
+    for area, members in areas.items():
+        maps[f"area:{area}"] = [staticMap for _, staticMap in packer.pack(members)]
+    return {bundleId: [staticMap for staticMap in staticMaps if staticMap["overlays"] or staticMap["markers"]]
+            for bundleId, staticMaps in maps.items()}
+
+# Renders every location's and area's map into the bundle directory. Only
+# maps whose key isn't in the bundle yet are fetched, so a run after a
+# polygon or style change renders just what changed, and a run that was
+# stopped picks up where it left off. Maps no longer in the bundle are
+# removed. Returns counts of what was done.
+def prerenderMaps(messageBuilder, cities, directory=MAP_BUNDLE_DIR, workers=PRERENDER_WORKERS):
+    maps = bundleMaps(messageBuilder, cities)
+    keys = {}
+    urls = {}
+    for bundleId, staticMaps in maps.items():
+        keys[bundleId] = []
+        for staticMap in staticMaps:
+            key = mapKey(messageBuilder.styleId, messageBuilder.mapSize, staticMap)
+            keys[bundleId].append(key)
+            urls[key] = messageBuilder.getMapURL(staticMap)
+
+    def path(key):
+        return os.path.join(directory, key + MAP_CACHE_SUFFIX)
+
+    pending = [key for key in urls if not os.path.exists(path(key))]
+    failed = set()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(renderMap, urls[key], path(key)): key for key in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.add(futures[future])
+                    print(f"{datetime.now()} - Pre-render: error rendering {futures[future]}: {e}", flush=True)
+                if done % 100 == 0:
+                    print(f"{datetime.now()} - Pre-render: {done}/{len(pending)} maps", flush=True)
+
+    # A location or area with a failed map is left out until a later run
+    complete = {bundleId: bundleKeys for bundleId, bundleKeys in keys.items() if not failed.intersection(bundleKeys)}
+    removed = 0
+    for entry in os.scandir(directory) if os.path.isdir(directory) else ():
+        if entry.name.endswith(MAP_CACHE_SUFFIX) and entry.name[:-len(MAP_CACHE_SUFFIX)] not in urls:
+            os.remove(entry.path)
+            removed += 1
+    version = hashlib.sha256("\n".join(sorted(key for bundleKeys in complete.values() for key in bundleKeys)).encode("utf-8")).hexdigest()[:16]
+    manifest = {"format": MAP_BUNDLE_FORMAT, "version": version, "style": messageBuilder.styleId,
+                "size": messageBuilder.mapSize, "maps": complete}
+    writeFile(os.path.join(directory, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+    return {"maps": len(urls), "rendered": len(pending) - len(failed), "reused": len(urls) - len(pending),
+            "failed": len(failed), "removed": removed, "version": version}
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from metrics import metrics
+
+# Static map images already fetched from Mapbox, kept in memory and on disk
+# so a map that has been drawn before costs no request
+MAP_CACHE_DIR = os.environ.get("MAP_CACHE_DIR", "map_cache")
+# Bytes of images kept in memory; 0 keeps none
+MAP_CACHE_MEMORY_BYTES = int(os.environ.get("MAP_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+# Bytes of images kept on disk; 0 keeps none
+MAP_CACHE_DISK_BYTES = int(os.environ.get("MAP_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+MAP_CACHE_SUFFIX = ".png"
+
+# Cache key of a static map: a hash of its style and size and of its
+# overlays and markers as sets, so the same places give the same key
+# whatever order they alerted in
+def mapKey(styleId, size, staticMap):
+    digest = hashlib.sha256()
+    for part in [styleId, size] + sorted(set(staticMap["overlays"])) + ["|"] + sorted(set(staticMap["markers"])):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+# Writes the file under a temporary name and renames it, so a crash can't
+# leave half a file behind
+def writeFile(path, data):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+# Two tiers of images by key, each least recently used first: a memory tier
+# and a directory of files named by key. A hit on disk is moved up into
+# memory. Each tier drops its least recently used images when it holds
+# more than its byte limit.
+class MapImageCache:
+    def __init__(self, directory=MAP_CACHE_DIR, memoryBytes=MAP_CACHE_MEMORY_BYTES, diskBytes=MAP_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memoryBytes = memoryBytes
+        self.diskBytes = diskBytes
+        self.lock = threading.Lock()
+        # key -> image bytes
+        self.memory = OrderedDict()
+        self.memoryUsed = 0
+        # key -> size of its file
+        self.disk = OrderedDict()
+        self.diskUsed = 0
+        self.loadDisk()
+
+    # Indexes the images already on disk, oldest use first, so the tier
+    # survives restarts
+    def loadDisk(self):
+        if self.diskBytes <= 0:
+            return
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.endswith(MAP_CACHE_SUFFIX)]
+        except OSError:
+            return
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            size = entry.stat().st_size
+            self.disk[entry.name[:-len(MAP_CACHE_SUFFIX)]] = size
+            self.diskUsed += size
+        self.evictDisk()
+        metrics.setGauge("map_cache.disk_bytes", self.diskUsed)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + MAP_CACHE_SUFFIX)
+
+    # Returns the image, or None when neither tier has it
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                metrics.increment("map_cache.memory_hits")
+                return self.memory[key]
+            onDisk = key in self.disk
+            if onDisk:
+                self.disk.move_to_end(key)
+        if onDisk:
+            try:
+                with open(self.path(key), "rb") as file:
+                    image = file.read()
+                os.utime(self.path(key))
+            except OSError:
+                with self.lock:
+                    self.forgetDisk(key)
+            else:
+                metrics.increment("map_cache.disk_hits")
+                with self.lock:
+                    self.remember(key, image)
+                return image
+        metrics.increment("map_cache.misses")
+        return None
+
+    def put(self, key, image):
+        with self.lock:
+            self.remember(key, image)
+        if len(image) > self.diskBytes:
+            return
+        try:
+            writeFile(self.path(key), image)
+        except OSError as e:
+            print(f"{datetime.now()} - Map cache: error writing {key}: {e}", flush=True)
+            return
+        with self.lock:
+            self.forgetDisk(key)
+            self.disk[key] = len(image)
+            self.diskUsed += len(image)
+            self.evictDisk()
+            metrics.setGauge("map_cache.disk_bytes", self.diskUsed)
+
+    # Returns the cached image, or calls download() for it and caches what
+    # it returns. Nothing is cached when download() raises.
+    def fetch(self, key, download):
+        image = self.get(key)
+        if image is None:
+            image = download()
+            self.put(key, image)
+        return image
+
+    # Caller holds the lock
+    def remember(self, key, image):
+        if len(image) > self.memoryBytes:
+            return
+        if key in self.memory:
+            self.memoryUsed -= len(self.memory.pop(key))
+        self.memory[key] = image
+        self.memoryUsed += len(image)
+        while self.memoryUsed > self.memoryBytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memoryUsed -= len(evicted)
+            metrics.increment("map_cache.memory_evictions")
+        metrics.setGauge("map_cache.memory_bytes", self.memoryUsed)
+
+    # Caller holds the lock
+    def forgetDisk(self, key):
+        if key in self.disk:
+            self.diskUsed -= self.disk.pop(key)
+
+    # Caller holds the lock
+    def evictDisk(self):
+        while self.diskUsed > self.diskBytes:
+            key, size = self.disk.popitem(last=False)
+            self.diskUsed -= size
+            metrics.increment("map_cache.disk_evictions")
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
@@ -0,0 +1,227 @@
+import os
+from metrics import metrics
+
+# Static maps for alert messages, off by default: 1 splits each event into
+# one message per map and posts the map with it, 0 posts the locations
+# without maps
+STATIC_MAPS = int(os.environ.get("STATIC_MAPS", 0))
+# Longest Mapbox static map request URL
+MAP_MAX_REQUEST_LENGTH = int(os.environ.get("MAP_MAX_REQUEST_LENGTH", 8192))
+# Locations are ordered along a Hilbert curve over the event's bounding box,
+# on a grid of 2^order cells a side (a few hundred metres across Israel)
+HILBERT_ORDER = 10
+# Alerting locations of one area are drawn as a single outline instead of
+# a polygon and pin each: 1 on, 0 off
+MAP_AREA_UNIONS = int(os.environ.get("MAP_AREA_UNIONS", 1))
+
+# Distance of grid cell (x, y) along the Hilbert curve of the given order.
+# Cells close on the curve are close on the map.
+def hilbertIndex(x, y, order=HILBERT_ORDER):
+    size = 1 << order
+    index = 0
+    step = size >> 1
+    while step:
+        rx = 1 if x & step else 0
+        ry = 1 if y & step else 0
+        index += step * step * ((3 * rx) ^ ry)
+        if not ry:
+            if rx:
+                x = size - 1 - x
+                y = size - 1 - y
+            x, y = y, x
+        step >>= 1
+    return index
+
+# What goes on a map together: one location, or the alerting locations of
+# an area drawn as one outline. position is (lat, lon), None when there are
+# no coordinates.
+class MapItem:
+    def __init__(self, indices, cityIds, overlays, markers, position):
+        self.indices = indices
+        self.cityIds = cityIds
+        self.overlays = overlays
+        self.markers = markers
+        self.position = position
+        self.overlaysLength = joinedLength(overlays)
+        self.markersLength = joinedLength(markers)
+
+# One map request being filled: its overlays and markers, and the length
+# its URL has so far
+class MapGroup:
+    def __init__(self, baseLength):
+        self.length = baseLength
+        self.members = []
+        self.cities = set()
+        self.staticMap = {"overlays": [], "markers": []}
+
+    # What adding the item's overlays and markers would add to the URL, each
+    # after a comma unless it's the first of its kind, plus the comma between
+    # the overlays and the markers once the map has both
+    def cost(self, item):
+        cost = item.overlaysLength + item.markersLength
+        if item.overlays and self.staticMap["overlays"]:
+            cost += 1
+        if item.markers and self.staticMap["markers"]:
+            cost += 1
+        hadBoth = bool(self.staticMap["overlays"]) and bool(self.staticMap["markers"])
+        if not hadBoth and (item.overlays or self.staticMap["overlays"]) and (item.markers or self.staticMap["markers"]):
+            cost += 1
+        return cost
+
+    def add(self, item, cost=None):
+        self.length += self.cost(item) if cost is None else cost
+        self.members.extend(item.indices)
+        self.cities.update(item.cityIds)
+        self.staticMap["overlays"].extend(item.overlays)
+        self.staticMap["markers"].extend(item.markers)
+
+# Length of the parts joined by commas
+def joinedLength(parts):
+    if len(parts) == 1:
+        return len(parts[0])
+    return sum(len(part) for part in parts) + len(parts) - 1 if parts else 0
+
+# Splits an event's locations into as few static map requests as fit
+# maxLength, keeping neighbouring locations on the same map. The URL length
+# of each map is kept as a running total instead of being rebuilt.
+#
+# Locations are taken in Hilbert curve order and each map is filled before
+# the next is started. Every map but the last is then full to within one
+# item, so there are at most total / (room on a map - largest item) maps,
+# rounded up: the fewest possible but for that one item per map.
+class MapPacker:
+    def __init__(self, messageBuilder, maxLength=MAP_MAX_REQUEST_LENGTH, areaUnions=MAP_AREA_UNIONS):
+        self.messageBuilder = messageBuilder
+        self.maxLength = maxLength
+        self.areaUnions = areaUnions
+        # A map URL with no overlays or markers
+        self.baseLength = len(messageBuilder.getMapURL({"overlays": [], "markers": []}))
+
+    # Returns [(alerts, staticMap)], one per map. The maps come in the order
+    # of their most urgent location, and keep the order the alerts were
+    # given in within each map.
+    def pack(self, alerts):
+        groups = []
+        group = None
+        for item in self.geographicOrder(self.items(alerts)):
+            if group is not None and item.cityIds and item.cityIds <= group.cities:
+                # Already drawn on this map
+                group.members.extend(item.indices)
+                continue
+            cost = None if group is None else group.cost(item)
+            if group is None or group.length + cost > self.maxLength:
+                group = MapGroup(self.baseLength)
+                groups.append(group)
+                cost = None
+            group.add(item, cost)
+
+        packed = []
+        for group in sorted(groups, key=lambda group: min(group.members)):
+            packed.append(([alerts[index] for index in sorted(group.members)], group.staticMap))
+        metrics.increment("maps.requests", len(packed))
+        return packed
+
+    # The alerts as map items, in the order of their first alert. With area
+    # unions, the locations of each area with several alerting become one.
+    def items(self, alerts):
+        separate = []
+        areas = {}
+        for index, alert in enumerate(alerts):
+            area = alert.get("areaNameEn") or alert.get("areaNameHe")
+            if self.areaUnions and area is not None and alert.get("taCityId") is not None:
+                areas.setdefault(area, []).append(index)
+            else:
+                separate.append(index)
+        items = self.locationItems(alerts, separate)
+        if not areas:
+            return items
+        for indices in areas.values():
+            items.extend(self.areaItems(alerts, indices))
+        return sorted(items, key=lambda item: item.indices[0])
+
+    # An item per location; a location alerting more than once is drawn once
+    def locationItems(self, alerts, indices):
+        items = []
+        locations = {}
+        for index in indices:
+            cityId = alerts[index].get("taCityId")
+            if cityId in locations:
+                locations[cityId].indices.append(index)
+                continue
+            item = self.locationItem(alerts, index)
+            items.append(item)
+            if cityId is not None:
+                locations[cityId] = item
+        return items
+
+    def locationItem(self, alerts, index):
+        alert = alerts[index]
+        cityId = alert.get("taCityId")
+        overlay = self.messageBuilder.buildPolygonOverlay(alert)
+        location = position(alert)
+        marker = None if location is None else self.messageBuilder.buildMarker(alert)
+        if overlay is not None and self.baseLength + len(overlay) + (len(marker) + 1 if marker else 0) > self.maxLength:
+            # Too big for a map of its own, so it only gets its pin
+            overlay = None
+            metrics.increment("maps.overlays_dropped")
+        return MapItem([index], set() if cityId is None else {cityId},
+                       [] if overlay is None else [overlay], [] if marker is None else [marker], location)
+
+    # One item outlining the area's alerting locations, pinning only those
+    # without a polygon. Falls back to an item per location when they can't
+    # be outlined together or the outline doesn't fit on a map.
+    def areaItems(self, alerts, indices):
+        cityIds = {alerts[index]["taCityId"] for index in indices}
+        overlays = self.messageBuilder.buildUnionOverlays(cityIds) if len(cityIds) > 1 else None
+        if overlays is None:
+            return self.locationItems(alerts, indices)
+
+        markers = []
+        pinned = set()
+        for index in indices:
+            alert = alerts[index]
+            if alert["taCityId"] in pinned or self.messageBuilder.hasPolygon(alert["taCityId"]):
+                continue
+            marker = self.marker(alert)
+            if marker is not None:
+                markers.append(marker)
+                pinned.add(alert["taCityId"])
+        item = MapItem(indices, cityIds, overlays, markers, None)
+        if self.baseLength + MapGroup(self.baseLength).cost(item) > self.maxLength:
+            return self.locationItems(alerts, indices)
+
+        positions = [point for point in (position(alerts[index]) for index in indices) if point is not None]
+        if positions:
+            item.position = (sum(lat for lat, _ in positions) / len(positions), sum(lon for _, lon in positions) / len(positions))
+        metrics.increment("maps.area_unions")
+        return [item]
+
+    def marker(self, alert):
+        if position(alert) is None:
+            return None
+        return self.messageBuilder.buildMarker(alert)
+
+    # The items along a Hilbert curve over their bounding box; items without
+    # coordinates go last, in their own order
+    def geographicOrder(self, items):
+        located = [item for item in items if item.position is not None]
+        unlocated = [item for item in items if item.position is None]
+        if not located:
+            return unlocated
+
+        lats = [item.position[0] for item in located]
+        lons = [item.position[1] for item in located]
+        minLat, minLon = min(lats), min(lons)
+        span = max(max(lats) - minLat, max(lons) - minLon) or 1
+        cells = (1 << HILBERT_ORDER) - 1
+        keys = [
+            hilbertIndex(round((lon - minLon) / span * cells), round((lat - minLat) / span * cells))
+            for lat, lon in zip(lats, lons)
+        ]
+        order = sorted(range(len(located)), key=keys.__getitem__)
+        return [located[index] for index in order] + unlocated
+
+def position(alert):
+    if alert.get("lat") is None or alert.get("lon") is None:
+        return None
+    return (float(alert["lat"]), float(alert["lon"]))
@@ -1,8 +1,23 @@
+import io
 import os
-from mastodon import Mastodon
+import time
+from mastodon import Mastodon, MastodonRatelimitError
+from message_splitter import splitMessage
+from rendered_message import RenderedMessage
+from rate_limiter import RateLimiter, Throttled, TokenBucket
+from metrics import metrics
 
 # Mastodon's toot character limit
 MAX_CHARACTERS = 500
+# Mastodon's default posting limit: 300 statuses per 3 hours. The server's
+# X-RateLimit-* headers override this as soon as it sends them.
+MASTO_POSTS_PER_WINDOW = int(os.environ.get("MASTO_POSTS_PER_WINDOW", 300))
+MASTO_RATE_WINDOW_SEC = int(os.environ.get("MASTO_RATE_WINDOW_SEC", 3 * 60 * 60))
+# Name of the plain-text rendering in a RenderedMessage
+MASTODON_FORMAT = "plain"
+
+def renderPlain(text):
+    return text
 
 class MastodonBot:
     def __init__(self):
@@ -11,46 +26,84 @@ class MastodonBot:
         self.mastodon = Mastodon(
             api_base_url=self.api_baseurl,
             access_token=self.accessToken,
-            request_timeout=30
+            request_timeout=30,
+            # We schedule around the limits ourselves instead of having the
+            # client sleep inside the request
+            ratelimit_method="throw"
         )
+        self.postBucket = TokenBucket(MASTO_POSTS_PER_WINDOW / MASTO_RATE_WINDOW_SEC, capacity=MASTO_POSTS_PER_WINDOW)
+        self.rateLimiter = RateLimiter("mastodon", [self.postBucket])
+        # What this sink's progress through a RenderedMessage is kept under
+        self.progressKey = ("mastodon", MASTODON_FORMAT)
 
-    def sendMessage(self, content):
+    # Returns True once every part of the message was posted. A map image,
+    # PNG bytes, is attached to the first part. Raises Throttled when the
+    # rate limit holds the message back; posting it again carries on from
+    # its first unposted part.
+    def sendMessage(self, content, image=None):
         print("      To Mastodon...", end="", flush=True)
-        if len(content) > MAX_CHARACTERS:
+        progress = None
+        if isinstance(content, RenderedMessage):
+            progress = content.posted
+            content = content.variant(MASTODON_FORMAT, renderPlain, MAX_CHARACTERS)
+        elif len(content) > MAX_CHARACTERS:
             content = self.truncateToMaxMessageSize(content)
 
         if not isinstance(content, (list)):
             content = [content]
 
+        delivered = True
+        start = progress.get(self.progressKey, 0) if progress is not None else 0
         try:
-            for message in content:
-                # if file is None:
-                self.mastodon.status_post(message)
-                # else:
-                #     try:
-                #         media_ids=self.mastodon.media_post(media_file=file, mime_type="image/png")
-                #         self.mastodon.status_post(message, media_ids=media_ids)
-                #     except Exception as e:
-                #         self.mastodon.status_post(message)
-                    
+            for index in range(start, len(content)):
+                message = content[index]
+                media = {}
+                if image is not None and index == 0:
+                    media = self.uploadMap(image)
+                self.rateLimiter.run(lambda: self.mastodon.status_post(message, **media), self.retryAfter)
+                self.syncRateLimit()
+                if progress is not None:
+                    progress[self.progressKey] = index + 1
+        except Throttled:
+            raise
         except Exception as e:
             print(f"Error posting message to Mastodon: {e}", flush=True)
+            delivered = False
         finally:
             print("done.", flush=True)
+        return delivered
                 
 
+    # Uploads a static map for the first toot. Returns the status_post
+    # arguments attaching it, none when the upload failed and the toot goes
+    # out without it.
+    def uploadMap(self, image):
+        try:
+            media = self.mastodon.media_post(io.BytesIO(image), mime_type="image/png")
+        except Exception as e:
+            print(f"Error uploading map to Mastodon, posting without it: {e}", flush=True)
+            return {}
+        metrics.increment("sink.mastodon.maps_uploaded")
+        return {"media_ids": [media]}
+
+    # Seconds until the rate limit window resets, when the server rejected a
+    # request for going too fast
+    def retryAfter(self, error):
+        if isinstance(error, MastodonRatelimitError):
+            return max(self.resetIn(), 1)
+        return None
+
+    def resetIn(self):
+        reset = self.mastodon.ratelimit_reset
+        return reset - time.time() if isinstance(reset, (int, float)) else 0
+
+    # Client keeps the last X-RateLimit-* headers the server sent
+    def syncRateLimit(self):
+        remaining = self.mastodon.ratelimit_remaining
+        if isinstance(remaining, (int, float)):
+            self.postBucket.sync(remaining, self.resetIn())
+
     # Splits a message string whose length > MAX_CHARACTERS into a list of
-    # messages, the length of each  of which < MAX_CHARACTERS
+    # messages, the length of each of which <= MAX_CHARACTERS
     def truncateToMaxMessageSize(self, content):
-        truncatedMessages = []
-        newMessage = ""
-        for line in content.splitlines():
-            if len(newMessage) + len(line) +1 < MAX_CHARACTERS:
-                newMessage = f"{newMessage}{line}\n"
-            else:
-                truncatedMessages.append(newMessage)
-                newMessage = ""
-        if newMessage:
-            truncatedMessages.append(newMessage)
-
-        return truncatedMessages
\ No newline at end of file
+        return splitMessage(content, MAX_CHARACTERS)
@@ -3,31 +3,147 @@ import polyline
 import urllib
 import requests
 import os
+import threading
+from collections import OrderedDict
+from map_bundle import MapBundle
+from map_cache import MapImageCache, mapKey
+from metrics import metrics
+from polygon_simplifier import SIMPLIFY_TOLERANCES, coarsestLevel, simplify
+from polygon_store import PolygonStore
+from polygon_union import unionPolygons
+from rendered_message import RenderedMessage
+
+# Mapbox API, overridable to point the bots at a stand-in server
+MAPBOX_API_URL = os.environ.get("MAPBOX_API_URL", "https://api.mapbox.com")
+# Binary polygon store built from polygons.json by
+# script/build_polygon_store.py. polygons.json itself is only loaded when
+# the store hasn't been built.
+POLYGON_STORE_PATH = os.environ.get("POLYGON_STORE_PATH", "polygons.bin")
+# Encoded polygon overlays kept in memory. The default fits every polygon in
+# polygons.json; 0 encodes the polygon every time.
+OVERLAY_CACHE_SIZE = int(os.environ.get("OVERLAY_CACHE_SIZE", 2048))
+# Largest simplification error of a map overlay, as a fraction of the
+# polygon's size: each overlay uses the coarsest precomputed level within
+# it. 0 draws the polygons as published.
+MAP_SIMPLIFY_FIDELITY = float(os.environ.get("MAP_SIMPLIFY_FIDELITY", 0.02))
+# Outlines of alerting locations merged together, kept in memory per set of
+# locations. Whole areas of the city table are merged at startup and kept
+# apart from these.
+UNION_CACHE_SIZE = int(os.environ.get("UNION_CACHE_SIZE", 256))
+
+# Optional table of every location the API knows about, used to index
+# locations by area at startup: a JSON list of records with the same
+# taCityId, name, englishName, areaNameHe and areaNameEn fields as an alert
+CITY_TABLE_PATH = os.environ.get("CITY_TABLE_PATH", "cities.json")
+
+# How an alert's locations are listed, set with MESSAGE_LAYOUT:
+#   lines - one "name (area)" line per location
+#   areas - one "area: name, name, ..." line per area, or "Entire area: X"
+#           when every location the city table has in the area is alerting
+LAYOUT_LINES = "lines"
+LAYOUT_AREAS = "areas"
+MESSAGE_LAYOUT = os.environ.get("MESSAGE_LAYOUT", LAYOUT_LINES).strip().lower()
+# Longest line in the areas layout, a longer area continues on a new line.
+# Under Mastodon's 500 characters so the splitter never has to cut a line.
+AREA_LINE_LENGTH = int(os.environ.get("AREA_LINE_LENGTH", 400))
 
 class AlertMessageBuilder:
     def __init__(self):
         self.accessToken = os.environ["MAPBOX_TOKEN"]
+        self.apiURL = MAPBOX_API_URL
         self.strokeColor = "ff0000"
         self.strokeFill = "bb1b1b"
         self.styleId = "dark-v11"
         self.mapFile = "tmp_static_map"
+        self.mapSize = "400x400@2x"
+        self.mapCache = MapImageCache()
+        self.mapBundle = MapBundle()
     
+        self.polygons = self.loadPolygons()
+        # taCityId -> encoded overlay (None if it has no polygon), least
+        # recently used first
+        self.overlays = OrderedDict()
+        self.overlaysLock = threading.Lock()
+        # frozenset of taCityIds -> overlays outlining them together (None if
+        # they can't be), least recently used first
+        self.unions = OrderedDict()
+        self.unionsLock = threading.Lock()
+        # The same for every whole area of the city table, built the first
+        # time a map outlines the area and never evicted
+        self.areaKeys = set()
+        self.areaUnions = {}
+
+        self.layout = MESSAGE_LAYOUT if MESSAGE_LAYOUT in (LAYOUT_LINES, LAYOUT_AREAS) else LAYOUT_LINES
+        # Area name -> taCityIds of every location in it, from the city table
+        self.areaCities = {}
+        self.loadCityTable(CITY_TABLE_PATH)
+
+    # Returns the polygons by taCityId from the polygon store, or from
+    # polygons.json when there's no store
+    def loadPolygons(self):
+        try:
+            return PolygonStore(POLYGON_STORE_PATH)
+        except Exception:
+            pass
         try:
             file = open("polygons.json")
-            self.polygons = json.load(file)
+            polygons = json.load(file)
             file.close()
+            return polygons
+        except Exception:
+            return None
+
+    # Fills the area index from a city table, if there is one. Returns the
+    # number of locations loaded.
+    def loadCityTable(self, path):
+        try:
+            with open(path, encoding="utf-8") as file:
+                cities = json.load(file)
         except Exception:
-            self.polygons = None
+            return 0
+        areaCities = {}
+        loaded = 0
+        for city in cities:
+            try:
+                area = city["areaNameEn"] or city["areaNameHe"]
+                cityId = city["taCityId"]
+            except (KeyError, TypeError):
+                continue
+            loaded += 1
+            if area is not None:
+                areaCities.setdefault(area, set()).add(cityId)
+        self.areaCities = {area: frozenset(cityIds) for area, cityIds in areaCities.items()}
+        with self.unionsLock:
+            self.areaKeys = {self.unionKey(cityIds) for cityIds in self.areaCities.values()}
+            self.areaUnions = {}
+        metrics.setGauge("message_builder.cities", loaded)
+        return loaded
 
-    # Retrieves a static map from URL and writes it to disk
-    def WriteMapToFile(self, url, file):
+    # Retrieves a static map and writes it to disk
+    def WriteMapToFile(self, staticMap, file):
         try:
             # Retrieve map and save to a file
             with open(file, 'wb') as f:
-                f.write(requests.get(url).content)
+                f.write(self.getMapImage(staticMap))
         except Exception as e:
             print(f"WriteMapToFile() - Error writing file: {e}")
 
+    # Returns the static map's PNG. A map pre-rendered into the map bundle,
+    # or with the same places and style as one fetched before, needs no
+    # request.
+    def getMapImage(self, staticMap):
+        key = mapKey(self.styleId, self.mapSize, staticMap)
+        image = self.mapBundle.get(key)
+        if image is not None:
+            return image
+        return self.mapCache.fetch(key, lambda: self.downloadMap(self.getMapURL(staticMap)))
+
+    # Error responses raise rather than return, so they aren't cached
+    def downloadMap(self, url):
+        response = requests.get(url)
+        response.raise_for_status()
+        return response.content
+
     # Given an alert, returns a string in format "locationName (areaName)"
     def buildAlert(self, alert):
         areaNameHe = alert["areaNameHe"]
@@ -42,22 +158,80 @@ class AlertMessageBuilder:
             return name
         return f"{name} ({areaName})"   
 
-    # Returns a static map URL with overlays and markers
+    # Lists the alert's locations grouped by area, in the order each area
+    # first appears. Locations without an area keep a line of their own.
+    def buildAreaLocations(self, alerts):
+        areas = {}
+        for alert in alerts:
+            areas.setdefault(alert["areaNameEn"] or alert["areaNameHe"], []).append(alert)
+
+        lines = []
+        for area, areaAlerts in areas.items():
+            if area is None:
+                lines.extend(self.buildAlert(alert) for alert in areaAlerts)
+                continue
+            known = self.areaCities.get(area)
+            if known and known <= {alert.get("taCityId") for alert in areaAlerts}:
+                lines.append(f"Entire area: {area}")
+                continue
+            names = dict.fromkeys(alert["englishName"] or alert["name"] for alert in areaAlerts)
+            lines.extend(self.buildAreaLines(area, names))
+        return "".join(f"{line}\n" for line in lines)
+
+    # Returns "area: name, name, ..." lines of at most AREA_LINE_LENGTH
+    def buildAreaLines(self, area, names):
+        prefix = f"{area}: "
+        lines = []
+        current = []
+        used = len(prefix)
+        for name in names:
+            if current and used + 2 + len(name) > AREA_LINE_LENGTH:
+                lines.append(prefix + ", ".join(current))
+                current = []
+                used = len(prefix)
+            used += len(name) + (2 if current else 0)
+            current.append(name)
+        if current:
+            lines.append(prefix + ", ".join(current))
+        return lines
+
+    # Returns a static map URL with overlays and markers. They're one
+    # comma-separated list, and a map may have either without the other.
     def getMapURL(self, staticMap):
-        overlays = ','.join(staticMap["overlays"])
-        markers = ','.join(staticMap["markers"])
-        return f"https://api.mapbox.com/styles/v1/mapbox/{self.styleId}/static/{overlays},{markers}/auto/400x400@2x?padding=100&access_token={self.accessToken}"
+        places = ','.join(part for part in staticMap["overlays"] + staticMap["markers"] if part)
+        return f"{self.apiURL}/styles/v1/mapbox/{self.styleId}/static/{places}/auto/{self.mapSize}?padding=100&access_token={self.accessToken}"
     
     # Returns a URLEncoded polyline overlay for the alert
-    # location's polygon
+    # location's polygon. Polygons don't change, so each one is encoded
+    # once and then served from the overlay cache.
     def buildPolygonOverlay(self, alert):
         if not self.polygons:
             return None
-        
-        polygon = self.polygons.get(str(alert["taCityId"]), None)
+
+        cityId = str(alert["taCityId"])
+        with self.overlaysLock:
+            if cityId in self.overlays:
+                self.overlays.move_to_end(cityId)
+                return self.overlays[cityId]
+
+        overlay = self.encodePolygonOverlay(cityId)
+        if OVERLAY_CACHE_SIZE > 0:
+            with self.overlaysLock:
+                self.overlays[cityId] = overlay
+                self.overlays.move_to_end(cityId)
+                while len(self.overlays) > OVERLAY_CACHE_SIZE:
+                    self.overlays.popitem(last=False)
+        return overlay
+
+    def encodePolygonOverlay(self, cityId):
+        polygon = self.simplifiedPolygon(cityId)
         if polygon is None:
             return None
 
+        metrics.increment("message_builder.overlays_encoded")
+        return self.encodeOverlay(polygon)
+
+    def encodeOverlay(self, polygon):
         # Encode polygon to polyline format
         polylineEncoded = polyline.encode(polygon, 5)
         # URL encode the polyline
@@ -65,6 +239,75 @@ class AlertMessageBuilder:
         overlay = f"path+{self.strokeColor}+{self.strokeFill}({URLEncoded})"
         return overlay
     
+    # Returns the location's polygon at the coarsest simplification level
+    # that stays within MAP_SIMPLIFY_FIDELITY of its shape. polygons.json has
+    # no levels, so its polygons are simplified here instead.
+    def simplifiedPolygon(self, cityId):
+        polygon = self.polygons.get(cityId, None)
+        if polygon is None or MAP_SIMPLIFY_FIDELITY <= 0:
+            return polygon
+        if isinstance(self.polygons, PolygonStore):
+            level = coarsestLevel(polygon, self.polygons.tolerances, MAP_SIMPLIFY_FIDELITY)
+            return self.polygons.get(cityId, level=level) if level else polygon
+        level = coarsestLevel(polygon, SIMPLIFY_TOLERANCES, MAP_SIMPLIFY_FIDELITY)
+        return simplify(polygon, SIMPLIFY_TOLERANCES[level])
+
+    def hasPolygon(self, cityId):
+        return bool(self.polygons) and str(cityId) in self.polygons
+
+    # Returns overlays outlining the given locations as one shape, one
+    # overlay per separate patch, or None when they have a hole that the
+    # fill would cover. Locations without a polygon are left out. A whole
+    # area of the city table is kept in the area unions, any other set in
+    # the union cache.
+    def buildUnionOverlays(self, cityIds):
+        if not self.polygons:
+            return None
+
+        key = self.unionKey(cityIds)
+        with self.unionsLock:
+            if key in self.areaUnions:
+                return self.areaUnions[key]
+            if key in self.unions:
+                self.unions.move_to_end(key)
+                return self.unions[key]
+            wholeArea = key in self.areaKeys
+
+        overlays = self.encodeUnion(key)
+        if wholeArea:
+            with self.unionsLock:
+                return self.areaUnions.setdefault(key, overlays)
+        if UNION_CACHE_SIZE > 0:
+            with self.unionsLock:
+                self.unions[key] = overlays
+                self.unions.move_to_end(key)
+                while len(self.unions) > UNION_CACHE_SIZE:
+                    self.unions.popitem(last=False)
+        return overlays
+
+    def unionKey(self, cityIds):
+        return frozenset(str(cityId) for cityId in cityIds)
+
+    # Borders are matched point for point, so the union is taken of the
+    # polygons as published and simplified afterwards, like any polygon. A
+    # location bordering none of the others keeps its own overlay.
+    def encodeUnion(self, cityIds):
+        cityIds = [cityId for cityId in sorted(cityIds) if cityId in self.polygons]
+        union = unionPolygons([self.polygons.get(cityId) for cityId in cityIds]) if cityIds else None
+        if union is None:
+            return None
+
+        metrics.increment("message_builder.unions_built")
+        rings, separate = union
+        overlays = []
+        for ring in rings:
+            if MAP_SIMPLIFY_FIDELITY > 0:
+                ring = simplify(ring, SIMPLIFY_TOLERANCES[coarsestLevel(ring, SIMPLIFY_TOLERANCES, MAP_SIMPLIFY_FIDELITY)])
+            overlays.append(self.encodeOverlay(ring))
+        for position in separate:
+            overlays.append(self.buildPolygonOverlay({"taCityId": cityIds[position]}))
+        return overlays
+
     # Returns a map marker encoding for the alert's coordinates
     def buildMarker(self, alert):
         lat = str(alert["lat"])
@@ -73,15 +316,35 @@ class AlertMessageBuilder:
     
     # Returns a concatanted string of alert type, timestamp and list of alert locations
     def buildMessageText(self, alertTypeId, timestamp, alertLocations):
+        header = self.buildHeader(alertTypeId, timestamp)
+        return f"{header}\n\n" \
+                f"{alertLocations}\n"
+
+    def buildHeader(self, alertTypeId, timestamp):
         if (alertTypeId == 1):
             header = "Rocket alert"
         elif (alertTypeId == 2):
             header = "Hostile UAV alert"
         else:
             header = "Red alert"
-        header += f" {timestamp}:"
-        return f"{header}\n\n" \
-                f"{alertLocations}\n"
+        return f"{header} {timestamp}:"
+
+    # Returns a short Message dict standing in for an alert that's being
+    # posted after its deadline, instead of listing every location
+    def buildLateSummary(self, alertTypeId, timestamp, locationCount):
+        header = self.buildHeader(alertTypeId, timestamp)
+        places = "location" if locationCount == 1 else "locations"
+        text = f"{header}\n\n{locationCount} {places} (delayed, alert has ended)\n\n"
+        return {"text": RenderedMessage(text, summary=True)}
+
+    # Returns one Message dict standing in for every alert that went stale
+    # in the outbox while the bots were down, instead of a summary each
+    def buildReplaySummary(self, alertCount, locationCount, first, last):
+        alerts = "alert" if alertCount == 1 else "alerts"
+        places = "location" if locationCount == 1 else "locations"
+        period = first if first == last else f"{first} - {last}"
+        text = f"Missed while offline {period}:\n\n{alertCount} {alerts}, {locationCount} {places} (delayed, alerts have ended)\n\n"
+        return {"text": RenderedMessage(text, summary=True)}
     
     def addStaticMapData(self, alert, staticMap):
         overlay = self.buildPolygonOverlay(alert)
@@ -91,16 +354,15 @@ class AlertMessageBuilder:
         staticMap["markers"].append(marker)
         return staticMap
 
-    # Returns a Message dict which includes the its text and map filename, after writing map to disk
+    # Returns a Message dict which includes its text and, when it has places
+    # to show, its static map. The text is a RenderedMessage, so each sink
+    # renders and splits it once; the map image is fetched when it's posted.
     def buildMessage(self, staticMap, mapFileCount, alertTypeId, timestamp, alertLocations):
-        # url = self.getMapURL(staticMap)
-        # filename = f"{self.mapFile}_{mapFileCount}.png"
-        # self.WriteMapToFile(url, filename)
-        text = self.buildMessageText(alertTypeId, timestamp, alertLocations)
-        # message = {"text": text, "file": filename}
+        text = RenderedMessage(self.buildMessageText(alertTypeId, timestamp, alertLocations))
         message = {"text": text}
+        if staticMap["markers"] or staticMap["overlays"]:
+            message["map"] = staticMap
         print("  Built message:")
-        # print(f"    File: {filename}")
         print("    Text:")
         print(f"    {text}")
         return message
\ No newline at end of file
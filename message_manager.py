@@ -1,22 +1,77 @@
 
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
 from telegram_bot import TelegramBot
 from mastodon_bot import MastodonBot
-from message_builder import AlertMessageBuilder
+from message_builder import LAYOUT_AREAS, AlertMessageBuilder
+from map_packer import MAP_MAX_REQUEST_LENGTH, STATIC_MAPS, MapPacker
+from metrics import metrics
+from rate_limiter import Throttled
+from circuit_breaker import BREAKER_RETRY_QUEUE_SIZE, OPEN, CircuitBreaker
+from deadlines import POLICY_DROP, POLICY_SUMMARIZE, deadlineKey, deadlinePolicy, eventDeadline, isExpired, popOverflow
+
+# Sort key for alerts: seconds people have to reach shelter, unknown last
+def urgency(alert):
+    countdown = alert.get("countdownSec")
+    return float("inf") if countdown is None else countdown
 
 class MessageManager:
-    def __init__(self):
+    def __init__(self, outbox=None):
         print("DEBUG: Initializing MessageManager...", flush=True)
+        # Optional Outbox recording which sinks still owe each event a post
+        self.outbox = outbox
         self.mapFileCount = 0
         # Maxbox request length limitation
-        self.MAP_MAX_REQUEST_LENGTH = 8192
+        self.MAP_MAX_REQUEST_LENGTH = MAP_MAX_REQUEST_LENGTH
         self.messageBuilder = AlertMessageBuilder()
+        self.mapPacker = MapPacker(self.messageBuilder, self.MAP_MAX_REQUEST_LENGTH)
         print("DEBUG: Initializing TelegramBot...", flush=True)
         self.telegramBot = TelegramBot()
         print("DEBUG: Initializing MastodonBot...", flush=True)
         self.mastodonBot = MastodonBot()
+        # Every sink posts on its own single-threaded executor: sinks run in
+        # parallel and fail independently, while each sink still receives
+        # its messages in order
+        self.sinks = {
+            "Telegram": self.telegramBot,
+            "Mastodon": self.mastodonBot,
+        }
+        self.sinkExecutors = {
+            name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sink-{name.lower()}")
+            for name in self.sinks
+        }
+        # A sink that keeps failing is cut off by its breaker; its events are
+        # parked and posted once it recovers
+        self.breakers = {name: CircuitBreaker(name.lower()) for name in self.sinks}
+        self.retryQueues = {name: [] for name in self.sinks}
+        self.parkSequence = itertools.count()
+        self.probeTimers = {}
         print("DEBUG: MessageManager initialized.", flush=True)
 
-    def postMessage(self, eventData):
+    # Posts the event to every sink, or only to the named sinks when
+    # replaying deliveries that failed before. An event no message can be
+    # built from never will be, so its outbox deliveries are dead-lettered
+    # rather than replayed on every restart; the error is still raised.
+    def postMessage(self, eventData, sinks=None):
+        try:
+            delivery = self.buildDelivery(eventData)
+        except Exception:
+            outboxIds = eventData.get("outboxIds") if isinstance(eventData, dict) else None
+            # A coalesced event may hold good events along with the bad one;
+            # they stay pending and are replayed one by one after a restart
+            if outboxIds and len(outboxIds) == 1:
+                self.deadLetter(outboxIds, sinks)
+            raise
+        results = self.fanOut(delivery, sinks)
+        self.recordDeliveries(delivery["outboxIds"], results)
+
+    # Everything a sink needs to post the event, also what gets parked
+    # while the sink is cut off
+    def buildDelivery(self, eventData):
         print("Building alert message...", flush=True)
 
         alerts = eventData["alerts"]
@@ -25,54 +80,283 @@ class MessageManager:
 
         alertTypeId = eventData["alertTypeId"]
         timestamp = alerts[0]["timeStamp"]
-        mapFileCount = 0
-        alertLocations = ""
-        staticMap = {'overlays': [], 'markers': []}
+        # Shortest countdown first, so when the message is split the most
+        # urgent locations go out in the first post
+        alerts = sorted(alerts, key=urgency)
         messages = []
 
-        for idx, alert in enumerate(alerts):
-            alertLocation = f"{self.messageBuilder.buildAlert(alert)}"
-            # self.messageBuilder.addStaticMapData(alert, staticMap)
-            # url = self.messageBuilder.getMapURL(staticMap)
-            # If we've reached URL's max length, we:
-            # Remove most recently added overlay and marker from the collection,
-            # Build a new message with the current collection of overlays and markers, to be send later,
-            # Start a new collection for next messages, beginning with the overlay and marker we just removed
-
-            # Disabling for now:
-            
-            # if len(url) > self.MAP_MAX_REQUEST_LENGTH:
-            #     # Remove
-            #     lastOverlay = staticMap["overlays"].pop()
-            #     lastMarker = staticMap["markers"].pop()
-
-            #     # Build
-            #     message = self.messageBuilder.buildMessage(staticMap, mapFileCount, alertTypeId, timestamp, alertLocations)
-            #     messages.append(message)
-
-            #     # Start
-            #     mapFileCount += 1
-            #     staticMap["overlays"] = [lastOverlay]
-            #     staticMap["markers"] = [lastMarker]
-            #     alertLocations = f"{alertLocation}\n"
-            # else:
-            #     alertLocations += f"{alertLocation}\n"
-
-            alertLocations += f"{alertLocation}\n"
-
-        message = self.messageBuilder.buildMessage(staticMap, mapFileCount, alertTypeId, timestamp, alertLocations)
-        messages.append(message)
+        if STATIC_MAPS:
+            # One message per map, each listing the locations on its map
+            groups = self.mapPacker.pack(alerts)
+        else:
+            groups = [(alerts, {'overlays': [], 'markers': []})]
+        for mapFileCount, (groupAlerts, staticMap) in enumerate(groups):
+            alertLocations = self.buildLocations(groupAlerts)
+            message = self.messageBuilder.buildMessage(staticMap, mapFileCount, alertTypeId, timestamp, alertLocations)
+            messages.append(message)
         
         print("  Posting:", flush=True)
+        deadline = eventData.get("deadline")
+        return {
+            "messages": messages,
+            "deadline": deadline,
+            "summary": [self.messageBuilder.buildLateSummary(alertTypeId, timestamp, len(alerts))] if deadline is not None else None,
+            "outboxIds": eventData.get("outboxIds"),
+        }
+
+    # The list of locations in a message, in the configured layout
+    def buildLocations(self, alerts):
+        if self.messageBuilder.layout == LAYOUT_AREAS:
+            return self.messageBuilder.buildAreaLocations(alerts)
+        alertLocations = ""
+        for alert in alerts:
+            alertLocations += f"{self.messageBuilder.buildAlert(alert)}\n"
+        return alertLocations
+
+    # Sends the event to the sinks concurrently and waits for all of them,
+    # so posting takes as long as the slowest sink. A rate-limited sink parks
+    # the event rather than wait out its limit, so no sink holds the others
+    # back for longer than its own requests take. Returns {sink name: True
+    # if every message was posted (or deliberately dropped), None if parked}.
+    def fanOut(self, delivery, sinks=None):
+        names = [name for name in self.sinks if sinks is None or name in sinks]
+        futures = {
+            name: self.sinkExecutors[name].submit(self.deliver, name, delivery)
+            for name in names
+        }
+        wait(futures.values())
+        return {name: future.result() for name, future in futures.items()}
+
+    # Runs on the sink's executor. While the sink's breaker is open, or
+    # earlier events are still parked, the event is parked with them
+    # instead of waiting on a sink that's down. An event the sink fails to
+    # post is parked too, and retried from the queue.
+    def deliver(self, name, delivery):
+        if self.retryQueues[name]:
+            self.park(name, delivery)
+            self.drainRetryQueue(name)
+            return None
+        if self.latePolicy(name, delivery) == POLICY_DROP:
+            self.recordDeadlineMiss(name, POLICY_DROP)
+            return True
+        if not self.breakers[name].allowRequest():
+            self.park(name, delivery)
+            return None
+        if not self.sendGuarded(name, delivery):
+            self.park(name, delivery)
+            self.retryLater(name)
+            return None
+        return True
+
+    # The sink's policy for an event past its deadline, None while it's on time
+    def latePolicy(self, name, delivery):
+        if not isExpired(delivery["deadline"]):
+            return None
+        return deadlinePolicy(name)
+
+    def recordDeadlineMiss(self, name, policy):
+        metrics.increment(f"deadline.{name.lower()}.missed")
+        metrics.increment(f"deadline.{name.lower()}.{policy}")
+
+    # Returns True once the sink posted the delivery, False if it failed, and
+    # None if its rate limit held it back. A throttled sink isn't failing, so
+    # that isn't held against its breaker; a probe is due when the limit
+    # allows posting again.
+    def sendGuarded(self, name, delivery):
+        messages = delivery["messages"]
+        policy = self.latePolicy(name, delivery)
+        if policy is not None:
+            self.recordDeadlineMiss(name, policy)
+            if policy == POLICY_SUMMARIZE:
+                messages = delivery["summary"]
+        try:
+            delivered = self.sendToSink(name, self.sinks[name], messages)
+        except Throttled as e:
+            self.breakers[name].abandon()
+            print(f"{datetime.now()} - {name} throttled, parked for {e.retryIn:.1f}s", flush=True)
+            self.scheduleProbe(name, e.retryIn)
+            return None
+        if self.breakers[name].record(delivered):
+            self.scheduleProbe(name)
+        return delivered
+
+    # Parked events are kept earliest deadline first. A full queue gives up
+    # a stale event first, else the one parked first.
+    def park(self, name, delivery):
+        queue = self.retryQueues[name]
+        heapq.heappush(queue, (deadlineKey(delivery["deadline"]), next(self.parkSequence), delivery))
+        metrics.increment(f"breaker.{name.lower()}.parked")
+        if len(queue) > BREAKER_RETRY_QUEUE_SIZE:
+            # The outbox still holds it for the next restart
+            _, _, dropped = popOverflow(queue)
+            metrics.increment(f"breaker.{name.lower()}.dropped")
+            print(f"{datetime.now()} - {name} retry queue full, dropped a stale or the oldest event", flush=True)
+            self.recordDeliveries(dropped["outboxIds"], {name: False})
+        metrics.setGauge(f"breaker.{name.lower()}.retry_queue", len(queue))
+
+    # Posts parked events earliest deadline first for as long as the breaker
+    # lets them through. The first one after the breaker opened is the probe.
+    def drainRetryQueue(self, name):
+        queue = self.retryQueues[name]
+        while queue:
+            delivery = queue[0][2]
+            if self.latePolicy(name, delivery) == POLICY_DROP:
+                heapq.heappop(queue)
+                self.recordDeadlineMiss(name, POLICY_DROP)
+                self.recordDeliveries(delivery["outboxIds"], {name: True})
+                continue
+            if not self.breakers[name].allowRequest():
+                break
+            if not self.sendGuarded(name, delivery):
+                # Stays parked until the next probe
+                break
+            heapq.heappop(queue)
+            metrics.increment(f"breaker.{name.lower()}.drained")
+            self.recordDeliveries(delivery["outboxIds"], {name: True})
+        metrics.setGauge(f"breaker.{name.lower()}.retry_queue", len(queue))
+        if queue:
+            self.retryLater(name)
+
+    # Probes the sink once its breaker's reset timeout has passed, or after
+    # delay, on the sink's own executor. With the breaker still closed,
+    # parked events are retried after a full reset timeout.
+    def scheduleProbe(self, name, delay=None):
+        previous = self.probeTimers.get(name)
+        if previous is not None:
+            previous.cancel()
+        breaker = self.breakers[name]
+        if delay is None:
+            delay = breaker.retryIn() if breaker.state == OPEN else breaker.resetTimeout
+        timer = threading.Timer(delay, self.sinkExecutors[name].submit, args=(self.probe, name))
+        timer.daemon = True
+        self.probeTimers[name] = timer
+        timer.start()
+
+    # Makes sure parked events get another try, unless one is already due
+    def retryLater(self, name):
+        if name not in self.probeTimers:
+            self.scheduleProbe(name)
+
+    # Anything still parked afterwards (the sink is failing, throttled, or
+    # this woke up a moment early) is retried again later
+    def probe(self, name):
+        self.probeTimers.pop(name, None)
+        self.drainRetryQueue(name)
+
+    def recordDeliveries(self, outboxIds, results):
+        if self.outbox is None or not outboxIds:
+            return
+        for name, delivered in results.items():
+            if delivered is None:
+                # Parked; it's recorded once the sink takes it
+                continue
+            try:
+                if delivered:
+                    self.outbox.ack(outboxIds, name)
+                else:
+                    self.outbox.release(outboxIds, name)
+            except Exception as e:
+                print(f"Error recording {name} delivery in outbox: {e}", flush=True)
+
+    def deadLetter(self, outboxIds, sinks=None):
+        if self.outbox is None or not outboxIds:
+            return
+        for name in self.sinks:
+            if sinks is not None and name not in sinks:
+                continue
+            try:
+                self.outbox.deadLetter(outboxIds, name)
+            except Exception as e:
+                print(f"Error dead-lettering {name} delivery in outbox: {e}", flush=True)
+
+    # Re-posts events the outbox still holds from before a restart, each to
+    # the sinks that hadn't posted it yet. Events that went stale while we
+    # were down are summarized in one post per sink, not one post each.
+    def replayOutbox(self):
+        if self.outbox is None:
+            return
+        pending = self.outbox.pending()
+        if pending:
+            print(f"DEBUG: Replaying {len(pending)} undelivered events from the outbox...", flush=True)
+        stale = {}
+        for outboxId, (eventData, sinks) in pending.items():
+            eventData["outboxIds"] = [outboxId]
+            # Whatever went stale while we were down is handled per sink policy
+            eventData["deadline"] = eventDeadline(eventData)
+            if isExpired(eventData["deadline"]):
+                for name in sinks:
+                    if deadlinePolicy(name) == POLICY_SUMMARIZE:
+                        stale.setdefault(name, []).append(eventData)
+                sinks = [name for name in sinks if deadlinePolicy(name) != POLICY_SUMMARIZE]
+                if not sinks:
+                    continue
+            try:
+                self.postMessage(eventData, sinks=sinks)
+            except Exception as e:
+                print(f"Error replayOutbox(): {e}", flush=True)
+        for name, events in stale.items():
+            try:
+                self.postReplaySummary(name, events)
+            except Exception as e:
+                print(f"Error replayOutbox(): {e}", flush=True)
+
+    def postReplaySummary(self, name, events):
+        locationCount = 0
+        timestamps = []
+        for eventData in events:
+            self.recordDeadlineMiss(name, POLICY_SUMMARIZE)
+            alerts = eventData["alerts"]
+            if not isinstance(alerts, (list)):
+                alerts = [alerts]
+            locationCount += len(alerts)
+            # Every stale event has a deadline, so a timestamp
+            timestamps.extend(alert["timeStamp"] for alert in alerts if isinstance(alert, dict) and alert.get("timeStamp"))
+        timestamps.sort()
+        summary = self.messageBuilder.buildReplaySummary(len(events), locationCount, timestamps[0], timestamps[-1])
+        delivery = {
+            "messages": [summary],
+            "deadline": None,
+            "summary": None,
+            "outboxIds": [outboxId for eventData in events for outboxId in eventData["outboxIds"]],
+        }
+        results = self.fanOut(delivery, [name])
+        self.recordDeliveries(delivery["outboxIds"], results)
+
+    def sendToSink(self, name, sink, messages):
+        start = time.monotonic()
+        delivered = True
         for idx, message in enumerate(messages):
-            # file = message["file"]
             text = message["text"]
-        
+
             try:
-                # if os.path.isfile(file):
-                    print(f"    Message {idx + 1}/{len(messages)}:", flush=True)
-                    self.telegramBot.sendMessage(f"{text}")
-                    self.mastodonBot.sendMessage(text)
-                    # os.remove(file)
+                print(f"    {name} message {idx + 1}/{len(messages)}:", flush=True)
+                image = self.mapImage(message)
+                if image is None:
+                    sent = sink.sendMessage(text)
+                else:
+                    sent = sink.sendMessage(text, image)
+                if sent is False:
+                    delivered = False
+                    metrics.increment(f"sink.{name.lower()}.failures")
+            except Throttled:
+                # The rest wait with it
+                raise
             except Exception as e:
-                print(f"Error postMessage(): {e}", flush=True)
\ No newline at end of file
+                delivered = False
+                metrics.increment(f"sink.{name.lower()}.failures")
+                print(f"Error postMessage() to {name}: {e}", flush=True)
+        metrics.setGauge(f"sink.{name.lower()}.last_post_ms", round((time.monotonic() - start) * 1000, 1))
+        return delivered
+
+    # The PNG of the message's static map, None when it has none or it
+    # couldn't be fetched, in which case the message goes out without it.
+    # Every sink asks for it, but the map cache fetches it once.
+    def mapImage(self, message):
+        if "map" not in message:
+            return None
+        try:
+            return self.messageBuilder.getMapImage(message["map"])
+        except Exception as e:
+            metrics.increment("maps.fetch_failures")
+            print(f"Error fetching static map, posting without it: {e}", flush=True)
+            return None
\ No newline at end of file
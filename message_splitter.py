@@ -0,0 +1,59 @@
+# Splits long alert messages into chunks that fit a platform's length limit.
+# Shared by the Telegram and Mastodon bots, which count length differently.
+
+# Telegram counts message length in UTF-16 code units: characters outside the
+# Basic Multilingual Plane (emoji, some symbols) count twice
+def utf16Length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+# Splits content into as few chunks as possible, each at most maxLength as
+# measured by lengthFunction. Lines are kept whole and in order, each ending
+# with a newline; only a line that can't fit in a chunk by itself is cut.
+# Chunks are built from lists of lines and joined once, so the cost is linear
+# in the length of the content.
+def splitMessage(content, maxLength, lengthFunction=len):
+    if lengthFunction is utf16Length and utf16Length(content) == len(content):
+        # Nothing outside the BMP, so every character is one code unit
+        lengthFunction = len
+    chunks = []
+    lines = []
+    used = 0
+    for line in content.splitlines():
+        size = lengthFunction(line) + 1
+        if size > maxLength:
+            if lines:
+                chunks.append("".join(lines))
+                lines = []
+                used = 0
+            pieces = hardSplit(line, maxLength - 1, lengthFunction)
+            line = pieces.pop()
+            chunks.extend(pieces)
+            size = lengthFunction(line) + 1
+        elif used + size > maxLength:
+            chunks.append("".join(lines))
+            lines = []
+            used = 0
+        lines.append(line)
+        lines.append("\n")
+        used += size
+    if lines:
+        chunks.append("".join(lines))
+    return chunks
+
+# Cuts a single overlong line into pieces of at most limit
+def hardSplit(line, limit, lengthFunction):
+    if lengthFunction is len:
+        return [line[start:start + limit] for start in range(0, len(line), limit)]
+
+    pieces = []
+    start = 0
+    used = 0
+    for index, char in enumerate(line):
+        width = lengthFunction(char)
+        if used + width > limit:
+            pieces.append(line[start:index])
+            start = index
+            used = 0
+        used += width
+    pieces.append(line[start:])
+    return pieces
@@ -0,0 +1,55 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+# Snapshot of all metrics, refreshed alongside the K8s heartbeat
+METRICS_FILE = Path(os.environ.get("METRICS_FILE", "/tmp/metrics.json"))
+
+# Minimal process-wide registry of counters and gauges. Names are dotted,
+# e.g. "post_queue.dropped" or "sink.telegram.failures".
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def setGauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    # Keeps the highest value ever set for the gauge
+    def setMaxGauge(self, name, value):
+        with self.lock:
+            if value > self.gauges.get(name, value - 1):
+                self.gauges[name] = value
+
+    def counter(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def gauge(self, name):
+        with self.lock:
+            return self.gauges.get(name)
+
+    def snapshot(self):
+        with self.lock:
+            return {"counters": dict(self.counters), "gauges": dict(self.gauges)}
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+
+    def writeToFile(self, path=METRICS_FILE):
+        try:
+            Path(path).write_text(json.dumps(self.snapshot(), indent=2, sort_keys=True))
+        except Exception as e:
+            print(f"Error writing metrics file: {e}", flush=True)
+
+
+metrics = Metrics()
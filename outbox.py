@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from metrics import metrics
+
+# Local SQLite file holding received events until every sink has posted them.
+# Empty disables the outbox.
+OUTBOX_PATH = os.environ.get("OUTBOX_PATH", "outbox.db").strip()
+# Writes are committed in groups: after this many statements or this many
+# milliseconds, whichever comes first
+OUTBOX_COMMIT_BATCH = int(os.environ.get("OUTBOX_COMMIT_BATCH", 64))
+OUTBOX_COMMIT_INTERVAL_MS = int(os.environ.get("OUTBOX_COMMIT_INTERVAL_MS", 50))
+
+# Per-sink delivery states. A dead delivery is one that can never be
+# posted; its event is kept for inspection but never replayed.
+PENDING = "pending"
+DELIVERED = "delivered"
+DEAD = "dead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    message_id INTEGER NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    sink TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (message_id, sink)
+);
+CREATE INDEX IF NOT EXISTS deliveries_state ON deliveries(state, sink);
+"""
+
+# Durable at-least-once outbox. Every received event is recorded with one
+# delivery row per sink; a sink acks its row once it posted the event, and
+# the event is deleted when all sinks did. Whatever is still pending after
+# a restart is replayed, per sink.
+#
+# The database runs in WAL mode with synchronous=NORMAL: a commit survives
+# the process being killed, and only an OS crash can lose the last
+# transactions. Commits are batched so enqueue() stays off the hot path.
+class Outbox:
+    def __init__(self, path=OUTBOX_PATH, commitBatch=OUTBOX_COMMIT_BATCH, commitIntervalMs=OUTBOX_COMMIT_INTERVAL_MS):
+        self.path = path
+        self.commitBatch = commitBatch
+        self.commitInterval = commitIntervalMs / 1000
+        self.lock = threading.Lock()
+        self.uncommitted = 0
+        self.lastCommit = time.monotonic()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self.runFlusher, name="outbox-flusher", daemon=True)
+        self.flusher.start()
+
+    # Records an event for every sink and returns its outbox id
+    def enqueue(self, eventData, sinks):
+        now = time.time()
+        payload = json.dumps(eventData, ensure_ascii=False)
+        with self.lock:
+            self.begin()
+            cursor = self.connection.execute("INSERT INTO messages (payload, created) VALUES (?, ?)", (payload, now))
+            messageId = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO deliveries (message_id, sink, state, updated) VALUES (?, ?, ?, ?)",
+                [(messageId, sink, PENDING, now) for sink in sinks]
+            )
+            self.wrote()
+        metrics.increment("outbox.enqueued")
+        return messageId
+
+    # Records that the sink posted the events; events every sink posted are
+    # removed
+    def ack(self, messageIds, sink):
+        if not messageIds:
+            return
+        with self.lock:
+            self.begin()
+            self.connection.executemany(
+                "UPDATE deliveries SET state = ?, updated = ? WHERE message_id = ? AND sink = ?",
+                [(DELIVERED, time.time(), messageId, sink) for messageId in messageIds]
+            )
+            self.connection.executemany(
+                "DELETE FROM messages WHERE id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM deliveries WHERE message_id = ? AND state != ?)",
+                [(messageId, messageId, DELIVERED) for messageId in messageIds]
+            )
+            self.wrote(len(messageIds))
+        metrics.increment(f"outbox.acked.{sink.lower()}", len(messageIds))
+
+    # Hands the deliveries back so they're retried later
+    def release(self, messageIds, sink):
+        if not messageIds:
+            return
+        with self.lock:
+            self.begin()
+            self.connection.executemany(
+                "UPDATE deliveries SET state = ?, updated = ? WHERE message_id = ? AND sink = ?",
+                [(PENDING, time.time(), messageId, sink) for messageId in messageIds]
+            )
+            self.wrote(len(messageIds))
+        metrics.increment(f"outbox.released.{sink.lower()}", len(messageIds))
+
+    # Gives up on the sink's deliveries of events it can never post, e.g.
+    # ones no message can be built from, so they aren't replayed on every
+    # restart
+    def deadLetter(self, messageIds, sink):
+        if not messageIds:
+            return
+        with self.lock:
+            self.begin()
+            self.connection.executemany(
+                "UPDATE deliveries SET state = ?, updated = ? WHERE message_id = ? AND sink = ? AND state = ?",
+                [(DEAD, time.time(), messageId, sink, PENDING) for messageId in messageIds]
+            )
+            self.wrote(len(messageIds))
+        metrics.increment(f"outbox.dead_lettered.{sink.lower()}", len(messageIds))
+
+    # Returns {id: (eventData, [sinks still pending])} for every undelivered
+    # event, oldest first
+    def pending(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT m.id, m.payload, d.sink FROM deliveries d JOIN messages m ON m.id = d.message_id "
+                "WHERE d.state = ? ORDER BY m.id, d.rowid",
+                (PENDING,)
+            ).fetchall()
+        pending = {}
+        for messageId, payload, sink in rows:
+            if messageId not in pending:
+                pending[messageId] = (json.loads(payload), [])
+            pending[messageId][1].append(sink)
+        return pending
+
+    def flush(self):
+        with self.lock:
+            self.commit()
+
+    def close(self):
+        self.closed.set()
+        self.flusher.join(1)
+        with self.lock:
+            self.commit()
+            self.connection.close()
+
+    # Helpers below expect the caller to hold the lock
+    def begin(self):
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+
+    def wrote(self, statements=1):
+        self.uncommitted += statements
+        if self.uncommitted >= self.commitBatch or time.monotonic() - self.lastCommit >= self.commitInterval:
+            self.commit()
+
+    def commit(self):
+        if self.connection.in_transaction:
+            self.connection.execute("COMMIT")
+            metrics.increment("outbox.commits")
+        self.uncommitted = 0
+        self.lastCommit = time.monotonic()
+
+    # Commits stragglers once the interval elapsed without new writes
+    def runFlusher(self):
+        while not self.closed.wait(self.commitInterval):
+            try:
+                with self.lock:
+                    if self.uncommitted:
+                        self.commit()
+            except Exception as e:
+                print(f"{datetime.now()} - Error Outbox.runFlusher(): {e}", flush=True)
+
+# Records every event in the outbox before passing it on to the next stage
+# (an AlertCoalescer or PostQueue), tagging it with its outbox id so the
+# MessageManager can ack it per sink once posted
+class OutboxRecorder:
+    def __init__(self, outbox, nextStage, sinks):
+        self.outbox = outbox
+        self.nextStage = nextStage
+        self.sinks = list(sinks)
+        # Ingest checks this to know whether put() may block
+        self.overflowPolicy = nextStage.overflowPolicy
+
+    def put(self, eventData):
+        try:
+            eventData["outboxIds"] = [self.outbox.enqueue(eventData, self.sinks)]
+        except Exception as e:
+            # Still post the event, just without the durability guarantee
+            print(f"{datetime.now()} - Error OutboxRecorder.put(): {e}", flush=True)
+        self.nextStage.put(eventData)
@@ -0,0 +1,79 @@
+# Douglas-Peucker simplification of the location polygons, so that many
+# more of them fit in one Mapbox static map URL
+
+# Tolerances in degrees of the simplification levels precomputed for every
+# polygon: roughly 0, 10, 30, 100 and 300 metres. Level 0 is the polygon as
+# published.
+SIMPLIFY_TOLERANCES = (0, 0.0001, 0.0003, 0.001, 0.003)
+# A closed ring needs three corners plus the point closing it
+MIN_RING_POINTS = 4
+
+# Returns the points of the polygon (or line) that Douglas-Peucker keeps at
+# the given tolerance: no dropped point is further than tolerance from the
+# simplified outline. A ring that would collapse is returned as it is.
+def simplify(points, tolerance):
+    count = len(points)
+    if tolerance <= 0 or count <= MIN_RING_POINTS:
+        return list(points)
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    # Iterative, so the largest polygons can't hit the recursion limit
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        index, distance = farthestPoint(points, first, last)
+        if distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    simplified = [point for point, kept in zip(points, keep) if kept]
+    if len(simplified) < MIN_RING_POINTS:
+        return list(points)
+    return simplified
+
+# The point strictly between first and last furthest from the segment
+# joining them, and its distance. For a closed ring first and last are the
+# same point, and distance is measured from it.
+def farthestPoint(points, first, last):
+    ax, ay = points[first]
+    bx, by = points[last]
+    dx = bx - ax
+    dy = by - ay
+    lengthSquared = dx * dx + dy * dy
+    farthest = first + 1
+    maxSquared = -1.0
+    for index in range(first + 1, last):
+        px, py = points[index]
+        if lengthSquared:
+            t = ((px - ax) * dx + (py - ay) * dy) / lengthSquared
+            t = 0.0 if t < 0 else 1.0 if t > 1 else t
+            ex = ax + t * dx - px
+            ey = ay + t * dy - py
+        else:
+            ex = ax - px
+            ey = ay - py
+        squared = ex * ex + ey * ey
+        if squared > maxSquared:
+            maxSquared = squared
+            farthest = index
+    return farthest, maxSquared ** 0.5
+
+# Diagonal of the polygon's bounding box, in degrees
+def extent(points):
+    lats = [point[0] for point in points]
+    lons = [point[1] for point in points]
+    return ((max(lats) - min(lats)) ** 2 + (max(lons) - min(lons)) ** 2) ** 0.5
+
+# Index of the coarsest level whose tolerance keeps the simplification
+# error within `fidelity` of the polygon's size
+def coarsestLevel(points, tolerances, fidelity):
+    budget = fidelity * extent(points) if points else 0
+    level = 0
+    for index, tolerance in enumerate(tolerances):
+        if tolerance <= budget:
+            level = index
+    return level
@@ -0,0 +1,100 @@
+import mmap
+import struct
+import sys
+from array import array
+from polygon_simplifier import SIMPLIFY_TOLERANCES, simplify
+
+# Binary form of polygons.json, built by script/build_polygon_store.py and
+# memory-mapped read-only at runtime. Every polygon is stored at each
+# simplification level, level 0 being the polygon as published.
+# Little-endian:
+#   header      - magic, polygon count, coordinate scale, level count
+#   tolerances  - float64 simplification tolerance of each level, in degrees
+#   index       - taCityId then (first point, point count) of each level,
+#                 per polygon, by taCityId
+#   points      - (lat, lon) pairs as int32 fixed point, coordinate * scale
+MAGIC = b"RAPOLY02"
+HEADER = struct.Struct("<8sIII")
+POINT_SIZE = 8
+# Five decimals, the precision the map overlays are encoded at
+COORDINATE_SCALE = 100000
+# array("i") holds native-order int32s
+SWAP_BYTES = sys.byteorder != "little"
+
+def indexEntry(levels):
+    return struct.Struct("<i" + "II" * levels)
+
+# Writes {taCityId: [[lat, lon], ...]} as a polygon store, simplified at
+# each of the tolerances
+def buildPolygonStore(polygons, path, scale=COORDINATE_SCALE, tolerances=SIMPLIFY_TOLERANCES):
+    entry = indexEntry(len(tolerances))
+    index = []
+    points = array("i")
+    for cityId in sorted(polygons, key=int):
+        spans = []
+        for tolerance in tolerances:
+            polygon = simplify(polygons[cityId], tolerance)
+            spans += [len(points) // 2, len(polygon)]
+            for lat, lon in polygon:
+                points.append(round(lat * scale))
+                points.append(round(lon * scale))
+        index.append(entry.pack(int(cityId), *spans))
+    if SWAP_BYTES:
+        points.byteswap()
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(index), scale, len(tolerances)))
+        file.write(struct.pack(f"<{len(tolerances)}d", *tolerances))
+        file.write(b"".join(index))
+        file.write(points.tobytes())
+
+# Read-only view of a polygon store. Only the index is read at startup; a
+# polygon's points are decoded from the mapped file when it's asked for.
+class PolygonStore:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, self.scale, levels = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not a polygon store")
+        self.tolerances = struct.unpack_from(f"<{levels}d", self.map, HEADER.size)
+        indexOffset = HEADER.size + 8 * levels
+        entry = indexEntry(levels)
+        self.pointsOffset = indexOffset + count * entry.size
+        # taCityId -> (first point, point count, first point, ...) by level
+        self.index = {
+            fields[0]: fields[1:]
+            for fields in entry.iter_unpack(self.map[indexOffset:self.pointsOffset])
+        }
+
+    # Returns the polygon's [(lat, lon), ...] at the simplification level,
+    # None if the store hasn't got one. Accepts the taCityId as an int or a
+    # string, like polygons.json.
+    def get(self, cityId, default=None, level=0):
+        try:
+            spans = self.index[int(cityId)]
+        except (KeyError, ValueError):
+            return default
+        first, length = spans[2 * level], spans[2 * level + 1]
+        start = self.pointsOffset + first * POINT_SIZE
+        coordinates = array("i", self.map[start:start + length * POINT_SIZE])
+        if SWAP_BYTES:
+            coordinates.byteswap()
+        scale = self.scale
+        return [(coordinates[i] / scale, coordinates[i + 1] / scale) for i in range(0, len(coordinates), 2)]
+
+    def __contains__(self, cityId):
+        try:
+            return int(cityId) in self.index
+        except ValueError:
+            return False
+
+    def __len__(self):
+        return len(self.index)
+
+    # taCityIds as strings, like the keys of polygons.json
+    def __iter__(self):
+        return (str(cityId) for cityId in self.index)
+
+    def close(self):
+        self.map.close()
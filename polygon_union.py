@@ -0,0 +1,94 @@
+# Merges neighbouring location polygons into one outline, so a whole area
+# can go on a static map as a single overlay instead of one per location.
+#
+# Neighbouring polygons in polygons.json trace their shared border through
+# the same points. With every ring turned counter-clockwise, each edge of a
+# shared border appears twice, running opposite ways, and cancelling those
+# pairs leaves only the edges on the outside of the group. The rest are
+# walked back into rings. Linear in the number of points.
+
+# Holes in the union bigger than this share of its area are real (an
+# enclosed location that isn't in the group); smaller ones are slivers
+# where two borders don't quite meet
+UNION_HOLE_TOLERANCE = 0.01
+
+# Twice the signed area of a ring of (lat, lon) points, positive when it
+# runs counter-clockwise
+def signedArea(ring):
+    area = 0.0
+    previousLat, previousLon = ring[-1]
+    for lat, lon in ring:
+        area += previousLon * lat - lon * previousLat
+        previousLat, previousLon = lat, lon
+    return area
+
+# The ring's points as tuples, without the point repeating the first
+def openRing(polygon):
+    ring = [tuple(point) for point in polygon]
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+    return ring
+
+# Returns (rings, separate): the outline of the polygons that border
+# another as closed rings, one per patch, and the indices of those that
+# border none and so are their own outline. None when the union has a hole
+# that a filled overlay would paint over.
+def unionPolygons(polygons, holeTolerance=UNION_HOLE_TOLERANCE):
+    # Directed edge -> [times it's on the outside so far, polygon it's from]
+    edges = {}
+    touched = set()
+    valid = []
+    for position, polygon in enumerate(polygons):
+        ring = openRing(polygon)
+        if len(ring) < 3:
+            continue
+        valid.append(position)
+        if signedArea(ring) < 0:
+            ring.reverse()
+        previous = ring[-1]
+        for point in ring:
+            if point != previous:
+                edge = (previous, point)
+                reverse = (point, previous)
+                if reverse in edges:
+                    # A border shared with a polygon already added
+                    entry = edges[reverse]
+                    touched.add(position)
+                    touched.add(entry[1])
+                    if entry[0] == 1:
+                        del edges[reverse]
+                    else:
+                        entry[0] -= 1
+                elif edge in edges:
+                    # The same edge twice, from overlapping polygons
+                    edges[edge][0] += 1
+                    touched.add(position)
+                    touched.add(edges[edge][1])
+                else:
+                    edges[edge] = [1, position]
+            previous = point
+
+    rings = stitchRings({edge: entry[0] for edge, entry in edges.items() if entry[1] in touched})
+    outers = [ring for ring in rings if signedArea(ring) > 0]
+    holes = [ring for ring in rings if signedArea(ring) < 0]
+    if -sum(signedArea(ring) for ring in holes) > holeTolerance * sum(signedArea(ring) for ring in outers):
+        return None
+    return [ring + ring[:1] for ring in outers], [position for position in valid if position not in touched]
+
+# Walks the remaining edges into rings. Every point has as many edges
+# leaving it as arriving, so a walk can only end where it started.
+def stitchRings(edges):
+    outgoing = {}
+    for (start, end), count in edges.items():
+        outgoing.setdefault(start, []).extend([end] * count)
+    rings = []
+    for start in list(outgoing):
+        while outgoing[start]:
+            ring = [start]
+            point = outgoing[start].pop()
+            while point != start:
+                ring.append(point)
+                point = outgoing[point].pop()
+            if len(ring) >= 3:
+                rings.append(ring)
+    return rings
@@ -0,0 +1,144 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import datetime
+from metrics import metrics
+from deadlines import deadlineKey, eventDeadline, popOverflow
+
+# What put() does when the queue is full:
+#   block       - wait for a worker to free a slot (ingest is held back)
+#   drop-oldest - discard a queued event that's past its deadline, or the
+#                 one queued first when none is
+#   coalesce    - merge the event into a queued event of the same alert type,
+#                 falling back to drop-oldest when there is none
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop-oldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+POST_QUEUE_SIZE = int(os.environ.get("POST_QUEUE_SIZE", 100))
+POST_QUEUE_OVERFLOW = os.environ.get("POST_QUEUE_OVERFLOW", OVERFLOW_COALESCE).strip().lower()
+POST_WORKERS = int(os.environ.get("POST_WORKERS", 2))
+
+# Bounded queue between ingest and the posting workers. Events are stamped
+# with their delivery deadline ("deadline") and handed out earliest deadline
+# first, so a backlog never holds a fresh alert behind older ones.
+class PostQueue:
+    def __init__(self, maxSize=POST_QUEUE_SIZE, overflowPolicy=POST_QUEUE_OVERFLOW):
+        if overflowPolicy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflowPolicy}', expected one of {OVERFLOW_POLICIES}")
+        self.maxSize = maxSize
+        self.overflowPolicy = overflowPolicy
+        # Heap of (deadline key, arrival sequence, eventData, enqueuedAt)
+        self.items = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+    def put(self, eventData):
+        if "deadline" not in eventData:
+            eventData["deadline"] = eventDeadline(eventData)
+        with self.condition:
+            if len(self.items) >= self.maxSize:
+                if self.overflowPolicy == OVERFLOW_BLOCK:
+                    metrics.increment("post_queue.blocked")
+                    while len(self.items) >= self.maxSize and not self.closed:
+                        self.condition.wait()
+                elif self.overflowPolicy == OVERFLOW_COALESCE and self.coalesce(eventData):
+                    metrics.increment("post_queue.coalesced")
+                    return
+                else:
+                    popOverflow(self.items)
+                    metrics.increment("post_queue.dropped")
+                    print(f"{datetime.now()} - Post queue full, dropped a stale or the oldest event", flush=True)
+
+            heapq.heappush(self.items, (deadlineKey(eventData["deadline"]), next(self.sequence), eventData, time.monotonic()))
+            metrics.increment("post_queue.enqueued")
+            self.updateDepth()
+            self.condition.notify_all()
+
+    # Merges the event's alerts into the newest queued event of the same
+    # alert type. Caller holds the lock.
+    def coalesce(self, eventData):
+        alertTypeId = eventData.get("alertTypeId")
+        candidates = [item for item in self.items if item[2].get("alertTypeId") == alertTypeId]
+        if not candidates:
+            return False
+        index = self.items.index(max(candidates, key=lambda item: item[1]))
+        _, sequence, queued, enqueuedAt = self.items[index]
+        queuedAlerts = queued["alerts"] if isinstance(queued["alerts"], list) else [queued["alerts"]]
+        newAlerts = eventData["alerts"] if isinstance(eventData["alerts"], list) else [eventData["alerts"]]
+        queued["alerts"] = queuedAlerts + newAlerts
+        if "outboxIds" in eventData:
+            queued["outboxIds"] = queued.get("outboxIds", []) + eventData["outboxIds"]
+        # The merged event is useful for as long as its freshest alert is
+        if queued["deadline"] is None or (eventData["deadline"] is not None and eventData["deadline"] > queued["deadline"]):
+            queued["deadline"] = eventData["deadline"]
+        self.items[index] = (deadlineKey(queued["deadline"]), sequence, queued, enqueuedAt)
+        heapq.heapify(self.items)
+        return True
+
+    # Returns the event with the earliest deadline, or None once the queue is closed and drained
+    # (or the timeout expires)
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return None
+            _, _, eventData, enqueuedAt = heapq.heappop(self.items)
+            metrics.setGauge("post_queue.last_wait_ms", round((time.monotonic() - enqueuedAt) * 1000, 1))
+            self.updateDepth()
+            self.condition.notify_all()
+            return eventData
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def updateDepth(self):
+        metrics.setGauge("post_queue.depth", len(self.items))
+        metrics.setMaxGauge("post_queue.max_depth", len(self.items))
+
+# Pool of threads posting events taken off a PostQueue
+class PostingWorkers:
+    def __init__(self, postQueue, postMessage, count=POST_WORKERS):
+        self.postQueue = postQueue
+        self.postMessage = postMessage
+        self.threads = [
+            threading.Thread(target=self.run, name=f"poster-{index}", daemon=True)
+            for index in range(max(count, 1))
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def run(self):
+        while True:
+            eventData = self.postQueue.get()
+            if eventData is None:
+                return
+            print(f"{datetime.now()} - Processing event...")
+            try:
+                self.postMessage(eventData)
+                metrics.increment("post_queue.posted")
+            except Exception as e:
+                metrics.increment("post_queue.failed")
+                print(f"{datetime.now()} - Error PostingWorkers.run(): {e}", flush=True)
+                continue
+            print(f"{datetime.now()} - Event process completed.\n")
+
+    # Stops the workers once everything queued has been posted
+    def stop(self, timeout=None):
+        self.postQueue.close()
+        for thread in self.threads:
+            thread.join(timeout)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from datetime import datetime
+from metrics import metrics
+
+# How many times one message is re-sent after the server said to slow down
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", 5))
+# Longest a request waits inline for a token. A longer wait raises Throttled
+# so the caller can put the request aside instead of holding its thread.
+RATE_LIMIT_MAX_WAIT_SEC = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SEC", 1))
+
+# Raised instead of waiting longer than maxWait for a token
+class Throttled(Exception):
+    def __init__(self, name, retryIn):
+        super().__init__(f"{name} throttled for {retryIn:.1f}s")
+        self.retryIn = retryIn
+
+# Holds up to `capacity` tokens and refills `rate` tokens per second. Every
+# request takes a token; a server back-off hint holds every request back
+# until the hinted time.
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updatedAt = clock()
+        self.blockedUntil = 0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updatedAt) * self.rate)
+        self.updatedAt = now
+
+    # Seconds until a token is available, 0 if one is available now
+    def delay(self):
+        now = self.clock()
+        self.refill(now)
+        wait = max(self.blockedUntil - now, 0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self.refill(self.clock())
+        self.tokens -= 1
+
+    # No requests until `seconds` from now
+    def pause(self, seconds):
+        now = self.clock()
+        self.blockedUntil = max(self.blockedUntil, now + seconds)
+
+    # Aligns the bucket with the server's own count of requests left, which
+    # is authoritative: other clients may share the same limit. Once the
+    # server's window is used up nothing goes out until it resets, and then
+    # the next responses' counts take over again.
+    def sync(self, remaining, resetIn):
+        now = self.clock()
+        self.refill(now)
+        if remaining <= 0 and resetIn > 0:
+            self.blockedUntil = max(self.blockedUntil, now + resetIn)
+            self.tokens = self.capacity
+        else:
+            self.tokens = min(self.tokens, remaining)
+
+# Schedules one sink's requests so that every one of its buckets (e.g.
+# per-chat and global) has a token before a request goes out
+class RateLimiter:
+    def __init__(self, name, buckets, sleep=time.sleep, maxRetries=RATE_LIMIT_MAX_RETRIES, maxWait=RATE_LIMIT_MAX_WAIT_SEC):
+        self.name = name
+        self.buckets = buckets
+        self.sleep = sleep
+        self.maxRetries = maxRetries
+        self.maxWait = maxWait
+        self.lock = threading.Lock()
+
+    # Blocks until every bucket has a token, then takes them. Returns the
+    # seconds spent waiting. Raises Throttled rather than wait longer than
+    # maxWait.
+    def acquire(self):
+        waited = 0
+        while True:
+            with self.lock:
+                wait = max(bucket.delay() for bucket in self.buckets)
+                if wait <= 0:
+                    for bucket in self.buckets:
+                        bucket.take()
+                    break
+            if wait > self.maxWait:
+                metrics.increment(f"sink.{self.name}.deferred")
+                raise Throttled(self.name, wait)
+            self.sleep(wait)
+            waited += wait
+        if waited:
+            metrics.increment(f"sink.{self.name}.throttled_ms", round(waited * 1000))
+        return waited
+
+    def backOff(self, seconds):
+        with self.lock:
+            for bucket in self.buckets:
+                bucket.pause(seconds)
+
+    # Calls send() once a token is available. When it's rejected for going
+    # too fast (retryAfter(error) returns the seconds the server asked us to
+    # wait), backs off and sends it again instead of dropping it, or raises
+    # Throttled if the back-off is longer than maxWait.
+    def run(self, send, retryAfter):
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return send()
+            except Exception as e:
+                delay = retryAfter(e)
+                if delay is None or attempt >= self.maxRetries:
+                    raise
+                attempt += 1
+                metrics.increment(f"sink.{self.name}.rate_limited")
+                print(f"{datetime.now()} - {self.name} rate limited, retrying in {delay:.1f}s", flush=True)
+                self.backOff(delay)
@@ -0,0 +1,43 @@
+import threading
+from message_splitter import splitMessage
+from metrics import metrics
+
+# A message's text that also remembers how each sink posts it. It is a str,
+# so anything taking the plain text still works. A sink asks for its format
+# with variant(); the text is rendered and split for that format the first
+# time, and every later request for it (another sink with the same format,
+# or a re-post after a failure) gets the same chunks back. A summary stands
+# in for an alert's locations rather than listing them.
+class RenderedMessage(str):
+    def __new__(cls, text, summary=False):
+        message = super().__new__(cls, text)
+        message.variants = {}
+        message.lock = threading.Lock()
+        message.summary = summary
+        # (sink name, format name) -> chunks of it the sink already posted,
+        # so its re-post after a throttle or a failure picks up after them.
+        # Sinks sharing a format share its chunks but not their progress.
+        message.posted = {}
+        return message
+
+    # The alert type and timestamp line, which identifies the alert window
+    @property
+    def header(self):
+        return self.partition("\n")[0]
+
+    # Returns render(text) as a list of chunks, each at most maxLength as
+    # measured by lengthFunction. `name` identifies the rendering, so every
+    # caller of one name must pass the same render function.
+    def variant(self, name, render, maxLength, lengthFunction=len):
+        key = (name, maxLength)
+        with self.lock:
+            chunks = self.variants.get(key)
+            if chunks is None:
+                content = render(str(self))
+                if lengthFunction(content) > maxLength:
+                    chunks = splitMessage(content, maxLength, lengthFunction)
+                else:
+                    chunks = [content]
+                self.variants[key] = chunks
+                metrics.increment(f"render.{name}")
+            return chunks
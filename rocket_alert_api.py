@@ -1,9 +1,53 @@
 # from datetime import date
 import requests
 import os
+import time
+from collections import deque
+from datetime import datetime
+from sse_parser import SSEParser
+from keepalive_watchdog import KeepAliveWatchdog
+
+# Same chunk size requests' iter_lines() reads with, so a keepalive is never
+# held back waiting for a bigger read to fill up
+READ_CHUNK_SIZE = 512
+
+# Number of recently delivered event ids remembered to drop server replays
+REPLAY_BUFFER_SIZE = int(os.environ.get('REPLAY_BUFFER_SIZE', 256))
+
+# Seconds to wait before reconnecting after a connection error, unless the
+# server asked for something else with an SSE "retry:" field
+DEFAULT_RECONNECT_DELAY = 5
+
+# Smallest socket timeout the watchdog arms; a zero timeout would switch the
+# socket to non-blocking mode instead of timing out
+MIN_SOCKET_TIMEOUT = 1
+
+# Bounded, insertion-ordered set of recently seen keys
+class ReplayBuffer:
+    def __init__(self, size=REPLAY_BUFFER_SIZE):
+        self.keys = deque(maxlen=size)
+        self.index = set()
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Returns False if the key was already remembered, otherwise remembers it
+    # (evicting the oldest key when full) and returns True
+    def remember(self, key):
+        if key in self.index:
+            return False
+        if len(self.keys) == self.keys.maxlen:
+            self.index.discard(self.keys[0])
+        self.keys.append(key)
+        self.index.add(key)
+        return True
+
 class RocketAlertAPI:
-    def __init__(self):
-        self.baseURL = os.environ['RA_BASEURL'].strip()
+    def __init__(self, baseURL=None):
+        self.baseURL = (baseURL or os.environ['RA_BASEURL']).strip()
         self.customHeaderValue = os.environ['CUSTOM_HEADER_VALUE'].strip()
         self.customHeaderKey = os.environ['CUSTOM_HEADER_KEY'].strip()
         self.headers = {
@@ -11,6 +55,11 @@ class RocketAlertAPI:
             # Custom header to please CF
             "user-agent": "Mozilla/5.0 (X11; Linux x86_64; rv:60.0) Gecko/20100101 Firefox/81.0"
         }
+        # Id of the last event handed to the caller, sent back on reconnect
+        self.lastEventId = None
+        self.deliveredEventIds = ReplayBuffer()
+        self.reconnectDelay = DEFAULT_RECONNECT_DELAY
+        self.watchdog = KeepAliveWatchdog()
 
     def listenToServerEvents(self):
         print(f"DEBUG: Connecting to {self.baseURL}/real-time?alertTypeId=-2...", flush=True)
@@ -19,9 +68,112 @@ class RocketAlertAPI:
         if self.customHeaderKey in safe_headers:
              safe_headers[self.customHeaderKey] = "***REDACTED***"
         print(f"DEBUG: Request Headers: {safe_headers}", flush=True)
+
+        headers = self.headers
+        if self.lastEventId:
+            print(f"DEBUG: Resuming after event id {self.lastEventId}", flush=True)
+            headers = {**self.headers, "Last-Event-ID": self.lastEventId}
         
         # Timeout: (connect_timeout, read_timeout)
         # Connect: 10s (fail fast if network down)
         # Read: 120s (server keepalive interval is ~65s, 2x for safety)
         read_timeout = int(os.environ.get('READ_TIMEOUT', 120))
-        return requests.get(f"{self.baseURL}/real-time?alertTypeId=-2", headers=self.headers, stream=True, timeout=(10, read_timeout))
+        return requests.get(f"{self.baseURL}/real-time?alertTypeId=-2", headers=headers, stream=True, timeout=(10, read_timeout))
+
+    # Yields decoded server events forever, reconnecting whenever the
+    # stream times out or drops. Reconnects resume from the last delivered
+    # event id, and events the server replays that were already delivered
+    # are skipped. A frame we can't decode is logged and consumed like any
+    # other, so resuming doesn't ask the server for it again.
+    def streamEvents(self):
+        while True:
+            # Set once this attempt's stream is up: only a stream that went
+            # quiet is reconnected to without a backoff
+            streaming = False
+            try:
+                print("DEBUG: Calling listenToServerEvents...", flush=True)
+                with self.listenToServerEvents() as response:
+                    print("DEBUG: Connection established. Listening for events...", flush=True)
+                    self.watchdog.connected()
+                    streaming = True
+                    parser = SSEParser()
+                    previousEventId = ""
+                    for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+                        for event in parser.feed(chunk):
+                            if parser.retry is not None:
+                                self.reconnectDelay = parser.retry / 1000
+                            if not event.data.strip():
+                                continue
+                            print(f"{datetime.now()} - Received server event: {event.data}")
+                            eventData = self.decodeEvent(event)
+                            if eventData is not None and self.isKeepAlive(eventData):
+                                self.watchdog.recordKeepAlive()
+                            isNew = self.isNewEvent(event, previousEventId)
+                            previousEventId = event.id
+                            if not isNew:
+                                print(f"{datetime.now()} - Skipping replayed event {event.id}")
+                                continue
+                            if event.id:
+                                self.lastEventId = event.id
+                            if eventData is not None:
+                                yield eventData
+                        self.armWatchdog(response)
+
+            except requests.exceptions.ReadTimeout:
+                print(f"{datetime.now()} - Connection timeout (no data received), reconnecting...")
+                continue
+            except requests.exceptions.ConnectionError as e:
+                if streaming and self.watchdog.isOverdue():
+                    print(f"{datetime.now()} - Keepalive overdue (expected within {self.watchdog.timeout():.1f}s), reconnecting...")
+                    continue
+                print(f"{datetime.now()} - Connection error: {e}")
+                time.sleep(self.reconnectDelay)  # Brief backoff before reconnecting
+                continue
+            except requests.exceptions.ChunkedEncodingError as err:
+                print(f"{datetime.now()} - Encountered 'InvalidChunkLength' error: {str(err)}")
+                continue
+            except Exception as e:
+                print(f"{datetime.now()} - Error streamEvents(): {e}")
+                time.sleep(5)  # Brief backoff on unexpected errors
+                continue  # Always try to reconnect
+
+    # Shrinks the socket read timeout to the time left until the next
+    # keepalive is overdue, so a half-dead connection times out as soon as
+    # the learned cadence says it should rather than after READ_TIMEOUT
+    def armWatchdog(self, response):
+        connection = getattr(response.raw, "connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            sock.settimeout(max(self.watchdog.remaining(), MIN_SOCKET_TIMEOUT))
+
+    # Returns False for an event whose id was already delivered. An id the
+    # parser carried over from the previous frame of the same connection
+    # says nothing about this frame, so it never marks a duplicate.
+    def isNewEvent(self, event, previousEventId):
+        if not event.id or event.id == previousEventId:
+            return True
+        return self.deliveredEventIds.remember(event.id)
+
+    # Returns the event's JSON object, None (after logging it) when the frame
+    # doesn't hold one
+    @staticmethod
+    def decodeEvent(event):
+        try:
+            eventData = event.json()
+        except ValueError as e:
+            print(f"{datetime.now()} - Error decoding JSON of event {event.id}: {e}")
+            return None
+        if not isinstance(eventData, dict):
+            print(f"{datetime.now()} - Skipping event {event.id}, not a JSON object")
+            return None
+        return eventData
+
+    # Returns True for the server's periodic KEEP_ALIVE event
+    @staticmethod
+    def isKeepAlive(eventData):
+        alert = eventData.get("alerts")
+        if isinstance(alert, list):
+            alert = alert[0] if alert else None
+        if not isinstance(alert, dict):
+            return False
+        return "KEEP_ALIVE" in str(alert.get("name") or "")
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# Converts polygons.json into the binary polygon store the bots map at
+# runtime. Run from the repo root (the Docker build does):
+#   python script/build_polygon_store.py [polygons.json] [polygons.bin]
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from polygon_store import buildPolygonStore
+
+def main(source="polygons.json", target="polygons.bin"):
+    with open(source, encoding="utf-8") as file:
+        polygons = json.load(file)
+    buildPolygonStore(polygons, target)
+    points = sum(len(polygon) for polygon in polygons.values())
+    print(f"Wrote {len(polygons)} polygons, {points} points: {os.path.getsize(source)} -> {os.path.getsize(target)} bytes")
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# Pre-renders the static map of every location and every area into the map
+# bundle the bots read at runtime. Needs MAPBOX_TOKEN and a city table with
+# every location's coordinates. Run from the repo root; safe to stop and run
+# again, it only fetches maps it hasn't got:
+#   python script/prerender_maps.py [cities.json] [map_bundle] [workers]
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from map_bundle import MAP_BUNDLE_DIR, PRERENDER_WORKERS, prerenderMaps
+from message_builder import CITY_TABLE_PATH, AlertMessageBuilder
+
+def main(cityTable=CITY_TABLE_PATH, directory=MAP_BUNDLE_DIR, workers=PRERENDER_WORKERS):
+    try:
+        with open(cityTable, encoding="utf-8") as file:
+            cities = json.load(file)
+    except (OSError, ValueError) as e:
+        # Maps without the alerts' pins would never match a live alert's
+        print(f"Can't read the city table at {cityTable}: {e}")
+        return 1
+    try:
+        result = prerenderMaps(AlertMessageBuilder(), cities, directory, int(workers))
+    except ValueError as e:
+        print(e)
+        return 1
+    print(f"Bundle {result['version']}: {result['maps']} maps, {result['rendered']} rendered, "
+          f"{result['reused']} unchanged, {result['failed']} failed, {result['removed']} removed")
+    return 1 if result["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:4]))
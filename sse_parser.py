@@ -0,0 +1,138 @@
+import json
+
+UTF8_BOM = b"\xef\xbb\xbf"
+
+class SSEEvent:
+    __slots__ = ("event", "data", "id")
+
+    def __init__(self, event, data, id):
+        self.event = event
+        self.data = data
+        self.id = id
+
+    def json(self):
+        return json.loads(self.data)
+
+    def __eq__(self, other):
+        if not isinstance(other, SSEEvent):
+            return NotImplemented
+        return (self.event, self.data, self.id) == (other.event, other.data, other.id)
+
+    def __repr__(self):
+        return f"SSEEvent(event={self.event!r}, data={self.data!r}, id={self.id!r})"
+
+
+# Incremental text/event-stream parser (WHATWG HTML "Server-sent events").
+# Raw chunks are appended to one reusable bytearray; lines are located with
+# bytearray.find and field values are sliced straight out of the buffer, so
+# nothing is decoded until a complete event is dispatched.
+class SSEParser:
+    def __init__(self):
+        self.buffer = bytearray()
+        # Persist across events, as the spec requires
+        self.lastEventId = ""
+        self.retry = None
+        self.dataLines = []
+        self.eventType = b""
+        self.streamStarted = False
+        self.skipLineFeed = False
+
+    # Appends a raw chunk and returns the list of events it completed
+    def feed(self, chunk):
+        buffer = self.buffer
+        buffer += chunk
+        if not self.streamStarted:
+            if len(buffer) < len(UTF8_BOM) and UTF8_BOM.startswith(bytes(buffer)):
+                return []
+            if buffer.startswith(UTF8_BOM):
+                del buffer[:len(UTF8_BOM)]
+            self.streamStarted = True
+
+        events = []
+        position = 0
+        if self.skipLineFeed and buffer[:1] == b"\n":
+            position = 1
+        self.skipLineFeed = False
+
+        if b"\r" not in buffer:
+            # Fast path: the server only uses LF line endings
+            while True:
+                end = buffer.find(b"\n", position)
+                if end == -1:
+                    break
+                self.processLine(buffer, position, end, events)
+                position = end + 1
+        else:
+            size = len(buffer)
+            lineFeed = -1
+            while True:
+                if lineFeed < position:
+                    lineFeed = buffer.find(b"\n", position)
+                    if lineFeed == -1:
+                        lineFeed = size
+                carriageReturn = buffer.find(b"\r", position, lineFeed)
+                if carriageReturn != -1:
+                    end = carriageReturn
+                    if end + 1 == size:
+                        # CR at the end of the chunk; a matching LF may follow
+                        self.skipLineFeed = True
+                        nextPosition = size
+                    elif buffer[end + 1] == 0x0A:
+                        nextPosition = end + 2
+                    else:
+                        nextPosition = end + 1
+                elif lineFeed != size:
+                    end = lineFeed
+                    nextPosition = end + 1
+                else:
+                    break
+                self.processLine(buffer, position, end, events)
+                position = nextPosition
+
+        if position:
+            del buffer[:position]
+        return events
+
+    def processLine(self, buffer, start, end, events):
+        if start == end:
+            self.dispatch(events)
+            return
+
+        colon = buffer.find(b":", start, end)
+        if colon == start:
+            # Comment line
+            return
+        if colon == -1:
+            colon = valueStart = end
+        else:
+            valueStart = colon + 1
+            if valueStart < end and buffer[valueStart] == 0x20:
+                valueStart += 1
+
+        # "data" is by far the most common field, so test it first
+        if colon - start == 4 and buffer.startswith(b"data", start):
+            self.dataLines.append(buffer[valueStart:end])
+            return
+
+        field = buffer[start:colon]
+        if field == b"event":
+            self.eventType = buffer[valueStart:end]
+        elif field == b"id":
+            value = buffer[valueStart:end]
+            if b"\0" not in value:
+                self.lastEventId = value.decode("utf-8", "replace")
+        elif field == b"retry":
+            value = buffer[valueStart:end]
+            if value.isdigit():
+                self.retry = int(value)
+
+    def dispatch(self, events):
+        dataLines = self.dataLines
+        eventType = self.eventType
+        self.dataLines = []
+        self.eventType = b""
+        if not dataLines:
+            return
+        data = b"\n".join(dataLines).decode("utf-8", "replace")
+        event = eventType.decode("utf-8", "replace") if eventType else "message"
+        events.append(SSEEvent(event, data, self.lastEventId))
@@ -1,10 +1,38 @@
 import os
 import sys
+from collections import OrderedDict
 from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+from message_splitter import splitMessage, utf16Length
+from rendered_message import RenderedMessage
+from rate_limiter import RateLimiter, Throttled, TokenBucket
+from metrics import metrics
 
 # Telegram's message character limit
 MAX_CHARACTERS = 4096
 TELEGRAM_FOOTER = "[RocketAlert.live](https://RocketAlert.live)"
+# Telegram's flood limits: about 20 messages a minute into one channel and 30
+# a second across all chats of a bot
+TELEGRAM_CHAT_RATE_PER_MIN = float(os.environ.get("TELEGRAM_CHAT_RATE_PER_MIN", 20))
+TELEGRAM_GLOBAL_RATE_PER_SEC = float(os.environ.get("TELEGRAM_GLOBAL_RATE_PER_SEC", 30))
+# Recent alert windows whose last message can still be edited to add
+# locations. 0 always posts a new message.
+TELEGRAM_EDIT_WINDOWS = int(os.environ.get("TELEGRAM_EDIT_WINDOWS", 16))
+# Name of the Markdown-with-footer rendering in a RenderedMessage
+TELEGRAM_FORMAT = "telegram"
+
+def renderTelegram(text):
+    return f"{text}{TELEGRAM_FOOTER}"
+
+# Seconds Telegram asked us to wait when it rejected a request with 429
+def telegramRetryAfter(error):
+    if isinstance(error, ApiTelegramException) and error.error_code == 429:
+        return float((error.result_json.get("parameters") or {}).get("retry_after", 1))
+    return None
+
+# The location lines of a message, in order and without repeats
+def locationLines(content):
+    return list(dict.fromkeys(line for line in content.partition("\n\n")[2].splitlines() if line))
 
 class TelegramBot:
     def __init__(self):
@@ -15,6 +43,14 @@ class TelegramBot:
 
         self.channel = os.environ.get("TELEGRAM_CHANNEL_ID", "@RocketAlert")
         self.bot = TeleBot(self.bot_token)
+        # What this sink's progress through a RenderedMessage is kept under
+        self.progressKey = ("telegram", TELEGRAM_FORMAT)
+        self.globalBucket = TokenBucket(TELEGRAM_GLOBAL_RATE_PER_SEC)
+        self.rateLimiters = {}
+        # Header line -> {"messageId", "body"} of the last message posted for
+        # that alert window, and "listed": every location line posted in any
+        # of its messages. Oldest window first.
+        self.windows = OrderedDict()
 
         print("DEBUG: Initializing TelegramBot...", flush=True)
 
@@ -26,40 +62,160 @@ class TelegramBot:
             print(f"CRITICAL ERROR: Failed to connect to Telegram: {e}", flush=True)
             sys.exit(1)
 
-    def sendMessage(self, content):
+    # Returns True once every part of the message was posted. Locations for
+    # an alert window that was already posted are added to its last message
+    # by editing it, as long as it stays within MAX_CHARACTERS. Locations
+    # the window already lists aren't posted again. A map image, PNG bytes,
+    # is posted as a photo after the text, unless the locations went into an
+    # edit. Raises Throttled when the rate limit holds the message back;
+    # posting it again carries on from its first unposted chunk.
+    def sendMessage(self, content, image=None):
         print("      To Telegram...", end="", flush=True)
-        content = f"{content}{TELEGRAM_FOOTER}"
-        if len(content) > MAX_CHARACTERS:
-            content = self.truncateToMaxMessageSize(content)
+        if isinstance(content, str) and not isinstance(content, RenderedMessage):
+            content = RenderedMessage(content)
+        # The header line names the alert type and timestamp, so it
+        # identifies the alert window. Summaries share the header but list no
+        # locations, so they're kept out of it.
+        header = None
+        lines = []
+        if isinstance(content, RenderedMessage) and not content.summary:
+            header = content.header
+            lines = locationLines(content)
+        # A message cut short has its posted chunks in the window already
+        resuming = isinstance(content, RenderedMessage) and self.progressKey in content.posted
+        if header in self.windows and not resuming:
+            listed = self.windows[header]["listed"]
+            lines = [line for line in lines if line not in listed]
+            if not lines:
+                # Nothing new, e.g. the same event posted again
+                print("done.", flush=True)
+                return True
+            try:
+                edited = self.appendToWindow(header, lines)
+            except Throttled:
+                print("throttled.", flush=True)
+                raise
+            if edited:
+                print("done.", flush=True)
+                return True
+            # Only the locations the window doesn't list go into the new message
+            content = RenderedMessage(f"{header}\n\n" + "".join(f"{line}\n" for line in lines) + "\n")
+
+        progress = None
+        if isinstance(content, RenderedMessage):
+            progress = content.posted
+            chunks = content.variant(TELEGRAM_FORMAT, renderTelegram, MAX_CHARACTERS, utf16Length)
         else:
-            if not isinstance(content, (list)):
-                content = [content]
+            chunks = renderTelegram(content)
+            if utf16Length(chunks) > MAX_CHARACTERS:
+                chunks = self.truncateToMaxMessageSize(chunks)
+            else:
+                chunks = [chunks]
 
+        delivered = True
+        rateLimiter = self.rateLimiterFor(self.channel)
+        start = progress.get(self.progressKey, 0) if progress is not None else 0
+        wanted = set(lines)
         try:
-            for message in content:
-                self.bot.send_message(
-                    chat_id=self.channel,
-                    text=message,
-                    parse_mode='Markdown',
-                    disable_web_page_preview=True
+            # The map comes last, and counts as one more chunk when resuming
+            for index in range(start, len(chunks) + (image is not None)):
+                if index == len(chunks):
+                    self.sendMap(image)
+                    if progress is not None:
+                        progress[self.progressKey] = index + 1
+                    break
+                message = chunks[index]
+                posted = rateLimiter.run(
+                    lambda: self.bot.send_message(
+                        chat_id=self.channel,
+                        text=message,
+                        parse_mode='Markdown',
+                        disable_web_page_preview=True
+                    ),
+                    telegramRetryAfter
                 )
+                metrics.increment("sink.telegram.messages_sent")
+                if progress is not None:
+                    progress[self.progressKey] = index + 1
+                self.rememberWindow(header, posted.message_id, message, [line for line in message.splitlines() if line in wanted])
+        except Throttled:
+            print("throttled.", flush=True)
+            raise
         except Exception as e:
             print(f"Error posting message to Telegram: {e}", flush=True)
+            delivered = False
         print("done.", flush=True)
+        return delivered
+
+    # Posts a static map as a photo. The text is already out, so a map
+    # Telegram won't take is left out rather than failing the message.
+    def sendMap(self, image):
+        try:
+            self.rateLimiterFor(self.channel).run(
+                lambda: self.bot.send_photo(chat_id=self.channel, photo=image),
+                telegramRetryAfter
+            )
+        except Throttled:
+            raise
+        except Exception as e:
+            print(f"Error posting map to Telegram, leaving it out: {e}", flush=True)
+            return
+        metrics.increment("sink.telegram.maps_sent")
+
+    # Edits the window's last message to add locations it doesn't list yet.
+    # Returns False when a new message has to be posted instead. A throttle
+    # isn't a reason to post one, so Throttled is raised.
+    def appendToWindow(self, header, newLines):
+        window = self.windows[header]
+        body = window["body"] + "\n" + "\n".join(newLines)
+        text = f"{body}\n\n{TELEGRAM_FOOTER}"
+        if utf16Length(text) > MAX_CHARACTERS:
+            return False
+        try:
+            self.rateLimiterFor(self.channel).run(
+                lambda: self.bot.edit_message_text(
+                    text,
+                    chat_id=self.channel,
+                    message_id=window["messageId"],
+                    parse_mode='Markdown',
+                    disable_web_page_preview=True
+                ),
+                telegramRetryAfter
+            )
+        except Throttled:
+            raise
+        except Exception as e:
+            print(f"Error editing Telegram message, posting a new one: {e}", flush=True)
+            return False
+        metrics.increment("sink.telegram.messages_edited")
+        window["body"] = body
+        window["listed"].update(newLines)
+        self.windows.move_to_end(header)
+        return True
+
+    # Remembers the window's last message, the one later locations are
+    # added to, and adds the lines it posted to those of the window
+    def rememberWindow(self, header, messageId, text, lines):
+        if header is None or TELEGRAM_EDIT_WINDOWS <= 0:
+            return
+        body = text.rstrip("\n").removesuffix(TELEGRAM_FOOTER).rstrip("\n")
+        window = self.windows.get(header)
+        listed = window["listed"] if window is not None else set()
+        listed.update(lines)
+        self.windows[header] = {"messageId": messageId, "body": body, "listed": listed}
+        self.windows.move_to_end(header)
+        while len(self.windows) > TELEGRAM_EDIT_WINDOWS:
+            self.windows.popitem(last=False)
+
+    # Each chat has its own bucket; all of them share the bot-wide one
+    def rateLimiterFor(self, chatId):
+        if chatId not in self.rateLimiters:
+            chatBucket = TokenBucket(TELEGRAM_CHAT_RATE_PER_MIN / 60, capacity=max(TELEGRAM_CHAT_RATE_PER_MIN, 1))
+            self.rateLimiters[chatId] = RateLimiter("telegram", [chatBucket, self.globalBucket])
+        return self.rateLimiters[chatId]
 
     # Splits a message string whose length > MAX_CHARACTERS into a list of
-    # messages, the length of each  of which < MAX_CHARACTERS
+    # messages, the length of each of which <= MAX_CHARACTERS, counted in
+    # UTF-16 code units the way Telegram does
     def truncateToMaxMessageSize(self, content):
-        truncatedMessages = []
-        newMessage = ""
-        for line in content.splitlines():
-            if len(newMessage) + len(line) +1 < MAX_CHARACTERS:
-                newMessage = f"{newMessage}{line}\n"
-            else:
-                if newMessage:
-                    truncatedMessages.append(newMessage)
-                newMessage = f"{line}\n"
-        if newMessage:
-            truncatedMessages.append(newMessage)
-
-        return truncatedMessages
+        return splitMessage(content, MAX_CHARACTERS, utf16Length)
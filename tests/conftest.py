@@ -1,7 +1,9 @@
 import pytest
 import json
 from unittest.mock import MagicMock
+from datetime import datetime
 from pathlib import Path
+from deadlines import ALERT_TIMEZONE, ALERT_TIMESTAMP_FORMAT
 
 
 @pytest.fixture
@@ -61,6 +63,13 @@ def sample_event_data(sample_alert):
     }
 
 
+@pytest.fixture
+def fresh_event_data(sample_event_data):
+    """Event data whose alert was issued just now, well within its deadline"""
+    sample_event_data["alerts"][0]["timeStamp"] = datetime.now(ALERT_TIMEZONE).strftime(ALERT_TIMESTAMP_FORMAT)
+    return sample_event_data
+
+
 @pytest.fixture
 def multi_alert_event():
     """Event with multiple alerts from test_alerts.json"""
@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from keepalive_watchdog import KeepAliveWatchdog
+from rocket_alert_api import RocketAlertAPI
+
+KEEP_ALIVE_INTERVAL = 0.2
+KEEP_ALIVE_COUNT = 5
+
+
+def keepAliveFrame():
+    data = json.dumps({"alertTypeId": 0, "alerts": [{"name": "KEEP_ALIVE", "timeStamp": "2023-12-04 16:59:09"}]})
+    return f"data: {data}\n\n".encode("utf-8")
+
+
+class HalfDeadSSEHandler(BaseHTTPRequestHandler):
+    """Sends a few regular keepalives, then keeps the socket open silently"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.connections.append(time.monotonic())
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for _ in range(KEEP_ALIVE_COUNT):
+                payload = keepAliveFrame()
+                self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+                self.wfile.flush()
+                time.sleep(KEEP_ALIVE_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client reconnected; nothing left to serve
+            return
+        self.server.stop.wait(10)
+        self.close_connection = True
+
+
+class StopStreaming(BaseException):
+    """Ends a stream loop from inside the test, past its except Exception"""
+
+
+@pytest.fixture
+def half_dead_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HalfDeadSSEHandler)
+    server.daemon_threads = True
+    server.connections = []
+    server.stop = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.stop.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.integration
+class TestKeepAliveWatchdogIntegration:
+    """Dead-connection detection against a server that stops sending keepalives"""
+
+    def test_reconnects_long_before_read_timeout(self, half_dead_server, mock_env_vars, monkeypatch):
+        """Test an overdue keepalive forces a reconnect instead of waiting READ_TIMEOUT"""
+        monkeypatch.setenv("RA_BASEURL", f"http://127.0.0.1:{half_dead_server.server_address[1]}")
+        monkeypatch.setenv("READ_TIMEOUT", "120")
+        api = RocketAlertAPI()
+        api.watchdog = KeepAliveWatchdog(maxTimeout=120, minJitter=0.05)
+
+        events = api.streamEvents()
+        start = time.monotonic()
+        # Drain the first connection's keepalives, then the first of the second
+        for _ in range(KEEP_ALIVE_COUNT + 1):
+            next(events)
+        events.close()
+
+        assert len(half_dead_server.connections) == 2
+        assert time.monotonic() - start < 10
+        assert api.watchdog.timeout() < 1
+
+    def test_refused_connection_backs_off_while_overdue(self, mock_env_vars, monkeypatch):
+        """Test an unreachable upstream is retried after the backoff, even once the watchdog fired"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), HalfDeadSSEHandler)
+        port = server.server_address[1]
+        server.server_close()
+        monkeypatch.setenv("RA_BASEURL", f"http://127.0.0.1:{port}")
+        api = RocketAlertAPI()
+        api.watchdog = KeepAliveWatchdog(maxTimeout=0.01)
+        api.watchdog.deadlineBase -= 1
+        assert api.watchdog.isOverdue()
+        sleeps = []
+        attempts = []
+        connect = api.listenToServerEvents
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 3:
+                raise StopStreaming
+
+        def listen():
+            attempts.append(1)
+            if len(attempts) > 10:
+                # Retrying without a single backoff
+                raise StopStreaming
+            return connect()
+
+        monkeypatch.setattr("rocket_alert_api.time.sleep", sleep)
+        monkeypatch.setattr(api, "listenToServerEvents", listen)
+
+        with pytest.raises(StopStreaming):
+            next(api.streamEvents())
+
+        assert sleeps == [api.reconnectDelay] * 3
+        assert len(attempts) == 3
@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+import pytest
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot import apihelper
+from mastodon_bot import MastodonBot
+from rate_limiter import RateLimiter, TokenBucket
+from telegram_bot import TelegramBot
+
+# Limits enforced by the fake servers, scaled down from the real ones so the
+# tests finish in seconds
+TELEGRAM_CHAT_RATE = 5
+MASTODON_WINDOW_POSTS = 5
+MASTODON_WINDOW_SEC = 1
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    """Bot API stand-in that answers 429 with retry_after once a chat sends too fast"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/getMe"):
+            self.reply(200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Test", "username": "TestBot"}})
+            return
+        server = self.server
+        with server.lock:
+            if server.bucket.delay() > 0:
+                server.rejected += 1
+                self.reply(429, {"ok": False, "error_code": 429,
+                                 "description": "Too Many Requests: retry after 1",
+                                 "parameters": {"retry_after": 1}})
+                return
+            server.bucket.take()
+            server.accepted += 1
+        self.reply(200, {"ok": True, "result": {"message_id": server.accepted, "date": 0,
+                                                "chat": {"id": 1, "type": "channel"}}})
+
+    do_GET = do_POST
+
+
+class FakeMastodonHandler(BaseHTTPRequestHandler):
+    """Mastodon stand-in with a fixed-window post limit and X-RateLimit-* headers"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            now = time.time()
+            if now >= server.windowEnd:
+                server.windowEnd = now + MASTODON_WINDOW_SEC
+                server.remaining = MASTODON_WINDOW_POSTS
+            if server.remaining > 0:
+                server.remaining -= 1
+                server.accepted += 1
+                status, body = 200, {"id": str(server.accepted), "content": "", "created_at": "2023-12-04T16:59:09.000Z"}
+            else:
+                server.rejected += 1
+                status, body = 429, {"error": "Too many requests"}
+            remaining, windowEnd = server.remaining, server.windowEnd
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-RateLimit-Limit", str(MASTODON_WINDOW_POSTS))
+        self.send_header("X-RateLimit-Remaining", str(remaining))
+        self.send_header("X-RateLimit-Reset", datetime.fromtimestamp(windowEnd, timezone.utc).isoformat())
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def startServer(handler, **state):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.accepted = 0
+    server.rejected = 0
+    for key, value in state.items():
+        setattr(server, key, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def fake_telegram(monkeypatch):
+    server = startServer(FakeTelegramHandler, bucket=TokenBucket(TELEGRAM_CHAT_RATE, capacity=TELEGRAM_CHAT_RATE))
+    monkeypatch.setattr(apihelper, "API_URL", f"http://127.0.0.1:{server.server_address[1]}/bot{{0}}/{{1}}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_mastodon(monkeypatch, mock_env_vars):
+    server = startServer(FakeMastodonHandler, windowEnd=0, remaining=MASTODON_WINDOW_POSTS)
+    monkeypatch.setenv("MASTO_BASEURL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def splitInto(parts):
+    # Each line is too long to share a Telegram message with another
+    return "\n".join(f"{index}: " + "x" * 3000 for index in range(parts))
+
+
+@pytest.mark.integration
+class TestRateLimitsIntegration:
+    """Throughput against fake Telegram and Mastodon servers enforcing their limits"""
+
+    def test_telegram_paced_below_limit(self, fake_telegram, mock_env_vars):
+        """Test a bucket modelled on the chat limit posts every chunk without a single 429"""
+        bot = TelegramBot()
+        # Slightly under the server's rate, the way the real limits are configured
+        chatBucket = TokenBucket(TELEGRAM_CHAT_RATE * 0.9, capacity=TELEGRAM_CHAT_RATE)
+        bot.rateLimiters[bot.channel] = RateLimiter("telegram", [chatBucket, bot.globalBucket])
+
+        start = time.monotonic()
+        assert bot.sendMessage(splitInto(15)) is True
+        duration = time.monotonic() - start
+
+        print(f"\nTelegram paced: 15 chunks in {duration:.2f}s, {fake_telegram.rejected} rejected")
+        assert fake_telegram.accepted == 15
+        assert fake_telegram.rejected == 0
+
+    def test_telegram_honours_retry_after(self, fake_telegram, mock_env_vars):
+        """Test chunks rejected with 429 are re-sent after retry_after instead of lost"""
+        bot = TelegramBot()
+        # No local limit at all: every throttle comes from the server
+        bot.rateLimiters[bot.channel] = RateLimiter("telegram", [TokenBucket(1000)], maxRetries=10)
+
+        start = time.monotonic()
+        assert bot.sendMessage(splitInto(15)) is True
+        duration = time.monotonic() - start
+
+        print(f"\nTelegram unpaced: 15 chunks in {duration:.2f}s, {fake_telegram.rejected} rejected")
+        assert fake_telegram.accepted == 15
+        assert fake_telegram.rejected > 0
+
+    def test_mastodon_follows_ratelimit_headers(self, fake_mastodon, mock_env_vars):
+        """Test posting waits for the window reset the server announced"""
+        bot = MastodonBot()
+        # Wait the window out inline; the message manager parks the event instead
+        bot.rateLimiter.maxWait = MASTODON_WINDOW_SEC * 2
+
+        start = time.monotonic()
+        for index in range(12):
+            assert bot.sendMessage(f"Toot {index}") is True
+        duration = time.monotonic() - start
+
+        print(f"\nMastodon: 12 toots in {duration:.2f}s, {fake_mastodon.rejected} rejected")
+        assert fake_mastodon.accepted == 12
+        # Two full windows had to pass
+        assert duration >= 2 * MASTODON_WINDOW_SEC - 0.5
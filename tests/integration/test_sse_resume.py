@@ -0,0 +1,115 @@
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from rocket_alert_api import RocketAlertAPI
+
+EVENT_COUNT = 10
+# The first connection dies after this many complete events, mid-way
+# through writing the next one
+DROP_AFTER = 4
+# On resume the stand-in replays this many already delivered events, the
+# way servers with a coarse replay window do
+REPLAY_OVERLAP = 2
+
+
+def frame(eventId, malformed=None):
+    data = json.dumps({"alertTypeId": 1, "alerts": [{"name": f"City {eventId}", "timeStamp": "2023-12-04 16:59:09"}]})
+    data = (malformed or {}).get(eventId, data)
+    return f"id: {eventId}\ndata: {data}\n\n".encode("utf-8")
+
+
+class StandInSSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def writeChunk(self, payload):
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        lastEventId = self.headers.get("Last-Event-ID")
+        if lastEventId is None:
+            for eventId in range(1, DROP_AFTER + 1):
+                self.writeChunk(frame(eventId, self.server.malformed))
+            # Half a frame, then the connection drops without a final chunk
+            self.writeChunk(frame(DROP_AFTER + 1)[:20])
+            self.close_connection = True
+            return
+
+        first = max(1, int(lastEventId) + 1 - REPLAY_OVERLAP)
+        for eventId in range(first, EVENT_COUNT + 1):
+            self.writeChunk(frame(eventId, self.server.malformed))
+        self.wfile.write(b"0\r\n\r\n")
+        self.close_connection = True
+
+
+@pytest.fixture
+def sse_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInSSEHandler)
+    server.requests = []
+    # Event id -> data sent instead of the event's JSON
+    server.malformed = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.integration
+class TestSSEResume:
+    """Resume behaviour against a local SSE stand-in that drops mid-burst"""
+
+    def test_resume_after_drop_mid_burst(self, sse_server, mock_env_vars, monkeypatch):
+        """Test every event arrives once, in order, across a dropped connection"""
+        monkeypatch.setenv("RA_BASEURL", f"http://127.0.0.1:{sse_server.server_address[1]}")
+        api = RocketAlertAPI()
+
+        events = api.streamEvents()
+        received = list(islice(events, EVENT_COUNT))
+        events.close()
+
+        names = [eventData["alerts"][0]["name"] for eventData in received]
+        assert names == [f"City {eventId}" for eventId in range(1, EVENT_COUNT + 1)]
+        assert api.lastEventId == str(EVENT_COUNT)
+
+    def test_reconnect_sends_last_event_id(self, sse_server, mock_env_vars, monkeypatch):
+        """Test the reconnect request carries the id of the last delivered event"""
+        monkeypatch.setenv("RA_BASEURL", f"http://127.0.0.1:{sse_server.server_address[1]}")
+        api = RocketAlertAPI()
+
+        events = api.streamEvents()
+        list(islice(events, DROP_AFTER + 1))
+        events.close()
+
+        assert "Last-Event-ID" not in sse_server.requests[0]
+        assert sse_server.requests[1]["Last-Event-ID"] == str(DROP_AFTER)
+        # Custom auth header is still sent on resume
+        assert sse_server.requests[1]["X-Test-Header"] == "test-value"
+
+    def test_malformed_frame_is_consumed(self, sse_server, mock_env_vars, monkeypatch):
+        """Test a frame that isn't an alert object is skipped, not re-requested on every reconnect"""
+        monkeypatch.setenv("RA_BASEURL", f"http://127.0.0.1:{sse_server.server_address[1]}")
+        # Event 3 comes again in the replay after the drop
+        sse_server.malformed = {3: "{not json", 6: "[1, 2]"}
+        api = RocketAlertAPI()
+
+        events = api.streamEvents()
+        received = list(islice(events, EVENT_COUNT - 2))
+        events.close()
+
+        names = [eventData["alerts"][0]["name"] for eventData in received]
+        assert names == [f"City {eventId}" for eventId in range(1, EVENT_COUNT + 1) if eventId not in (3, 6)]
+        assert len(sse_server.requests) == 2
+        assert sse_server.requests[1]["Last-Event-ID"] == str(DROP_AFTER)
+        assert api.lastEventId == str(EVENT_COUNT)
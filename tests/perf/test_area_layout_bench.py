@@ -0,0 +1,72 @@
+import json
+import random
+import pytest
+from message_builder import LAYOUT_AREAS, LAYOUT_LINES
+from message_splitter import splitMessage, utf16Length
+
+AREA_COUNT = 28
+CITIES_PER_AREA = 50
+BARRAGE_SIZES = (50, 300, 1000)
+TELEGRAM_MAX_CHARACTERS = 4096
+MASTODON_MAX_CHARACTERS = 500
+
+
+def buildCityTable(test_alerts_data):
+    # 1,400 locations named like the recorded ones, 50 to an area
+    cities = []
+    for cityId in range(AREA_COUNT * CITIES_PER_AREA):
+        alert = dict(test_alerts_data[cityId % len(test_alerts_data)])
+        alert["taCityId"] = cityId
+        alert["englishName"] = f"{alert['englishName']} {cityId}"
+        alert["areaNameEn"] = f"{alert['areaNameEn']} {cityId // CITIES_PER_AREA}"
+        cities.append(alert)
+    return cities
+
+
+def buildBarrage(cities, size):
+    # A barrage hits whole areas near the border and some of the places in
+    # the areas next to them
+    rng = random.Random(size)
+    wholeAreas = size // 2 // CITIES_PER_AREA
+    alerts = cities[:wholeAreas * CITIES_PER_AREA]
+    partial = size - len(alerts)
+    nearby = cities[len(alerts):len(alerts) + max(2 * partial, 4 * CITIES_PER_AREA)]
+    alerts += rng.sample(nearby, partial)
+    return alerts
+
+
+def postsFor(message_builder, layout, alerts):
+    message_builder.layout = layout
+    if layout == LAYOUT_AREAS:
+        locations = message_builder.buildAreaLocations(alerts)
+    else:
+        locations = "".join(f"{message_builder.buildAlert(alert)}\n" for alert in alerts)
+    text = message_builder.buildMessageText(1, "2023-12-04 16:59:09", locations)
+    telegram = splitMessage(text, TELEGRAM_MAX_CHARACTERS, utf16Length)
+    mastodon = splitMessage(text, MASTODON_MAX_CHARACTERS)
+    return len(text), len(telegram), len(mastodon)
+
+
+@pytest.mark.perf
+class TestAreaLayoutBenchmark:
+    """Posts needed for a barrage with one line per location versus one line per area"""
+
+    def test_area_layout_reduces_posts(self, test_alerts_data, message_builder, tmp_path):
+        """Test grouping by area cuts the characters and the API calls of every barrage"""
+        cities = buildCityTable(test_alerts_data)
+        table = tmp_path / "cities.json"
+        table.write_text(json.dumps(cities), encoding="utf-8")
+        message_builder.loadCityTable(str(table))
+
+        print(f"\n  cities   layout   characters   telegram posts   mastodon posts")
+        for size in BARRAGE_SIZES:
+            alerts = buildBarrage(cities, size)
+            lines = postsFor(message_builder, LAYOUT_LINES, alerts)
+            areas = postsFor(message_builder, LAYOUT_AREAS, alerts)
+            assert len(alerts) == size
+            for layout, (characters, telegram, mastodon) in (("lines", lines), ("areas", areas)):
+                print(f"  {size:>6}   {layout:<6}   {characters:>10}   {telegram:>14}   {mastodon:>14}")
+
+            assert areas[0] < lines[0] * 0.75
+            assert areas[1] <= lines[1]
+            assert areas[2] < lines[2]
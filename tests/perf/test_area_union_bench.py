@@ -0,0 +1,62 @@
+import random
+import time
+import pytest
+from map_packer import MAP_MAX_REQUEST_LENGTH, MapPacker
+
+EVENT_SIZES = (50, 500, 2000)
+# Side of the grid cells standing in for alert areas, in degrees (about 15 km)
+AREA_SIZE = 0.15
+
+
+def areaAlerts(message_builder):
+    # Every location with a polygon, pinned at its polygon's centre and put
+    # in the area of its grid cell
+    alerts = []
+    for cityId in range(2000):
+        polygon = message_builder.polygons.get(str(cityId))
+        if polygon is not None:
+            lat = round(sum(point[0] for point in polygon) / len(polygon), 4)
+            lon = round(sum(point[1] for point in polygon) / len(polygon), 4)
+            alerts.append({"taCityId": cityId, "lat": lat, "lon": lon,
+                           "areaNameEn": f"{int(lat // AREA_SIZE)}:{int(lon // AREA_SIZE)}"})
+    return alerts
+
+
+def buildEvent(cities, size):
+    rng = random.Random(size)
+    alerts = rng.sample(cities, min(size, len(cities)))
+    alerts += rng.sample(cities, size - len(alerts))
+    return alerts
+
+
+@pytest.mark.perf
+class TestAreaUnionBenchmark:
+    """Static maps for 50, 500 and 2,000-location events, with and without area outlines"""
+
+    def test_area_unions(self, message_builder):
+        """Test outlining areas never needs more maps, and shortens them for large events"""
+        cities = areaAlerts(message_builder)
+        perLocation = MapPacker(message_builder, areaUnions=0)
+        outlined = MapPacker(message_builder, areaUnions=1)
+
+        print(f"\n  locations   overlays      ms     maps   URL chars   first event ms")
+        for size in EVENT_SIZES:
+            alerts = buildEvent(cities, size)
+            results = {}
+            for name, packer in (("per city", perLocation), ("areas", outlined)):
+                start = time.perf_counter()
+                packer.pack(alerts)
+                first = time.perf_counter() - start
+                # Again, with every overlay and union cached
+                start = time.perf_counter()
+                staticMaps = [staticMap for _, staticMap in packer.pack(alerts)]
+                duration = time.perf_counter() - start
+                length = sum(len(message_builder.getMapURL(staticMap)) for staticMap in staticMaps)
+                results[name] = (len(staticMaps), length)
+                print(f"  {size:>9}   {name:<8}   {duration * 1000:>7.1f}   {len(staticMaps):>4}   {length:>9}   {first * 1000:>14.1f}")
+
+                assert max(len(message_builder.getMapURL(staticMap)) for staticMap in staticMaps) <= MAP_MAX_REQUEST_LENGTH
+
+            assert results["areas"][0] <= results["per city"][0]
+            if size >= 500:
+                assert results["areas"][1] < results["per city"][1]
@@ -0,0 +1,67 @@
+import threading
+import time
+import pytest
+from alert_coalescer import AlertCoalescer
+
+# A barrage replayed from test_alerts.json: small events a short interval
+# apart, the way the upstream delivers them
+EVENT_INTERVAL = 0.04
+EVENTS_PER_BURST = 24
+WINDOWS_MS = (0, 100, 250, 500)
+
+
+class RecordingQueue:
+    """Stands in for PostQueue and records when each alert was posted"""
+    overflowPolicy = "coalesce"
+
+    def __init__(self):
+        self.posts = []
+        self.lock = threading.Lock()
+
+    def put(self, eventData):
+        with self.lock:
+            self.posts.append((time.monotonic(), eventData))
+
+
+def replayBurst(coalescer, test_alerts_data):
+    arrivals = {}
+    for i in range(EVENTS_PER_BURST):
+        alert = dict(test_alerts_data[i % len(test_alerts_data)], name=f"alert-{i}")
+        arrivals[alert["name"]] = time.monotonic()
+        coalescer.put({"alertTypeId": 1, "alerts": [alert]})
+        time.sleep(EVENT_INTERVAL)
+    return arrivals
+
+
+@pytest.mark.perf
+class TestCoalescingBenchmark:
+    """Latency vs. message count for different coalescing windows"""
+
+    def test_latency_vs_message_count(self, test_alerts_data):
+        """Test wider windows trade a bounded delay for far fewer posts"""
+        results = {}
+        for windowMs in WINDOWS_MS:
+            queue = RecordingQueue()
+            coalescer = AlertCoalescer(queue, windowMs=windowMs, maxBatch=1000)
+            arrivals = replayBurst(coalescer, test_alerts_data)
+            time.sleep(windowMs / 1000 + 0.05)
+            coalescer.flushAll()
+
+            latencies = [
+                postedAt - arrivals[alert["name"]]
+                for postedAt, eventData in queue.posts
+                for alert in eventData["alerts"]
+            ]
+            assert len(latencies) == EVENTS_PER_BURST
+            results[windowMs] = (len(queue.posts), sum(latencies) / len(latencies), max(latencies))
+
+        print(f"\n{EVENTS_PER_BURST} events, {EVENT_INTERVAL * 1000:.0f}ms apart:")
+        print("  window   posts   mean latency   max latency")
+        for windowMs, (posts, mean, worst) in results.items():
+            print(f"  {windowMs:>4}ms   {posts:>5}   {mean * 1000:>10.1f}ms   {worst * 1000:>9.1f}ms")
+
+        assert results[0][0] == EVENTS_PER_BURST
+        assert results[500][0] < results[100][0] < results[0][0]
+        for windowMs, (posts, mean, worst) in results.items():
+            # Nothing waits much longer than one window
+            assert worst < windowMs / 1000 + 0.1
@@ -0,0 +1,70 @@
+import random
+import time
+import pytest
+from unittest.mock import Mock, patch
+from map_cache import MapImageCache
+
+EVENTS = 200
+# Distinct sets of places alerting, some far more often than others
+RECURRING_SETS = 25
+# Stand-in for a Mapbox static image request
+MAPBOX_LATENCY = 0.01
+IMAGE = b"x" * 60 * 1024
+
+
+def recurringMaps(message_builder, test_alerts_data):
+    rng = random.Random(7)
+    sets = []
+    for _ in range(RECURRING_SETS):
+        staticMap = {"overlays": [], "markers": []}
+        for alert in rng.sample(test_alerts_data, rng.randint(1, 6)):
+            message_builder.addStaticMapData(alert, staticMap)
+        sets.append(staticMap)
+    # Zipf-like: the first sets alert most often, in any order of places
+    weights = [1 / (rank + 1) for rank in range(RECURRING_SETS)]
+    events = []
+    for staticMap in rng.choices(sets, weights, k=EVENTS):
+        events.append({"overlays": rng.sample(staticMap["overlays"], len(staticMap["overlays"])),
+                       "markers": rng.sample(staticMap["markers"], len(staticMap["markers"]))})
+    return events
+
+
+def slowGet(url):
+    time.sleep(MAPBOX_LATENCY)
+    return Mock(content=IMAGE)
+
+
+def runEvents(message_builder, events):
+    with patch('message_builder.requests.get', side_effect=slowGet) as get:
+        start = time.perf_counter()
+        for staticMap in events:
+            message_builder.getMapImage(staticMap)
+        return time.perf_counter() - start, get.call_count
+
+
+@pytest.mark.perf
+class TestMapCacheBenchmark:
+    """Static map images for 200 events over 25 recurring sets of places"""
+
+    def test_map_cache(self, message_builder, test_alerts_data, tmp_path):
+        """Test every set of places is downloaded once, and a restart keeps them"""
+        events = recurringMaps(message_builder, test_alerts_data)
+        directory = str(tmp_path / "maps")
+
+        results = {}
+        # Each cache is opened after the runs before it, as on a restart
+        for name, openCache in (("none", lambda: MapImageCache(directory, memoryBytes=0, diskBytes=0)),
+                                ("memory+disk", lambda: MapImageCache(directory)),
+                                ("disk, restarted", lambda: MapImageCache(directory, memoryBytes=0))):
+            message_builder.mapCache = openCache()
+            results[name] = runEvents(message_builder, events)
+
+        print(f"\n  cache             requests   seconds")
+        for name, (duration, requests) in results.items():
+            print(f"  {name:<16}  {requests:>8}   {duration:>7.2f}")
+
+        distinct = len({frozenset(staticMap["overlays"] + staticMap["markers"]) for staticMap in events})
+        assert results["none"][1] == EVENTS
+        assert results["memory+disk"][1] == distinct
+        assert results["disk, restarted"][1] == 0
+        assert results["memory+disk"][0] < results["none"][0] / 2
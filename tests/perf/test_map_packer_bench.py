@@ -0,0 +1,85 @@
+import random
+import time
+import pytest
+from map_packer import MAP_MAX_REQUEST_LENGTH, MapPacker
+
+EVENT_SIZES = (50, 500, 2000)
+
+
+def cityAlerts(message_builder):
+    # Every location with a polygon, pinned at its polygon's centre
+    alerts = []
+    for cityId in range(2000):
+        polygon = message_builder.polygons.get(str(cityId))
+        if polygon is not None:
+            alerts.append({"taCityId": cityId,
+                           "lat": round(sum(point[0] for point in polygon) / len(polygon), 4),
+                           "lon": round(sum(point[1] for point in polygon) / len(polygon), 4)})
+    return alerts
+
+
+def buildEvent(cities, size):
+    # Arrival order; beyond 1,364 locations some alert twice in one event
+    rng = random.Random(size)
+    alerts = rng.sample(cities, min(size, len(cities)))
+    alerts += rng.sample(cities, size - len(alerts))
+    return alerts
+
+
+def legacyPack(message_builder, alerts):
+    # The loop commented out in postMessage: rebuild the URL after every
+    # location, and start a new map with the one that didn't fit
+    groups = []
+    staticMap = {'overlays': [], 'markers': []}
+    for alert in alerts:
+        message_builder.addStaticMapData(alert, staticMap)
+        url = message_builder.getMapURL(staticMap)
+        if len(url) > MAP_MAX_REQUEST_LENGTH:
+            lastOverlay = staticMap["overlays"].pop()
+            lastMarker = staticMap["markers"].pop()
+            groups.append(staticMap)
+            staticMap = {'overlays': [lastOverlay], 'markers': [lastMarker]}
+    groups.append(staticMap)
+    return groups
+
+
+def meanExtent(staticMaps):
+    # Mean bounding box diagonal of each map's pins, in degrees
+    extents = []
+    for staticMap in staticMaps:
+        points = [tuple(map(float, marker[marker.index("(") + 1:-1].split(","))) for marker in staticMap["markers"]]
+        lons, lats = zip(*points)
+        extents.append(((max(lats) - min(lats)) ** 2 + (max(lons) - min(lons)) ** 2) ** 0.5)
+    return sum(extents) / len(extents)
+
+
+@pytest.mark.perf
+class TestMapPackerBenchmark:
+    """Static map requests for 50, 500 and 2,000-location events"""
+
+    def test_packing(self, message_builder):
+        """Test the packer needs no more maps than the old loop, and keeps each map far tighter"""
+        cities = cityAlerts(message_builder)
+        packer = MapPacker(message_builder)
+        # Overlays are cached after the first event; time the packing itself
+        for alert in cities:
+            message_builder.buildPolygonOverlay(alert)
+
+        print(f"\n  locations   method   ms        maps   mean map extent")
+        for size in EVENT_SIZES:
+            alerts = buildEvent(cities, size)
+
+            start = time.perf_counter()
+            legacy = legacyPack(message_builder, alerts)
+            legacyTime = time.perf_counter() - start
+            start = time.perf_counter()
+            packed = [staticMap for _, staticMap in packer.pack(alerts)]
+            packedTime = time.perf_counter() - start
+
+            for name, duration, staticMaps in (("loop", legacyTime, legacy), ("packer", packedTime, packed)):
+                print(f"  {size:>9}   {name:<6}   {duration * 1000:>7.1f}   {len(staticMaps):>4}   {meanExtent(staticMaps):>15.3f}")
+
+            assert max(len(message_builder.getMapURL(staticMap)) for staticMap in packed) <= MAP_MAX_REQUEST_LENGTH
+            assert len(packed) <= len(legacy)
+            if size >= 500:
+                assert meanExtent(packed) < meanExtent(legacy) / 2
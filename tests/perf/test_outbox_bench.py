@@ -0,0 +1,34 @@
+import time
+import pytest
+from outbox import Outbox
+
+EVENTS = 2000
+SINKS = ["Telegram", "Mastodon"]
+
+
+@pytest.mark.perf
+class TestOutboxBenchmark:
+    """Cost the outbox adds to the ingest path"""
+
+    def test_enqueue_cost(self, tmp_path, test_alerts_data):
+        """Test recording an event stays well under a millisecond on average"""
+        results = {}
+        for commitBatch in (1, 64):
+            outbox = Outbox(str(tmp_path / f"outbox-{commitBatch}.db"), commitBatch=commitBatch)
+            durations = []
+            for i in range(EVENTS):
+                eventData = {"alertTypeId": 1, "alerts": [test_alerts_data[i % len(test_alerts_data)]]}
+                start = time.perf_counter()
+                outbox.enqueue(eventData, SINKS)
+                durations.append(time.perf_counter() - start)
+            outbox.close()
+            durations.sort()
+            results[commitBatch] = (sum(durations) / EVENTS, durations[int(EVENTS * 0.99)])
+
+        print(f"\n{EVENTS} enqueues, {len(SINKS)} sinks:")
+        print("  commit batch   mean       p99")
+        for commitBatch, (mean, p99) in results.items():
+            print(f"  {commitBatch:>12}   {mean * 1e6:>6.0f}us   {p99 * 1e6:>6.0f}us")
+
+        assert results[64][0] < 0.001
+        assert results[64][0] < results[1][0]
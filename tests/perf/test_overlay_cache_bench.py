@@ -0,0 +1,53 @@
+import time
+import urllib
+import polyline
+import pytest
+
+CITY_COUNT = 500
+ROUNDS = 5
+
+
+def legacyAddStaticMapData(builder, alert, staticMap):
+    # addStaticMapData before the overlay cache: the polygon is encoded on
+    # every alert
+    polygon = builder.polygons.get(str(alert["taCityId"]), None)
+    if polygon is not None:
+        URLEncoded = urllib.parse.quote(polyline.encode(polygon, 5).encode('utf-8'))
+        staticMap["overlays"].append(f"path+{builder.strokeColor}+{builder.strokeFill}({URLEncoded})")
+    staticMap["markers"].append(builder.buildMarker(alert))
+    return staticMap
+
+
+def timeEvent(addStaticMapData, alerts):
+    staticMap = {'overlays': [], 'markers': []}
+    start = time.perf_counter()
+    for alert in alerts:
+        addStaticMapData(alert, staticMap)
+    return staticMap, time.perf_counter() - start
+
+
+@pytest.mark.perf
+class TestOverlayCacheBenchmark:
+    """addStaticMapData over a 500-city event with and without the overlay cache"""
+
+    def test_overlay_cache(self, message_builder, sample_alert, monkeypatch):
+        """Test cached overlays match freshly encoded ones and cost a lookup"""
+        # Full polygons, so only the cache differs from the old path
+        monkeypatch.setattr("message_builder.MAP_SIMPLIFY_FIDELITY", 0)
+        cityIds = [cityId for cityId in range(2000) if message_builder.polygons.get(str(cityId)) is not None][:CITY_COUNT]
+        alerts = [dict(sample_alert, taCityId=cityId) for cityId in cityIds]
+
+        legacy = min((timeEvent(lambda alert, staticMap: legacyAddStaticMapData(message_builder, alert, staticMap), alerts)
+                      for _ in range(ROUNDS)), key=lambda result: result[1])
+        cold = timeEvent(message_builder.addStaticMapData, alerts)
+        warm = min((timeEvent(message_builder.addStaticMapData, alerts) for _ in range(ROUNDS)),
+                   key=lambda result: result[1])
+
+        print(f"\naddStaticMapData for {len(alerts)} cities:")
+        for name, (_, duration) in (("encode every time", legacy), ("cache, first event", cold), ("cache, later events", warm)):
+            print(f"  {name:<20} {duration * 1000:>8.2f} ms")
+
+        assert len(alerts) == CITY_COUNT
+        assert cold[0] == legacy[0]
+        assert warm[0] == legacy[0]
+        assert warm[1] < legacy[1] / 10
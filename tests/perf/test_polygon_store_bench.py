@@ -0,0 +1,66 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+import polyline
+import pytest
+from polygon_store import PolygonStore, buildPolygonStore
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+POLYGONS_JSON = REPO_ROOT / "polygons.json"
+
+# Loads the polygons in a fresh interpreter and reports how long it took and
+# how much the process grew, as (seconds, KiB)
+MEASURE = """
+import json, sys, time
+from polygon_store import PolygonStore
+
+def rss():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+before = rss()
+start = time.perf_counter()
+polygons = json.load(open(sys.argv[2])) if sys.argv[1] == "json" else PolygonStore(sys.argv[2])
+duration = time.perf_counter() - start
+print(duration, rss() - before)
+"""
+
+
+def measure(kind, path):
+    runs = []
+    for _ in range(3):
+        output = subprocess.run([sys.executable, "-c", MEASURE, kind, str(path)], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.split()
+        runs.append((float(output[0]), int(output[1])))
+    return min(runs)
+
+
+@pytest.mark.perf
+@pytest.mark.skipif(not Path("/proc/self/status").exists(), reason="needs /proc to read RSS")
+class TestPolygonStoreBenchmark:
+    """Startup time and memory of polygons.json against the binary polygon store"""
+
+    def test_store_startup_and_rss(self, tmp_path):
+        """Test the store opens faster, in less memory, and encodes the same overlays"""
+        with open(POLYGONS_JSON, encoding="utf-8") as file:
+            polygons = json.load(file)
+        store = tmp_path / "polygons.bin"
+        buildPolygonStore(polygons, str(store))
+
+        jsonTime, jsonRss = measure("json", POLYGONS_JSON)
+        storeTime, storeRss = measure("store", store)
+
+        print(f"\n{len(polygons)} polygons, {sum(map(len, polygons.values()))} points:")
+        print("  source          file KiB   startup ms   RSS growth KiB")
+        print(f"  polygons.json   {POLYGONS_JSON.stat().st_size // 1024:>8}   {jsonTime * 1000:>10.1f}   {jsonRss:>14}")
+        print(f"  polygons.bin    {store.stat().st_size // 1024:>8}   {storeTime * 1000:>10.1f}   {storeRss:>14}")
+
+        assert storeTime < jsonTime / 10
+        assert storeRss < jsonRss / 10
+        opened = PolygonStore(str(store))
+        for cityId, polygon in polygons.items():
+            assert polyline.encode(opened.get(cityId), 5) == polyline.encode(polygon, 5)
+        opened.close()
@@ -0,0 +1,83 @@
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from map_bundle import MapBundle, prerenderMaps
+from map_cache import MapImageCache
+from map_packer import MapPacker
+
+LOCATIONS = 100
+# Stand-in for a Mapbox static image request
+MAPBOX_LATENCY = 0.02
+IMAGE = b"x" * 60 * 1024
+# Side of the grid cells standing in for alert areas, in degrees
+AREA_SIZE = 0.15
+
+
+class SlowMapboxHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(MAPBOX_LATENCY)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(IMAGE)))
+        self.end_headers()
+        self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+def cityTable(message_builder):
+    cities = []
+    for cityId in sorted(message_builder.polygons, key=int)[:LOCATIONS]:
+        polygon = message_builder.polygons[cityId]
+        lat = round(sum(point[0] for point in polygon) / len(polygon), 4)
+        lon = round(sum(point[1] for point in polygon) / len(polygon), 4)
+        cities.append({"taCityId": int(cityId), "lat": lat, "lon": lon,
+                       "areaNameEn": f"{int(lat // AREA_SIZE)}:{int(lon // AREA_SIZE)}"})
+    return cities
+
+
+@pytest.mark.perf
+class TestPrerenderBenchmark:
+    """Pre-rendering 100 locations and their areas, and the first alert's map"""
+
+    def test_prerender(self, message_builder, tmp_path):
+        """Test workers speed the job up, a rerun fetches nothing, and bundled maps skip the request"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowMapboxHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        message_builder.apiURL = f"http://127.0.0.1:{server.server_port}"
+        cities = cityTable(message_builder)
+        message_builder.polygons = {str(city["taCityId"]): message_builder.polygons[str(city["taCityId"])] for city in cities}
+
+        try:
+            print(f"\n  run                 maps   rendered   seconds")
+            timings = {}
+            for name, workers, directory in (("1 worker", 1, "one"), ("8 workers", 8, "eight"), ("8 workers, rerun", 8, "eight")):
+                start = time.perf_counter()
+                result = prerenderMaps(message_builder, cities, str(tmp_path / directory), workers)
+                timings[name] = time.perf_counter() - start
+                print(f"  {name:<18}  {result['maps']:>4}   {result['rendered']:>8}   {timings[name]:>7.2f}")
+            assert result["rendered"] == 0
+
+            # The first alert for each of 20 locations, with an empty map cache
+            alerts = cities[:20]
+            latencies = {}
+            for name, bundle in (("Mapbox", MapBundle(str(tmp_path / "missing"))), ("bundle", MapBundle(str(tmp_path / "eight")))):
+                message_builder.mapBundle = bundle
+                message_builder.mapCache = MapImageCache(str(tmp_path / f"cache-{name}"))
+                packer = MapPacker(message_builder)
+                start = time.perf_counter()
+                for alert in alerts:
+                    message_builder.getMapImage(packer.pack([alert])[0][1])
+                latencies[name] = (time.perf_counter() - start) / len(alerts)
+            print(f"  first alert's map: Mapbox {latencies['Mapbox'] * 1000:.1f} ms, bundle {latencies['bundle'] * 1000:.2f} ms")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # One worker waits out every request in turn: at least maps x MAPBOX_LATENCY
+        assert timings["8 workers"] < timings["1 worker"]
+        assert latencies["bundle"] < latencies["Mapbox"] / 10
@@ -0,0 +1,60 @@
+import time
+import pytest
+from mastodon_bot import MASTODON_FORMAT, MAX_CHARACTERS as MASTODON_MAX_CHARACTERS, renderPlain
+from message_splitter import splitMessage, utf16Length
+from rendered_message import RenderedMessage
+from telegram_bot import MAX_CHARACTERS as TELEGRAM_MAX_CHARACTERS, TELEGRAM_FORMAT, renderTelegram
+
+LOCATION_COUNT = 1000
+ROUNDS = 20
+# Each sink's posts of one event when Telegram failed twice and both sinks
+# were re-sent the event from their retry queues
+POSTS = ("telegram", "mastodon", "telegram", "telegram", "mastodon")
+FORMATS = {
+    "telegram": (TELEGRAM_FORMAT, renderTelegram, TELEGRAM_MAX_CHARACTERS, utf16Length),
+    "mastodon": (MASTODON_FORMAT, renderPlain, MASTODON_MAX_CHARACTERS, len),
+}
+
+
+def buildText(test_alerts_data, message_builder):
+    alerts = [test_alerts_data[i % len(test_alerts_data)] for i in range(LOCATION_COUNT)]
+    locations = "".join(f"{message_builder.buildAlert(alert)} #{i}\n" for i, alert in enumerate(alerts))
+    return message_builder.buildMessageText(1, "2023-12-04 16:59:09", locations)
+
+
+def renderEveryTime(text):
+    # What each sendMessage did before: render and split on every post
+    chunks = []
+    for sink in POSTS:
+        _, render, maxLength, lengthFunction = FORMATS[sink]
+        content = render(text)
+        chunks.append(splitMessage(content, maxLength, lengthFunction) if lengthFunction(content) > maxLength else [content])
+    return chunks
+
+
+def renderOnce(text):
+    message = RenderedMessage(text)
+    return [message.variant(*FORMATS[sink]) for sink in POSTS]
+
+
+@pytest.mark.perf
+class TestRenderCacheBenchmark:
+    """Rendering and splitting a 1,000-location event for every post of it"""
+
+    def test_render_once_per_format(self, test_alerts_data, message_builder):
+        """Test the cache gives the same chunks for a fraction of the work"""
+        text = buildText(test_alerts_data, message_builder)
+
+        timings = {}
+        for name, function in (("every post", renderEveryTime), ("once per format", renderOnce)):
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                chunks = function(text)
+            timings[name] = ((time.perf_counter() - start) / ROUNDS, chunks)
+
+        print(f"\n{LOCATION_COUNT} locations, {len(POSTS)} posts of the event:")
+        for name, (duration, chunks) in timings.items():
+            print(f"  {name:<16} {duration * 1000:>7.2f} ms   {sum(map(len, chunks))} chunks")
+
+        assert timings["every post"][1] == timings["once per format"][1]
+        assert timings["once per format"][0] < timings["every post"][0]
@@ -0,0 +1,51 @@
+import json
+import time
+import urllib
+from pathlib import Path
+import polyline
+import pytest
+from polygon_simplifier import SIMPLIFY_TOLERANCES, coarsestLevel, simplify
+
+POLYGONS_JSON = Path(__file__).parent.parent.parent / "polygons.json"
+# MessageManager.MAP_MAX_REQUEST_LENGTH
+MAP_MAX_REQUEST_LENGTH = 8192
+# The map URL without overlays, and one pin marker, as getMapURL builds them
+URL_OVERHEAD = 180
+MARKER_LENGTH = 32
+FIDELITY = 0.02
+
+
+def overlayLength(polygon):
+    return len(f"path+ff0000+bb1b1b({urllib.parse.quote(polyline.encode(polygon, 5))}),") + MARKER_LENGTH
+
+
+@pytest.mark.perf
+class TestSimplifyBenchmark:
+    """Simplifying all 1,364 polygons at every level, and the overlays that result"""
+
+    def test_simplify_all_polygons(self):
+        """Test coarser levels shrink the overlays so several times more cities fit one map URL"""
+        with open(POLYGONS_JSON, encoding="utf-8") as file:
+            polygons = list(json.load(file).values())
+
+        print(f"\n{len(polygons)} polygons, {MAP_MAX_REQUEST_LENGTH}-character map URL:")
+        print("  tolerance   simplify ms   points   mean overlay   cities per map")
+        rows = {}
+        for level, tolerance in enumerate(SIMPLIFY_TOLERANCES):
+            start = time.perf_counter()
+            simplified = [simplify(polygon, tolerance) for polygon in polygons]
+            duration = time.perf_counter() - start
+            rows[level] = simplified
+            meanOverlay = sum(map(overlayLength, simplified)) / len(simplified)
+            print(f"  {tolerance:>9}   {duration * 1000:>11.0f}   {sum(map(len, simplified)):>6}   "
+                  f"{meanOverlay:>12.0f}   {(MAP_MAX_REQUEST_LENGTH - URL_OVERHEAD) / meanOverlay:>14.1f}")
+
+        levels = [coarsestLevel(polygon, SIMPLIFY_TOLERANCES, FIDELITY) for polygon in polygons]
+        chosen = [rows[level][index] for index, level in enumerate(levels)]
+        chosenOverlay = sum(map(overlayLength, chosen)) / len(chosen)
+        fullOverlay = sum(map(overlayLength, polygons)) / len(polygons)
+        print(f"  fidelity {FIDELITY}: mean overlay {chosenOverlay:.0f}, "
+              f"{(MAP_MAX_REQUEST_LENGTH - URL_OVERHEAD) / chosenOverlay:.1f} cities per map")
+
+        assert chosenOverlay < fullOverlay / 2.5
+        assert all(len(polygon) >= 4 for polygon in chosen)
@@ -0,0 +1,71 @@
+import time
+import pytest
+from message_splitter import splitMessage, utf16Length
+
+LOCATION_COUNT = 10000
+
+
+def buildContent(test_alerts_data):
+    lines = []
+    for i in range(LOCATION_COUNT):
+        alert = test_alerts_data[i % len(test_alerts_data)]
+        # Every third location falls back to its Hebrew name
+        name = alert["name"] if i % 3 == 0 else alert["englishName"]
+        lines.append(f"{name} ({alert['areaNameEn']}) #{i}")
+    return "\n".join(lines)
+
+
+def legacySplit(content, maxCharacters):
+    # The splitter both bots used before: one f-string copy per line
+    truncatedMessages = []
+    newMessage = ""
+    for line in content.splitlines():
+        if len(newMessage) + len(line) + 1 < maxCharacters:
+            newMessage = f"{newMessage}{line}\n"
+        else:
+            if newMessage:
+                truncatedMessages.append(newMessage)
+            newMessage = f"{line}\n"
+    if newMessage:
+        truncatedMessages.append(newMessage)
+    return truncatedMessages
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+@pytest.mark.perf
+class TestSplitterBenchmark:
+    """Splitting a 10k-location event for each platform"""
+
+    @pytest.mark.parametrize("maxLength, lengthFunction", [(4096, utf16Length), (500, len)])
+    def test_split_10k_locations(self, test_alerts_data, maxLength, lengthFunction):
+        """Test the shared splitter keeps every line, packs as tightly and isn't slower"""
+        content = buildContent(test_alerts_data)
+
+        legacy, legacyDuration = timed(legacySplit, content, maxLength)
+        chunks, duration = timed(splitMessage, content, maxLength, lengthFunction)
+
+        print(f"\n{LOCATION_COUNT} locations, limit {maxLength}: legacy {len(legacy)} chunks in "
+              f"{legacyDuration * 1000:.1f}ms, splitter {len(chunks)} chunks in {duration * 1000:.1f}ms")
+
+        assert "".join(chunks).splitlines() == content.splitlines()
+        assert all(lengthFunction(chunk) <= maxLength for chunk in chunks)
+        assert len(chunks) <= len(legacy)
+        assert duration < 0.1
+
+    def test_scales_linearly(self, test_alerts_data):
+        """Test ten times the locations takes about ten times as long, not a hundred"""
+        content = buildContent(test_alerts_data)
+        small = "\n".join(content.splitlines()[:LOCATION_COUNT // 10])
+
+        # Best of a few runs to keep scheduler noise out of the ratio
+        smallDuration = min(timed(splitMessage, small, 4096, utf16Length)[1] for _ in range(5))
+        largeDuration = min(timed(splitMessage, content, 4096, utf16Length)[1] for _ in range(5))
+
+        print(f"\n{LOCATION_COUNT // 10} locations: {smallDuration * 1000:.2f}ms, "
+              f"{LOCATION_COUNT}: {largeDuration * 1000:.2f}ms")
+        assert largeDuration < smallDuration * 25
@@ -0,0 +1,70 @@
+import io
+import json
+import time
+import pytest
+import requests
+from sse_parser import SSEParser
+from rocket_alert_api import READ_CHUNK_SIZE
+
+# Roughly a heavy barrage: thousands of events, each carrying a few alerts
+EVENT_COUNT = 5000
+
+
+def buildStream(test_alerts_data):
+    frames = []
+    for i in range(EVENT_COUNT):
+        alerts = test_alerts_data[i % len(test_alerts_data):][:3]
+        frames.append(f"data:{json.dumps({'alertTypeId': 1, 'alerts': alerts}, ensure_ascii=False)}\n\n")
+    return "".join(frames).encode("utf-8")
+
+
+def buildResponse(payload):
+    response = requests.Response()
+    response.raw = io.BytesIO(payload)
+    response.encoding = "utf-8"
+    return response
+
+
+def readWithIterLines(payload):
+    # The path main.py used before the parser existed
+    events = []
+    for line in buildResponse(payload).iter_lines(decode_unicode=True):
+        line = line.lstrip("data:")
+        if line.strip():
+            events.append(line)
+    return events
+
+
+def readWithParser(payload):
+    events = []
+    parser = SSEParser()
+    for chunk in buildResponse(payload).iter_content(chunk_size=READ_CHUNK_SIZE):
+        for event in parser.feed(chunk):
+            events.append(event.data)
+    return events
+
+
+@pytest.mark.perf
+class TestSSEParserBenchmark:
+    """Micro-benchmark of SSE framing at barrage-level event rates"""
+
+    def test_parser_vs_iter_lines(self, test_alerts_data):
+        """Compare SSEParser framing against iter_lines(decode_unicode=True)"""
+        payload = buildStream(test_alerts_data)
+
+        start = time.perf_counter()
+        baseline = readWithIterLines(payload)
+        baselineDuration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parsed = readWithParser(payload)
+        parserDuration = time.perf_counter() - start
+
+        print(f"\n{EVENT_COUNT} events ({len(payload)} bytes):")
+        print(f"  iter_lines: {baselineDuration:.4f}s ({EVENT_COUNT / baselineDuration:.0f} events/s)")
+        print(f"  SSEParser:  {parserDuration:.4f}s ({EVENT_COUNT / parserDuration:.0f} events/s)")
+
+        assert len(parsed) == len(baseline) == EVENT_COUNT
+        assert [json.loads(data) for data in parsed[:10]] == [json.loads(data) for data in baseline[:10]]
+        # Generous bound so the benchmark stays stable on loaded CI runners
+        assert parserDuration < baselineDuration * 3
@@ -1,7 +1,13 @@
 
 import pytest
+import threading
+import time
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 from message_manager import MessageManager
+from metrics import metrics
+from post_queue import PostQueue, PostingWorkers, OVERFLOW_COALESCE
+from deadlines import ALERT_TIMEZONE, ALERT_TIMESTAMP_FORMAT
 
 @pytest.mark.perf
 class TestStress:
@@ -144,3 +150,97 @@ class TestTelegramBotStress:
         # Let's conservatively say it should contain all original content.
 
         assert total_chars_sent >= len(massive_content)
+
+
+class SlowSink:
+    """Fake bot whose sendMessage takes as long as a slow Mastodon instance"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def sendMessage(self, content):
+        time.sleep(self.delay)
+        with self.lock:
+            self.sent.append(content)
+
+
+@pytest.mark.perf
+class TestPostQueueStress:
+    """Stress tests for ingest decoupled from slow sinks by the post queue"""
+
+    SINK_DELAY = 0.2
+    EVENT_COUNT = 40
+
+    def build_manager(self, mock_builder_class, mock_telegram_class, mock_mastodon_class):
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.side_effect = lambda alert: alert["name"]
+        mock_builder.buildMessage.side_effect = lambda sm, mfc, at, ts, locs: {"text": locs}
+        mock_builder_class.return_value = mock_builder
+        mock_telegram_class.return_value = SlowSink(self.SINK_DELAY)
+        mock_mastodon_class.return_value = SlowSink(self.SINK_DELAY)
+        return MessageManager()
+
+    def events(self, count):
+        # Fresh alerts, so none of them is past its delivery deadline
+        timestamp = datetime.now(ALERT_TIMEZONE).strftime(ALERT_TIMESTAMP_FORMAT)
+        return [{
+            "alertTypeId": 1,
+            "alerts": [{"name": f"City {i}", "timeStamp": timestamp}]
+        } for i in range(count)]
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_ingest_never_waits_on_slow_sinks(self, mock_builder_class, mock_telegram_class,
+                                              mock_mastodon_class):
+        """Test a burst is ingested instantly while slow sinks drain it"""
+        metrics.reset()
+        manager = self.build_manager(mock_builder_class, mock_telegram_class, mock_mastodon_class)
+        postQueue = PostQueue(maxSize=self.EVENT_COUNT, overflowPolicy=OVERFLOW_COALESCE)
+        workers = PostingWorkers(postQueue, manager.postMessage, count=4).start()
+
+        start = time.perf_counter()
+        for eventData in self.events(self.EVENT_COUNT):
+            postQueue.put(eventData)
+        ingestDuration = time.perf_counter() - start
+
+        workers.stop(timeout=30)
+        drainDuration = time.perf_counter() - start
+
+        inline = self.EVENT_COUNT * 2 * self.SINK_DELAY
+        print(f"\nIngested {self.EVENT_COUNT} events in {ingestDuration * 1000:.2f}ms, "
+              f"drained in {drainDuration:.2f}s (inline posting would take {inline:.1f}s)")
+        print(f"Queue metrics: {metrics.snapshot()}")
+
+        assert ingestDuration < 0.1
+        assert len(manager.telegramBot.sent) == self.EVENT_COUNT
+        assert drainDuration < inline
+        assert metrics.gauge("post_queue.max_depth") > 1
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_coalescing_keeps_every_alert_when_full(self, mock_builder_class, mock_telegram_class,
+                                                     mock_mastodon_class):
+        """Test a tiny coalescing queue under a burst loses no alerts"""
+        metrics.reset()
+        manager = self.build_manager(mock_builder_class, mock_telegram_class, mock_mastodon_class)
+        postQueue = PostQueue(maxSize=2, overflowPolicy=OVERFLOW_COALESCE)
+        workers = PostingWorkers(postQueue, manager.postMessage, count=1).start()
+
+        start = time.perf_counter()
+        for eventData in self.events(self.EVENT_COUNT):
+            postQueue.put(eventData)
+        ingestDuration = time.perf_counter() - start
+        workers.stop(timeout=30)
+
+        posted = "".join(manager.telegramBot.sent)
+        print(f"\nCoalesced {metrics.counter('post_queue.coalesced')} events into "
+              f"{len(manager.telegramBot.sent)} posts")
+
+        assert ingestDuration < 0.1
+        assert all(f"City {i}\n" in posted for i in range(self.EVENT_COUNT))
+        assert len(manager.telegramBot.sent) < self.EVENT_COUNT
+        assert metrics.counter("post_queue.dropped") == 0
@@ -0,0 +1,88 @@
+import random
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from message_manager import MessageManager
+
+ALERT_COUNT = 500
+COUNTDOWNS = (0, 15, 30, 45, 60, 90)
+# Simulated round trip of one Telegram API call
+API_LATENCY = 0.05
+
+
+def buildEvent(test_alerts_data):
+    # A barrage over many places with mixed countdowns, in arrival order
+    rng = random.Random(7)
+    alerts = []
+    for i in range(ALERT_COUNT):
+        alert = dict(test_alerts_data[i % len(test_alerts_data)])
+        alert["englishName"] = f"{alert['englishName']} {i}"
+        alert["countdownSec"] = rng.choice(COUNTDOWNS)
+        alerts.append(alert)
+    return {"alertTypeId": 1, "alerts": alerts}
+
+
+def postAndTime(eventData, mock_env_vars, order):
+    with patch('message_manager.MastodonBot'), patch('telegram_bot.TeleBot') as mock_bot_class:
+        mock_bot = MagicMock()
+        mock_bot.get_me.return_value = MagicMock(username='TestBot')
+        posts = []
+
+        def send_message(chat_id, text, **kwargs):
+            time.sleep(API_LATENCY)
+            posts.append((time.monotonic(), text))
+            return MagicMock(message_id=len(posts))
+
+        mock_bot.send_message.side_effect = send_message
+        mock_bot_class.return_value = mock_bot
+
+        manager = MessageManager()
+        with patch('message_manager.urgency', order):
+            start = time.monotonic()
+            manager.postMessage(eventData)
+
+    # Which post each location went out in and when, by the name the
+    # builder gave it
+    postedAt = {}
+    for index, (postedTime, text) in enumerate(posts):
+        for line in text.splitlines():
+            postedAt.setdefault(line, (index, postedTime - start))
+    return posts, postedAt
+
+
+@pytest.mark.perf
+class TestUrgencyOrderingBenchmark:
+    """Time until every location of an urgency class is posted, in a 500-alert event"""
+
+    def test_time_to_post_per_urgency_class(self, test_alerts_data, mock_env_vars, message_builder):
+        """Test the most urgent places all go out with the first API call"""
+        eventData = buildEvent(test_alerts_data)
+        labels = {id(alert): message_builder.buildAlert(alert) for alert in eventData["alerts"]}
+
+        results = {}
+        for mode, order in (("arrival", lambda alert: 0), ("urgency", lambda alert: alert["countdownSec"])):
+            posts, postedAt = postAndTime(eventData, mock_env_vars, order)
+            results[mode] = {
+                countdown: max(postedAt[labels[id(alert)]] for alert in eventData["alerts"] if alert["countdownSec"] == countdown)
+                for countdown in COUNTDOWNS
+            }
+            results[mode]["posts"] = len(posts)
+
+        print(f"\n{ALERT_COUNT} alerts in {results['urgency']['posts']} Telegram posts; "
+              f"seconds until a class is fully posted:")
+        print("  countdown   arrival order   urgency order")
+        for countdown in COUNTDOWNS:
+            print(f"  {countdown:>8}s   {results['arrival'][countdown][1]:>12.3f}s   {results['urgency'][countdown][1]:>12.3f}s")
+
+        # Asserted on which post a class finished in, not the wall clock
+        # time, so a slow CI machine can't fail it
+        assert results["urgency"]["posts"] > 1
+        # With urgency ordering the most urgent places are all in the first
+        # post; in arrival order they're scattered across every post
+        assert results["urgency"][0][0] == 0
+        assert results["arrival"][0][0] > 0
+        for countdown in COUNTDOWNS:
+            # The least urgent class finishes with the last post either way
+            assert results["urgency"][countdown][0] <= results["arrival"][countdown][0]
+        urgencyPosts = [results["urgency"][countdown][0] for countdown in COUNTDOWNS]
+        assert urgencyPosts == sorted(urgencyPosts)
@@ -0,0 +1,92 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from alert_coalescer import AlertCoalescer
+from post_queue import PostQueue
+
+
+def event(name, alertTypeId=1):
+    return {"alertTypeId": alertTypeId, "alerts": [{"name": name, "timeStamp": "2023-12-04 16:59:09"}]}
+
+
+def names(eventData):
+    return [alert["name"] for alert in eventData["alerts"]]
+
+
+@pytest.mark.unit
+class TestAlertCoalescer:
+    """Tests for AlertCoalescer class"""
+
+    def test_disabled_passes_through(self):
+        """Test a zero window forwards every event immediately"""
+        postQueue = MagicMock()
+        coalescer = AlertCoalescer(postQueue, windowMs=0)
+
+        coalescer.put(event("A"))
+        coalescer.put(event("B"))
+
+        assert postQueue.put.call_count == 2
+
+    def test_malformed_event_passes_through(self):
+        """Test an event without alertTypeId or alerts is forwarded as it is instead of raising"""
+        postQueue = MagicMock()
+        coalescer = AlertCoalescer(postQueue, windowMs=1000)
+        noType = {"alerts": [{"name": "A"}]}
+        noAlerts = {"alertTypeId": 1}
+
+        coalescer.put(noType)
+        coalescer.put(noAlerts)
+
+        assert [call.args[0] for call in postQueue.put.call_args_list] == [noType, noAlerts]
+        assert coalescer.batches == {}
+
+    def test_merges_events_within_window(self):
+        """Test events of one type inside the window become one event"""
+        postQueue = PostQueue(maxSize=10)
+        coalescer = AlertCoalescer(postQueue, windowMs=100)
+
+        coalescer.put(event("A"))
+        coalescer.put(event("B"))
+        assert len(postQueue) == 0
+
+        merged = postQueue.get(timeout=1)
+        assert names(merged) == ["A", "B"]
+        assert merged["alertTypeId"] == 1
+
+    def test_types_batched_separately(self):
+        """Test different alert types are never merged together"""
+        postQueue = PostQueue(maxSize=10)
+        coalescer = AlertCoalescer(postQueue, windowMs=50)
+
+        coalescer.put(event("A", alertTypeId=1))
+        coalescer.put(event("B", alertTypeId=2))
+        first = postQueue.get(timeout=1)
+        second = postQueue.get(timeout=1)
+
+        assert sorted([first["alertTypeId"], second["alertTypeId"]]) == [1, 2]
+        assert len(first["alerts"]) == len(second["alerts"]) == 1
+
+    def test_flushes_early_at_max_batch(self):
+        """Test a batch reaching the size threshold is posted without waiting"""
+        postQueue = PostQueue(maxSize=10)
+        coalescer = AlertCoalescer(postQueue, windowMs=10000, maxBatch=3)
+
+        start = time.monotonic()
+        for name in ("A", "B", "C"):
+            coalescer.put(event(name))
+
+        merged = postQueue.get(timeout=1)
+        assert names(merged) == ["A", "B", "C"]
+        assert time.monotonic() - start < 1
+
+    def test_flushAll(self):
+        """Test flushAll posts every pending batch"""
+        postQueue = PostQueue(maxSize=10)
+        coalescer = AlertCoalescer(postQueue, windowMs=10000)
+        coalescer.put(event("A", alertTypeId=1))
+        coalescer.put(event("B", alertTypeId=2))
+
+        coalescer.flushAll()
+
+        assert len(postQueue) == 2
+        assert coalescer.batches == {}
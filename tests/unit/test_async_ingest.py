@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+import threading
+import time
+from unittest.mock import MagicMock
+from async_ingest import AsyncIngest
+from rocket_alert_api import RocketAlertAPI
+
+
+class FakeAPI:
+    """Stands in for RocketAlertAPI with a finite event stream"""
+
+    isKeepAlive = staticmethod(RocketAlertAPI.isKeepAlive)
+
+    def __init__(self, events):
+        self.events = events
+        self.readTimes = []
+
+    def streamEvents(self):
+        for event in self.events:
+            self.readTimes.append(time.monotonic())
+            yield event
+
+
+@pytest.mark.unit
+class TestAsyncIngest:
+    """Tests for AsyncIngest class"""
+
+    async def test_keep_alive_calls_callback(self, keep_alive_event):
+        """Test keep-alive events trigger the heartbeat callback and are not queued"""
+        api = FakeAPI([keep_alive_event])
+        postQueue = MagicMock(overflowPolicy="drop-oldest")
+        onKeepAlive = MagicMock()
+
+        await AsyncIngest(api, postQueue, onKeepAlive=onKeepAlive).run()
+
+        onKeepAlive.assert_called_once()
+        postQueue.put.assert_not_called()
+
+    async def test_slow_post_does_not_block_reader(self, sample_event_data):
+        """Test the stream keeps being read while earlier events are still posting"""
+        from post_queue import PostingWorkers, PostQueue
+        api = FakeAPI([sample_event_data] * 5)
+        release = threading.Event()
+        postMessage = MagicMock(side_effect=lambda eventData: release.wait(5))
+        postQueue = PostQueue(maxSize=10)
+        PostingWorkers(postQueue, postMessage, count=1).start()
+
+        start = time.monotonic()
+        task = asyncio.ensure_future(AsyncIngest(api, postQueue).run())
+        while len(api.readTimes) < 5 and time.monotonic() - start < 2:
+            await asyncio.sleep(0.01)
+
+        # All events were read even though the first post hasn't returned
+        assert len(api.readTimes) == 5
+        release.set()
+        await task
+        postQueue.close()
+
+    async def test_events_handed_to_post_queue(self, sample_event_data):
+        """Test every non keep-alive event goes to the shared post queue"""
+        from post_queue import PostQueue
+        api = FakeAPI([sample_event_data, sample_event_data])
+        postQueue = PostQueue(maxSize=10)
+
+        await AsyncIngest(api, postQueue).run()
+
+        assert len(postQueue) == 2
+
+    async def test_queue_error_is_contained(self, sample_event_data):
+        """Test an event the post queue rejects doesn't stop ingest"""
+        api = FakeAPI([sample_event_data, sample_event_data])
+        postQueue = MagicMock(overflowPolicy="drop-oldest")
+        postQueue.put.side_effect = [KeyError("alertTypeId"), None]
+
+        await AsyncIngest(api, postQueue).run()
+
+        assert postQueue.put.call_count == 2
@@ -0,0 +1,87 @@
+import pytest
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from metrics import metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker class"""
+
+    def test_opens_after_consecutive_failures(self, clock):
+        """Test the breaker opens on the threshold-th failure in a row"""
+        breaker = CircuitBreaker("test", failureThreshold=3, resetTimeout=30, clock=clock)
+
+        assert breaker.record(False) is False
+        assert breaker.record(False) is False
+        assert breaker.record(True) is False
+        assert breaker.record(False) is False
+        assert breaker.record(False) is False
+        assert breaker.state == CLOSED
+
+        assert breaker.record(False) is True
+        assert breaker.state == OPEN
+        assert breaker.allowRequest() is False
+
+    def test_single_probe_after_reset_timeout(self, clock):
+        """Test an open breaker lets exactly one request through once the timeout passed"""
+        breaker = CircuitBreaker("test", failureThreshold=1, resetTimeout=30, clock=clock)
+        breaker.record(False)
+
+        clock.now = 29
+        assert breaker.allowRequest() is False
+        assert breaker.retryIn() == pytest.approx(1)
+
+        clock.now = 30
+        assert breaker.allowRequest() is True
+        assert breaker.state == HALF_OPEN
+        assert breaker.allowRequest() is False
+
+    def test_successful_probe_closes(self, clock):
+        """Test the breaker closes when the probe succeeds"""
+        breaker = CircuitBreaker("test", failureThreshold=1, resetTimeout=30, clock=clock)
+        breaker.record(False)
+        clock.now = 30
+        breaker.allowRequest()
+
+        breaker.record(True)
+
+        assert breaker.state == CLOSED
+        assert breaker.allowRequest() is True
+
+    def test_failed_probe_reopens(self, clock):
+        """Test a failed probe opens the breaker for another full timeout"""
+        breaker = CircuitBreaker("test", failureThreshold=1, resetTimeout=30, clock=clock)
+        breaker.record(False)
+        clock.now = 30
+        breaker.allowRequest()
+
+        assert breaker.record(False) is True
+        assert breaker.state == OPEN
+        assert breaker.retryIn() == pytest.approx(30)
+
+    def test_metrics(self, clock):
+        """Test state and transition counters are exposed as metrics"""
+        metrics.reset()
+        breaker = CircuitBreaker("test", failureThreshold=1, resetTimeout=30, clock=clock)
+        breaker.record(False)
+        clock.now = 30
+        breaker.allowRequest()
+        breaker.record(True)
+
+        assert metrics.gauge("breaker.test.state") == CLOSED
+        assert metrics.counter("breaker.test.open") == 1
+        assert metrics.counter("breaker.test.half_open") == 1
+        assert metrics.counter("breaker.test.closed") == 1
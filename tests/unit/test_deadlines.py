@@ -0,0 +1,70 @@
+import pytest
+from datetime import datetime
+from deadlines import (ALERT_TIMEZONE, POLICY_DROP, POLICY_SUMMARIZE, alertDeadline, deadlineKey,
+                       deadlinePolicy, eventDeadline, isExpired, popOverflow)
+
+
+def issuedAt(timestamp):
+    return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=ALERT_TIMEZONE).timestamp()
+
+
+@pytest.mark.unit
+class TestDeadlines:
+    """Tests for delivery deadline helpers"""
+
+    def test_alert_deadline_is_countdown_plus_grace(self):
+        """Test the deadline is the Israel-time timestamp plus countdown plus grace"""
+        alert = {"timeStamp": "2023-12-04 16:59:09", "countdownSec": 15}
+
+        assert alertDeadline(alert, grace=60) == issuedAt("2023-12-04 16:59:09") + 75
+
+    def test_timestamp_is_israel_time(self):
+        """Test timestamps are read as Asia/Jerusalem local time (UTC+2 in winter)"""
+        alert = {"timeStamp": "2023-12-04 16:59:09", "countdownSec": 0}
+
+        assert alertDeadline(alert, grace=0) == datetime.fromisoformat("2023-12-04T14:59:09+00:00").timestamp()
+
+    def test_unusable_timestamp_has_no_deadline(self):
+        """Test alerts without a parseable timestamp never expire"""
+        assert alertDeadline({"countdownSec": 15}) is None
+        assert alertDeadline({"timeStamp": "yesterday"}) is None
+        assert isExpired(None) is False
+
+    def test_event_deadline_follows_freshest_alert(self):
+        """Test an event stays useful while any of its alerts is"""
+        eventData = {"alerts": [
+            {"timeStamp": "2023-12-04 16:59:09", "countdownSec": 15},
+            {"timeStamp": "2023-12-04 17:00:00", "countdownSec": 90},
+        ]}
+
+        assert eventDeadline(eventData, grace=0) == issuedAt("2023-12-04 17:00:00") + 90
+
+    def test_is_expired(self):
+        """Test an event expires once the clock passes its deadline"""
+        assert isExpired(100, now=101) is True
+        assert isExpired(100, now=100) is False
+
+    def test_overflow_drops_stale_then_oldest(self):
+        """Test a full heap gives up an expired entry first, else the first to arrive, not the most urgent"""
+        import heapq
+        heap = []
+        # A 90 s alert issued 30 s before a fresh 15 s one: the fresh alert
+        # has the earlier deadline
+        for entry in [(160, 0, "90s alert"), (115, 1, "15s alert"), (None, 2, "undated")]:
+            heapq.heappush(heap, (deadlineKey(entry[0]),) + entry[1:])
+
+        assert popOverflow(heap, now=100)[2] == "90s alert"
+        assert popOverflow(heap, now=120)[2] == "15s alert"
+        assert [entry[2] for entry in heap] == ["undated"]
+
+    def test_deadline_key_orders_unknown_last(self):
+        """Test events without a deadline sort after every dated one"""
+        assert sorted([None, 5, 1], key=deadlineKey) == [1, 5, None]
+
+    def test_policy_per_sink(self, monkeypatch):
+        """Test each sink reads its own policy and falls back to summarize"""
+        monkeypatch.setenv("DEADLINE_POLICY_MASTODON", "drop")
+        monkeypatch.setenv("DEADLINE_POLICY_TELEGRAM", "bogus")
+
+        assert deadlinePolicy("Mastodon") == POLICY_DROP
+        assert deadlinePolicy("Telegram") == POLICY_SUMMARIZE
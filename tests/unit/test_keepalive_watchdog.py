@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import MagicMock
+from keepalive_watchdog import KeepAliveWatchdog
+from rocket_alert_api import RocketAlertAPI, MIN_SOCKET_TIMEOUT
+
+
+@pytest.mark.unit
+class TestKeepAliveWatchdog:
+    """Tests for KeepAliveWatchdog class"""
+
+    def test_falls_back_to_max_timeout_until_learned(self):
+        """Test the fixed timeout is used before enough keepalives were seen"""
+        watchdog = KeepAliveWatchdog(maxTimeout=120, minSamples=3)
+        watchdog.connected(now=0)
+        watchdog.recordKeepAlive(now=65)
+        watchdog.recordKeepAlive(now=130)
+
+        assert watchdog.timeout() == 120
+
+    def test_learns_cadence_and_jitter(self):
+        """Test the timeout follows the observed interval plus a few deviations"""
+        watchdog = KeepAliveWatchdog(maxTimeout=120, sigmas=4, minJitter=0.5)
+        watchdog.connected(now=0)
+        for now in (0, 64, 130, 194, 260):
+            watchdog.recordKeepAlive(now=now)
+
+        # Intervals 64, 66, 64, 66: mean 65, deviation 1
+        assert watchdog.timeout() == pytest.approx(69)
+        assert watchdog.deadline() == pytest.approx(329)
+
+    def test_min_jitter_floor(self):
+        """Test perfectly regular keepalives still get some slack"""
+        watchdog = KeepAliveWatchdog(maxTimeout=120, sigmas=4, minJitter=2)
+        for now in (0, 65, 130, 195):
+            watchdog.recordKeepAlive(now=now)
+
+        assert watchdog.timeout() == pytest.approx(73)
+
+    def test_timeout_capped_by_max(self):
+        """Test a very irregular server never pushes past READ_TIMEOUT"""
+        watchdog = KeepAliveWatchdog(maxTimeout=120, sigmas=4, minJitter=0)
+        for now in (0, 10, 110, 120, 220):
+            watchdog.recordKeepAlive(now=now)
+
+        assert watchdog.timeout() == 120
+
+    def test_overdue(self):
+        """Test the stream is overdue once the learned deadline passes"""
+        watchdog = KeepAliveWatchdog(maxTimeout=120, sigmas=4, minJitter=2)
+        for now in (0, 65, 130, 195):
+            watchdog.recordKeepAlive(now=now)
+
+        assert watchdog.isOverdue(now=260) is False
+        assert watchdog.remaining(now=260) == pytest.approx(8)
+        assert watchdog.isOverdue(now=269) is True
+        assert watchdog.remaining(now=269) == 0
+
+    def test_reconnect_gap_is_not_an_interval(self):
+        """Test the gap across a reconnect doesn't skew the learned cadence"""
+        watchdog = KeepAliveWatchdog(maxTimeout=120)
+        watchdog.recordKeepAlive(now=0)
+        watchdog.connected(now=200)
+        watchdog.recordKeepAlive(now=230)
+
+        assert list(watchdog.intervals) == []
+        assert watchdog.deadlineBase == 230
+
+    def test_armWatchdog_sets_socket_timeout(self, mock_env_vars):
+        """Test armWatchdog shrinks the live socket's timeout to the deadline"""
+        api = RocketAlertAPI()
+        api.watchdog = MagicMock()
+        api.watchdog.remaining.return_value = 30
+        response = MagicMock()
+
+        api.armWatchdog(response)
+
+        response.raw.connection.sock.settimeout.assert_called_once_with(30)
+
+    def test_armWatchdog_minimum_timeout(self, mock_env_vars):
+        """Test armWatchdog never sets a zero (non-blocking) timeout"""
+        api = RocketAlertAPI()
+        api.watchdog = MagicMock()
+        api.watchdog.remaining.return_value = 0
+        response = MagicMock()
+
+        api.armWatchdog(response)
+
+        response.raw.connection.sock.settimeout.assert_called_once_with(MIN_SOCKET_TIMEOUT)
@@ -0,0 +1,20 @@
+import pytest
+from unittest.mock import MagicMock
+from main import runSync
+
+
+@pytest.mark.unit
+class TestRunSync:
+    """Tests for the blocking ingest loop"""
+
+    def test_queue_error_is_contained(self, sample_event_data):
+        """Test an event the post queue rejects doesn't end the stream"""
+        api = MagicMock()
+        api.streamEvents.return_value = iter([sample_event_data, sample_event_data])
+        api.isKeepAlive.return_value = False
+        postQueue = MagicMock()
+        postQueue.put.side_effect = [KeyError("alertTypeId"), None]
+
+        runSync(api, postQueue)
+
+        assert postQueue.put.call_count == 2
@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from map_bundle import MANIFEST_FILE, MapBundle, prerenderMaps
+from map_cache import mapKey
+from map_packer import MapPacker
+
+CITIES = [
+    {"taCityId": 745, "lat": 32.87, "lon": 35.1, "areaNameEn": "Confrontation Line"},
+    {"taCityId": 754, "lat": 32.88, "lon": 35.11, "areaNameEn": "Confrontation Line"},
+    {"taCityId": 171, "lat": 31.3357, "lon": 34.3941, "areaNameEn": "Gaza Envelope"},
+]
+
+
+@pytest.fixture
+def mapbox():
+    """Local stand-in for the Mapbox static images API"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MapboxHandler)
+    server.requests = []
+    server.failing = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class MapboxHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if any(part in self.path for part in self.server.failing):
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = b"PNG " + self.path.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def builder(message_builder, mapbox):
+    message_builder.apiURL = f"http://127.0.0.1:{mapbox.server_port}"
+    message_builder.polygons = {str(city["taCityId"]): message_builder.polygons[str(city["taCityId"])] for city in CITIES}
+    return message_builder
+
+
+def bundleFiles(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".png"))
+
+
+@pytest.mark.unit
+class TestPrerenderMaps:
+    """Tests for pre-rendering every location's and area's map"""
+
+    def test_renders_every_location_and_area(self, builder, mapbox, tmp_path):
+        """Test each location and area gets its map, fetched once, in a versioned manifest"""
+        directory = str(tmp_path / "bundle")
+
+        result = prerenderMaps(builder, CITIES, directory, workers=2)
+
+        manifest = json.loads((tmp_path / "bundle" / MANIFEST_FILE).read_text(encoding="utf-8"))
+        assert set(manifest["maps"]) == {"city:745", "city:754", "city:171", "area:Confrontation Line", "area:Gaza Envelope"}
+        assert manifest["format"] == 1 and manifest["version"] == result["version"]
+        # Gaza Envelope has one location, so its map is Nirim's
+        assert manifest["maps"]["area:Gaza Envelope"] == manifest["maps"]["city:171"]
+        assert result["maps"] == result["rendered"] == len(mapbox.requests) == 4
+        assert len(bundleFiles(directory)) == 4
+
+    def test_builder_serves_bundled_maps(self, builder, mapbox, tmp_path):
+        """Test a live alert whose map was pre-rendered needs no request"""
+        directory = str(tmp_path / "bundle")
+        prerenderMaps(builder, CITIES, directory, workers=2)
+        builder.mapBundle = MapBundle(directory)
+        rendered = len(mapbox.requests)
+
+        # Nirim alone, and the whole Confrontation Line in any order
+        for alerts in ([CITIES[2]], [CITIES[1], CITIES[0]]):
+            _, staticMap = MapPacker(builder).pack(alerts)[0]
+            with patch.object(builder.mapCache, 'fetch') as fetch:
+                assert builder.getMapImage(staticMap).startswith(b"PNG /styles/v1/mapbox/dark-v11/static/")
+            fetch.assert_not_called()
+        assert len(mapbox.requests) == rendered
+
+    def test_live_alert_key_in_bundle(self, builder, sample_alert, tmp_path):
+        """Test the map key of an alert as the API sends it is one the bundle has"""
+        directory = str(tmp_path / "bundle")
+        prerenderMaps(builder, CITIES, directory, workers=2)
+        builder.mapBundle = MapBundle(directory)
+
+        _, staticMap = MapPacker(builder).pack([sample_alert])[0]
+
+        assert staticMap["markers"]
+        assert mapKey(builder.styleId, builder.mapSize, staticMap) in builder.mapBundle
+
+    def test_refuses_without_coordinates(self, builder, mapbox, tmp_path):
+        """Test locations without lat and lon are left out, and no table at all renders nothing"""
+        directory = str(tmp_path / "bundle")
+
+        with pytest.raises(ValueError):
+            prerenderMaps(builder, [], directory, workers=2)
+        with pytest.raises(ValueError):
+            prerenderMaps(builder, [{"taCityId": 171, "areaNameEn": "Gaza Envelope"}], directory, workers=2)
+        assert mapbox.requests == []
+
+        prerenderMaps(builder, CITIES[:2] + [{"taCityId": 171, "lat": None, "lon": None, "areaNameEn": "Gaza Envelope"}], directory, workers=2)
+        assert set(MapBundle(directory).maps) == {"city:745", "city:754", "area:Confrontation Line"}
+
+    def test_rerun_renders_only_what_changed(self, builder, mapbox, tmp_path):
+        """Test a second run fetches nothing, and a changed polygon re-renders just its maps"""
+        directory = str(tmp_path / "bundle")
+        first = prerenderMaps(builder, CITIES, directory, workers=2)
+
+        unchanged = prerenderMaps(builder, CITIES, directory, workers=2)
+        assert unchanged["rendered"] == 0 and unchanged["reused"] == 4
+        assert unchanged["version"] == first["version"]
+
+        builder.polygons["171"] = [[lat + 0.001, lon] for lat, lon in builder.polygons["171"]]
+        builder.overlays.clear()
+        changed = prerenderMaps(builder, CITIES, directory, workers=2)
+
+        assert (changed["rendered"], changed["reused"], changed["removed"]) == (1, 3, 1)
+        assert changed["version"] != first["version"]
+        assert len(bundleFiles(directory)) == 4
+
+    def test_resumes_after_being_stopped(self, builder, mapbox, tmp_path):
+        """Test maps already written before a stop aren't fetched again"""
+        directory = str(tmp_path / "bundle")
+        prerenderMaps(builder, CITIES, directory, workers=2)
+        # As if stopped after writing two maps and before the manifest
+        os.remove(tmp_path / "bundle" / MANIFEST_FILE)
+        for name in bundleFiles(directory)[:2]:
+            os.remove(tmp_path / "bundle" / name)
+
+        result = prerenderMaps(builder, CITIES, directory, workers=2)
+
+        assert (result["rendered"], result["reused"]) == (2, 2)
+        assert len(MapBundle(directory)) == 4
+
+    def test_failed_maps_left_for_next_run(self, builder, mapbox, tmp_path):
+        """Test a map Mapbox fails to render is left out of the manifest until it renders"""
+        directory = str(tmp_path / "bundle")
+        _, nirim = MapPacker(builder).pack([CITIES[2]])[0]
+        mapbox.failing.add(nirim["markers"][0])
+
+        failed = prerenderMaps(builder, CITIES, directory, workers=2)
+
+        assert failed["failed"] == 1
+        assert set(MapBundle(directory).maps) == {"city:745", "city:754", "area:Confrontation Line"}
+        mapbox.failing.clear()
+        assert prerenderMaps(builder, CITIES, directory, workers=2)["rendered"] == 1
+        assert mapKey(builder.styleId, builder.mapSize, nirim) in MapBundle(directory)
+
+
+@pytest.mark.unit
+class TestMapBundle:
+    """Tests for reading the pre-rendered map bundle"""
+
+    def test_missing_bundle_is_empty(self, tmp_path):
+        """Test the bots run without a bundle"""
+        bundle = MapBundle(str(tmp_path / "missing"))
+
+        assert len(bundle) == 0
+        assert bundle.get("0" * 64) is None
+
+    def test_other_format_is_ignored(self, tmp_path):
+        """Test a manifest of another bundle format isn't read"""
+        (tmp_path / MANIFEST_FILE).write_text(json.dumps({"format": 99, "maps": {"city:1": ["k"]}}), encoding="utf-8")
+        (tmp_path / "k.png").write_bytes(b"png")
+
+        assert len(MapBundle(str(tmp_path))) == 0
+
+    def test_keys_by_id(self, tmp_path):
+        """Test a location's or area's maps are looked up by id"""
+        (tmp_path / MANIFEST_FILE).write_text(json.dumps({"format": 1, "maps": {"area:A": ["k1", "k2"]}}), encoding="utf-8")
+        (tmp_path / "k1.png").write_bytes(b"png")
+
+        bundle = MapBundle(str(tmp_path))
+
+        assert bundle.keysFor("area:A") == ["k1", "k2"]
+        assert bundle.get("k1") == b"png"
+        # Listed but missing from disk
+        assert bundle.get("k2") is None
@@ -0,0 +1,107 @@
+import os
+import pytest
+from unittest.mock import Mock
+from map_cache import MapImageCache, mapKey
+from metrics import metrics
+
+STATIC_MAP = {"overlays": ["path+ff0000+bb1b1b(abc)", "path+ff0000+bb1b1b(def)"], "markers": ["pin-s+ff0000(34.39,31.33)"]}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MapImageCache(str(tmp_path / "maps"), memoryBytes=100, diskBytes=100)
+
+
+@pytest.mark.unit
+class TestMapKey:
+    """Tests for static map cache keys"""
+
+    def test_same_places_same_key(self):
+        """Test the order and repeats of overlays and markers don't change the key"""
+        shuffled = {"overlays": STATIC_MAP["overlays"][::-1] + STATIC_MAP["overlays"][:1], "markers": STATIC_MAP["markers"]}
+
+        assert mapKey("dark-v11", "400x400@2x", shuffled) == mapKey("dark-v11", "400x400@2x", STATIC_MAP)
+
+    def test_style_and_places_change_the_key(self):
+        """Test a different style, size or set of places is a different map"""
+        key = mapKey("dark-v11", "400x400@2x", STATIC_MAP)
+
+        assert mapKey("light-v11", "400x400@2x", STATIC_MAP) != key
+        assert mapKey("dark-v11", "800x800", STATIC_MAP) != key
+        assert mapKey("dark-v11", "400x400@2x", dict(STATIC_MAP, markers=[])) != key
+        # An overlay isn't confused with a marker
+        assert mapKey("dark-v11", "400x400@2x", {"overlays": ["a"], "markers": []}) != \
+            mapKey("dark-v11", "400x400@2x", {"overlays": [], "markers": ["a"]})
+
+
+@pytest.mark.unit
+class TestMapImageCache:
+    """Tests for the memory and disk static map cache"""
+
+    def test_fetch_downloads_once(self, cache):
+        """Test a map is downloaded on its first use only"""
+        download = Mock(return_value=b"png")
+        misses = metrics.counter("map_cache.misses")
+        hits = metrics.counter("map_cache.memory_hits")
+
+        assert cache.fetch("k", download) == b"png"
+        assert cache.fetch("k", download) == b"png"
+
+        download.assert_called_once()
+        assert metrics.counter("map_cache.misses") == misses + 1
+        assert metrics.counter("map_cache.memory_hits") == hits + 1
+
+    def test_failed_download_is_not_cached(self, cache):
+        """Test a download that raises leaves nothing behind"""
+        with pytest.raises(RuntimeError):
+            cache.fetch("k", Mock(side_effect=RuntimeError("quota")))
+
+        assert cache.get("k") is None
+        assert cache.fetch("k", Mock(return_value=b"png")) == b"png"
+
+    def test_disk_survives_restart(self, cache, tmp_path):
+        """Test a new cache on the same directory serves the images already on disk"""
+        cache.put("k", b"png")
+
+        restarted = MapImageCache(str(tmp_path / "maps"), memoryBytes=100, diskBytes=100)
+        hits = metrics.counter("map_cache.disk_hits")
+
+        assert restarted.fetch("k", Mock(side_effect=AssertionError)) == b"png"
+        assert metrics.counter("map_cache.disk_hits") == hits + 1
+        assert "k" in restarted.memory
+
+    def test_memory_evicts_least_recently_used(self, cache):
+        """Test the memory tier stays within its byte limit, dropping the oldest use first"""
+        cache.diskBytes = 0
+        for key in ("a", "b", "a", "c"):
+            cache.fetch(key, lambda: b"x" * 40)
+
+        assert list(cache.memory) == ["a", "c"]
+        assert cache.memoryUsed == 80
+
+    def test_disk_evicts_least_recently_used(self, cache, tmp_path):
+        """Test the disk tier stays within its byte limit and removes evicted files"""
+        cache.memoryBytes = 0
+        for key in ("a", "b", "a", "c"):
+            cache.fetch(key, lambda: b"x" * 40)
+
+        assert list(cache.disk) == ["a", "c"]
+        assert sorted(os.listdir(tmp_path / "maps")) == ["a.png", "c.png"]
+        assert cache.diskUsed == 80
+
+    def test_oversized_image_is_not_kept(self, cache, tmp_path):
+        """Test an image bigger than a tier isn't stored in it"""
+        cache.fetch("big", lambda: b"x" * 200)
+
+        assert cache.memory == {}
+        assert cache.disk == {}
+        assert not (tmp_path / "maps").exists()
+
+    def test_missing_file_is_a_miss(self, cache, tmp_path):
+        """Test an image deleted from disk behind the cache's back is fetched again"""
+        cache.put("k", b"png")
+        cache.memory.clear()
+        os.remove(tmp_path / "maps" / "k.png")
+
+        assert cache.fetch("k", Mock(return_value=b"new")) == b"new"
+        assert cache.disk == {"k": 3}
@@ -0,0 +1,153 @@
+import pytest
+from map_packer import MapPacker, hilbertIndex
+
+
+def cityAlert(cityId, lat, lon, **fields):
+    return dict({"taCityId": cityId, "lat": lat, "lon": lon}, **fields)
+
+
+@pytest.fixture
+def packer(message_builder):
+    return MapPacker(message_builder, maxLength=1200)
+
+
+def urlLengths(packer, groups):
+    return [len(packer.messageBuilder.getMapURL(staticMap)) for _, staticMap in groups]
+
+
+@pytest.mark.unit
+class TestHilbertIndex:
+    """Tests for the Hilbert curve ordering"""
+
+    def test_visits_every_cell_once(self):
+        """Test the curve is a one-to-one walk over the grid"""
+        indices = {hilbertIndex(x, y, 3) for x in range(8) for y in range(8)}
+        assert indices == set(range(64))
+
+    def test_steps_are_between_neighbours(self):
+        """Test consecutive cells on the curve share an edge"""
+        cells = sorted(((x, y) for x in range(8) for y in range(8)), key=lambda cell: hilbertIndex(*cell, 3))
+        for (x1, y1), (x2, y2) in zip(cells, cells[1:]):
+            assert abs(x1 - x2) + abs(y1 - y2) == 1
+
+
+@pytest.mark.unit
+class TestMapPacker:
+    """Tests for packing an event's locations into static map requests"""
+
+    def test_every_map_fits(self, packer):
+        """Test every URL fits and the running length matches the real URL"""
+        alerts = [cityAlert(cityId, 31 + cityId / 1000, 34.5) for cityId in range(100, 200)]
+
+        groups = packer.pack(alerts)
+
+        assert len(groups) > 1
+        assert max(urlLengths(packer, groups)) <= 1200
+        assert sorted(alert["taCityId"] for groupAlerts, _ in groups for alert in groupAlerts) == list(range(100, 200))
+
+    def test_fewest_maps(self, packer):
+        """Test maps are filled before a new one is started"""
+        alerts = [cityAlert(cityId, 31, 34 + cityId / 1000) for cityId in range(60)]
+
+        groups = packer.pack(alerts)
+
+        lengths = urlLengths(packer, groups)
+        # What the locations add to the URLs, and the largest of them
+        total = sum(lengths) - len(groups) * packer.baseLength
+        largest = max(len(item) + 1 for _, staticMap in groups for item in staticMap["overlays"] + staticMap["markers"])
+        assert len(groups) <= -(-total // (1200 - packer.baseLength - 2 * largest))
+
+    def test_neighbours_share_a_map(self, packer):
+        """Test two clusters far apart get a map each, whatever order they arrive in"""
+        # Locations without polygons, so each map holds just the pins
+        north = [cityAlert(cityId, 33.0 + cityId / 10000, 35.5) for cityId in range(90000, 90010)]
+        south = [cityAlert(cityId, 29.5 + cityId / 100000, 34.9) for cityId in range(90010, 90020)]
+        interleaved = [alert for pair in zip(north, south) for alert in pair]
+        # Room for one cluster per map
+        capacity = max(urlLengths(packer, packer.pack(north) + packer.pack(south)))
+
+        groups = MapPacker(packer.messageBuilder, maxLength=capacity).pack(interleaved)
+
+        assert len(groups) == 2
+        assert {frozenset(alert["taCityId"] for alert in groupAlerts) for groupAlerts, _ in groups} == \
+            {frozenset(range(90000, 90010)), frozenset(range(90010, 90020))}
+
+    def test_keeps_urgency_order(self, packer):
+        """Test maps come most urgent first and keep the alerts' order within"""
+        alerts = [cityAlert(cityId, 31 + (cityId % 7) / 10, 34.5 + (cityId % 3) / 10) for cityId in range(80)]
+
+        groups = packer.pack(alerts)
+
+        firsts = [alerts.index(groupAlerts[0]) for groupAlerts, _ in groups]
+        assert firsts == sorted(firsts)
+        assert firsts[0] == 0
+        for groupAlerts, _ in groups:
+            positions = [alerts.index(alert) for alert in groupAlerts]
+            assert positions == sorted(positions)
+
+    def test_location_drawn_once(self, packer):
+        """Test a location alerting twice in one event is drawn once"""
+        alerts = [cityAlert(171, 31.33, 34.39), cityAlert(171, 31.33, 34.39)]
+
+        groups = packer.pack(alerts)
+
+        assert len(groups) == 1
+        assert len(groups[0][0]) == 2
+        assert len(groups[0][1]["markers"]) == 1
+        assert len(groups[0][1]["overlays"]) == 1
+
+    def test_oversized_overlay_keeps_only_the_pin(self, packer):
+        """Test a polygon too big for any map is left out but its pin kept"""
+        tight = MapPacker(packer.messageBuilder, maxLength=packer.baseLength + 40)
+
+        groups = tight.pack([cityAlert(171, 31.33, 34.39)])
+
+        assert groups[0][1]["overlays"] == []
+        assert len(groups[0][1]["markers"]) == 1
+
+    def test_alerts_without_coordinates(self, packer):
+        """Test locations without coordinates still get a place on a map"""
+        groups = packer.pack([cityAlert(171, None, None), cityAlert(178, 31.3, 34.4)])
+
+        assert sorted(alert["taCityId"] for groupAlerts, _ in groups for alert in groupAlerts) == [171, 178]
+        assert sum(len(staticMap["markers"]) for _, staticMap in groups) == 1
+
+    def test_area_drawn_as_one_outline(self, message_builder):
+        """Test an area's alerting locations share one outline and need no pins"""
+        alerts = [cityAlert(cityId, 32.8, 35.1, areaNameEn="Confrontation Line") for cityId in (744, 745, 754)]
+
+        groups = MapPacker(message_builder).pack(alerts)
+
+        assert len(groups) == 1
+        assert groups[0][0] == alerts
+        assert groups[0][1]["overlays"] == message_builder.buildUnionOverlays({744, 745, 754})
+        assert groups[0][1]["markers"] == []
+
+    def test_area_keeps_pins_without_polygons(self, message_builder):
+        """Test a location with no polygon is still pinned inside an outlined area"""
+        alerts = [cityAlert(cityId, 32.8, 35.1, areaNameEn="Confrontation Line") for cityId in (745, 754, 90000)]
+
+        groups = MapPacker(message_builder).pack(alerts)
+
+        assert len(groups[0][1]["overlays"]) == 1
+        assert groups[0][1]["markers"] == [message_builder.buildMarker(alerts[2])]
+
+    def test_area_unions_off(self, message_builder):
+        """Test each location gets its own polygon and pin with area unions off"""
+        alerts = [cityAlert(cityId, 32.8, 35.1, areaNameEn="Confrontation Line") for cityId in (745, 754)]
+
+        groups = MapPacker(message_builder, areaUnions=0).pack(alerts)
+
+        assert len(groups[0][1]["overlays"]) == 2
+        assert len(groups[0][1]["markers"]) == 2
+
+    def test_area_outline_too_big_for_a_map(self, message_builder):
+        """Test an area that can't fit on one map is split by location again"""
+        alerts = [cityAlert(cityId, 32.8 + cityId / 10000, 35.1, areaNameEn="Confrontation Line") for cityId in (744, 745, 754)]
+        outline = len(",".join(message_builder.buildUnionOverlays({744, 745, 754})))
+        packer = MapPacker(message_builder)
+
+        groups = MapPacker(message_builder, maxLength=packer.baseLength + outline - 1).pack(alerts)
+
+        assert all(staticMap["overlays"] != message_builder.buildUnionOverlays({744, 745, 754}) for _, staticMap in groups)
+        assert sum(len(staticMap["markers"]) for _, staticMap in groups) == 3
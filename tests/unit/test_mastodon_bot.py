@@ -1,6 +1,7 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, call
 from mastodon_bot import MastodonBot
+from rendered_message import RenderedMessage
 
 
 @pytest.mark.unit
@@ -15,7 +16,8 @@ class TestMastodonBot:
         mock_mastodon_class.assert_called_once_with(
             api_base_url="https://test-mastodon.social",
             access_token="test-token",
-            request_timeout=30
+            request_timeout=30,
+            ratelimit_method="throw"
         )
         assert bot.api_baseurl == "https://test-mastodon.social"
         assert bot.accessToken == "test-token"
@@ -114,6 +116,16 @@ class TestMastodonBot:
             for msg in result:
                 assert len(msg) <= 500
 
+    def test_truncateToMaxMessageSize_keeps_overflow_line(self, mock_env_vars):
+        """Test the line that starts a new toot isn't dropped"""
+        with patch('mastodon_bot.Mastodon'):
+            bot = MastodonBot()
+            lines = [f"Location {index}" for index in range(100)]
+
+            result = bot.truncateToMaxMessageSize("\n".join(lines))
+
+            assert "".join(result).splitlines() == lines
+
     @patch('mastodon_bot.Mastodon')
     def test_sendMessage_multiple_toots(self, mock_mastodon_class, mock_env_vars):
         """Test sendMessage posts multiple toots for long content"""
@@ -129,6 +141,65 @@ class TestMastodonBot:
         # Should call status_post for each toot
         assert mock_mastodon.status_post.call_count == 3
 
+    @patch('mastodon_bot.Mastodon')
+    def test_sendMessage_uses_rendered_variant(self, mock_mastodon_class, mock_env_vars):
+        """Test a RenderedMessage is split once and shared with later posts of it"""
+        mock_mastodon = MagicMock()
+        mock_mastodon_class.return_value = mock_mastodon
+
+        bot = MastodonBot()
+        message = RenderedMessage("\n".join(f"Location {i}" for i in range(100)))
+        bot.sendMessage(message)
+        toots = [c.args[0] for c in mock_mastodon.status_post.call_args_list]
+
+        assert len(toots) > 1
+        assert all(len(toot) <= 500 for toot in toots)
+        assert message.variant("plain", None, 500) == toots
+
+    @patch('mastodon_bot.Mastodon')
+    def test_sendMessage_attaches_map_to_first_toot(self, mock_mastodon_class, mock_env_vars):
+        """Test a map image is uploaded once and attached to the first toot only"""
+        mock_mastodon = MagicMock()
+        mock_mastodon.media_post.return_value = {"id": 7}
+        mock_mastodon_class.return_value = mock_mastodon
+
+        bot = MastodonBot()
+        assert bot.sendMessage(["Message 1", "Message 2"], b"png") is True
+
+        mock_mastodon.media_post.assert_called_once()
+        assert mock_mastodon.media_post.call_args.args[0].read() == b"png"
+        assert mock_mastodon.status_post.call_args_list == [
+            call("Message 1", media_ids=[{"id": 7}]),
+            call("Message 2"),
+        ]
+
+    @patch('mastodon_bot.Mastodon')
+    def test_sendMessage_posts_without_map_upload_fails(self, mock_mastodon_class, mock_env_vars):
+        """Test a failed map upload doesn't hold back the toot"""
+        mock_mastodon = MagicMock()
+        mock_mastodon.media_post.side_effect = Exception("Unprocessable Entity")
+        mock_mastodon_class.return_value = mock_mastodon
+
+        bot = MastodonBot()
+
+        assert bot.sendMessage("Message 1", b"png") is True
+        mock_mastodon.status_post.assert_called_once_with("Message 1")
+
+    @patch('mastodon_bot.Mastodon')
+    def test_sendMessage_progress_is_per_sink(self, mock_mastodon_class, mock_env_vars):
+        """Test another sink's progress through the same plain chunks doesn't skip any of ours"""
+        mock_mastodon = MagicMock()
+        mock_mastodon_class.return_value = mock_mastodon
+
+        bot = MastodonBot()
+        message = RenderedMessage("\n".join(f"Location {i}" for i in range(100)))
+        chunks = message.variant("plain", lambda text: text, 500)
+        message.posted[("bluesky", "plain")] = len(chunks)
+
+        assert bot.sendMessage(message) is True
+        assert [c.args[0] for c in mock_mastodon.status_post.call_args_list] == chunks
+        assert message.posted[("mastodon", "plain")] == len(chunks)
+
     @patch('mastodon_bot.Mastodon')
     def test_sendMessage_handles_list(self, mock_mastodon_class, mock_env_vars):
         """Test sendMessage handles pre-truncated message list"""
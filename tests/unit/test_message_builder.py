@@ -1,6 +1,10 @@
+import json
+import polyline
+import urllib
 import pytest
 from unittest.mock import Mock, patch, mock_open
 from message_builder import AlertMessageBuilder
+from polygon_union import unionPolygons
 
 
 @pytest.mark.unit
@@ -33,6 +37,52 @@ class TestAlertMessageBuilder:
         assert ")" in result
         assert result == "Nirim (Gaza Envelope)"
 
+    def test_loadCityTable(self, message_builder, sample_alert, tmp_path):
+        """Test a city table indexes its locations by area and records without an id or area names are skipped"""
+        table = tmp_path / "cities.json"
+        unnamed = {"taCityId": 6, "areaNameEn": "Gaza Envelope", "areaNameHe": "עוטף עזה"}
+        table.write_text(json.dumps([sample_alert, {"taCityId": 5}, unnamed, "Nirim"]), encoding="utf-8")
+
+        assert message_builder.loadCityTable(str(table)) == 2
+        assert message_builder.areaCities == {"Gaza Envelope": frozenset({171, 6})}
+
+    def test_loadCityTable_missing_table(self, message_builder, tmp_path):
+        """Test a missing city table leaves the area index empty"""
+        assert message_builder.loadCityTable(str(tmp_path / "missing.json")) == 0
+        assert message_builder.areaCities == {}
+
+    def test_buildAreaLocations_groups_by_area(self, message_builder, test_alerts_data):
+        """Test locations are listed once each, under their area, in order of first appearance"""
+        result = message_builder.buildAreaLocations(test_alerts_data[:4])
+
+        assert result == ("Gaza Envelope: Nirim, Ein HaShlosha\n"
+                          "Southern Negev: El For'eh and the Bedouin Diaspora, Kuseife and the Bedouin Diaspora\n")
+
+    def test_buildAreaLocations_entire_area(self, message_builder, test_alerts_data, tmp_path):
+        """Test an area whose every known location is alerting collapses to one line"""
+        table = tmp_path / "cities.json"
+        table.write_text(json.dumps(test_alerts_data), encoding="utf-8")
+        message_builder.loadCityTable(str(table))
+
+        result = message_builder.buildAreaLocations(test_alerts_data[:3])
+
+        assert result == "Entire area: Gaza Envelope\nSouthern Negev: El For'eh and the Bedouin Diaspora\n"
+
+    def test_buildAreaLocations_wraps_long_areas(self, message_builder, sample_alert):
+        """Test a large area continues on new lines that each fit AREA_LINE_LENGTH"""
+        alerts = [dict(sample_alert, englishName=f"Place {i}", taCityId=i) for i in range(200)]
+
+        lines = message_builder.buildAreaLocations(alerts).splitlines()
+
+        assert len(lines) > 1
+        assert all(line.startswith("Gaza Envelope: ") and len(line) <= 400 for line in lines)
+        names = [name for line in lines for name in line.removeprefix("Gaza Envelope: ").split(", ")]
+        assert names == [f"Place {i}" for i in range(200)]
+
+    def test_buildAreaLocations_without_area(self, message_builder, alert_missing_area):
+        """Test a location with no area keeps a line of its own"""
+        assert message_builder.buildAreaLocations([alert_missing_area]) == "Nirim\n"
+
     def test_buildMessageText_rocket_alert(self, message_builder):
         """Test buildMessageText formats rocket alert correctly"""
         timestamp = "2023-12-04 16:59:09"
@@ -64,6 +114,22 @@ class TestAlertMessageBuilder:
         assert "Red alert" in result
         assert timestamp in result
 
+    def test_buildLateSummary(self, message_builder):
+        """Test the late summary keeps the header and counts the locations"""
+        summary = message_builder.buildLateSummary(1, "2023-12-04 16:59:09", 12)
+
+        assert summary["text"].startswith("Rocket alert 2023-12-04 16:59:09:\n\n")
+        assert "12 locations" in summary["text"]
+
+    def test_buildReplaySummary(self, message_builder):
+        """Test the replay summary counts alerts and locations over the period missed"""
+        summary = message_builder.buildReplaySummary(3, 40, "2023-12-04 16:59:09", "2023-12-04 17:20:00")
+
+        assert summary["text"].startswith("Missed while offline 2023-12-04 16:59:09 - 2023-12-04 17:20:00:\n\n")
+        assert "3 alerts, 40 locations" in summary["text"]
+        single = message_builder.buildReplaySummary(1, 1, "2023-12-04 16:59:09", "2023-12-04 16:59:09")
+        assert single["text"].startswith("Missed while offline 2023-12-04 16:59:09:\n\n1 alert, 1 location")
+
     def test_buildMarker_success(self, message_builder, sample_alert):
         """Test buildMarker creates correct marker string"""
         result = message_builder.buildMarker(sample_alert)
@@ -83,6 +149,116 @@ class TestAlertMessageBuilder:
             assert isinstance(result, str)
             assert len(result) > 0
 
+    def test_buildPolygonOverlay_encoded_once(self, message_builder, sample_alert):
+        """Test a location's overlay is encoded on its first alert only"""
+        with patch('message_builder.polyline.encode', wraps=polyline.encode) as encode:
+            first = message_builder.buildPolygonOverlay(sample_alert)
+            second = message_builder.buildPolygonOverlay(dict(sample_alert))
+
+        assert first.startswith("path+ff0000+bb1b1b(")
+        assert second is first
+        encode.assert_called_once()
+
+    def test_buildPolygonOverlay_cache_is_bounded(self, message_builder, sample_alert, monkeypatch):
+        """Test the least recently used overlay is evicted once the cache is full"""
+        monkeypatch.setattr("message_builder.OVERLAY_CACHE_SIZE", 2)
+        for cityId in (171, 178, 171, 115):
+            message_builder.buildPolygonOverlay(dict(sample_alert, taCityId=cityId))
+
+        assert list(message_builder.overlays) == ["171", "115"]
+
+    def test_buildPolygonOverlay_unknown_location(self, message_builder, sample_alert):
+        """Test a location without a polygon has no overlay, and that's cached too"""
+        assert message_builder.buildPolygonOverlay(dict(sample_alert, taCityId=999999)) is None
+        assert message_builder.overlays["999999"] is None
+
+    def test_simplifiedPolygon_coarsest_level_within_fidelity(self, message_builder, tmp_path, monkeypatch):
+        """Test overlays use the coarsest stored level that keeps the shape"""
+        from polygon_store import PolygonStore, buildPolygonStore
+        polygons = {"171": message_builder.polygons["171"]}
+        path = tmp_path / "polygons.bin"
+        buildPolygonStore(polygons, str(path))
+        message_builder.polygons = PolygonStore(str(path))
+
+        simplified = message_builder.simplifiedPolygon("171")
+        monkeypatch.setattr("message_builder.MAP_SIMPLIFY_FIDELITY", 0)
+        full = message_builder.simplifiedPolygon("171")
+
+        assert len(simplified) < len(full)
+        assert full == [tuple(point) for point in polygons["171"]]
+
+    def test_simplifiedPolygon_from_json(self, message_builder, sample_alert):
+        """Test polygons.json polygons are simplified when encoded"""
+        simplified = message_builder.simplifiedPolygon("171")
+
+        assert len(simplified) < len(message_builder.polygons["171"])
+        assert message_builder.buildPolygonOverlay(sample_alert) == \
+            f"path+ff0000+bb1b1b({urllib.parse.quote(polyline.encode(simplified, 5))})"
+
+    def test_buildUnionOverlays_merges_neighbours(self, message_builder):
+        """Test neighbouring locations are outlined by one overlay, shorter than theirs together"""
+        overlays = message_builder.buildUnionOverlays({745, 754})
+
+        separate = [message_builder.encodePolygonOverlay(cityId) for cityId in ("745", "754")]
+        assert len(overlays) == 1
+        assert overlays[0].startswith("path+ff0000+bb1b1b(")
+        assert len(overlays[0]) < sum(len(overlay) for overlay in separate)
+
+    def test_buildUnionOverlays_cached(self, message_builder, monkeypatch):
+        """Test a set of locations is merged once, however its ids are given"""
+        monkeypatch.setattr("message_builder.UNION_CACHE_SIZE", 1)
+        with patch('message_builder.unionPolygons', wraps=unionPolygons) as union:
+            first = message_builder.buildUnionOverlays({745, 754})
+            second = message_builder.buildUnionOverlays(["754", "745"])
+            message_builder.buildUnionOverlays({744, 745})
+
+        assert second is first
+        assert union.call_count == 2
+        assert list(message_builder.unions) == [frozenset({"744", "745"})]
+
+    def test_buildUnionOverlays_whole_area_from_city_table(self, message_builder, sample_alert, tmp_path):
+        """Test a whole area of the city table is merged on first use and kept apart from the union cache"""
+        table = tmp_path / "cities.json"
+        table.write_text(json.dumps([dict(sample_alert, taCityId=cityId) for cityId in (744, 745, 754)]), encoding="utf-8")
+        message_builder.loadCityTable(str(table))
+        assert message_builder.areaUnions == {}
+
+        first = message_builder.buildUnionOverlays({754, 745, 744})
+        with patch('message_builder.unionPolygons') as union:
+            second = message_builder.buildUnionOverlays({744, 745, 754})
+
+        union.assert_not_called()
+        assert second is first
+        assert first is message_builder.areaUnions[frozenset({"744", "745", "754"})]
+        assert message_builder.unions == {}
+
+    def test_buildUnionOverlays_without_polygons(self, message_builder):
+        """Test locations without polygons have no union"""
+        assert message_builder.buildUnionOverlays({999998, 999999}) is None
+        message_builder.polygons = None
+        assert message_builder.buildUnionOverlays({745, 754}) is None
+
+    def test_loadPolygons_prefers_store(self, message_builder, tmp_path, monkeypatch):
+        """Test the binary polygon store is used when it has been built"""
+        from polygon_store import PolygonStore, buildPolygonStore
+        path = tmp_path / "polygons.bin"
+        buildPolygonStore({"171": [[31.3357, 34.3941], [31.3301, 34.3988]]}, str(path))
+        monkeypatch.setattr("message_builder.POLYGON_STORE_PATH", str(path))
+
+        polygons = message_builder.loadPolygons()
+
+        assert isinstance(polygons, PolygonStore)
+        assert polygons.get("171") == [(31.3357, 34.3941), (31.3301, 34.3988)]
+
+    def test_loadPolygons_falls_back_to_json(self, message_builder, tmp_path, monkeypatch):
+        """Test polygons.json is loaded when there's no polygon store"""
+        monkeypatch.setattr("message_builder.POLYGON_STORE_PATH", str(tmp_path / "missing.bin"))
+
+        polygons = message_builder.loadPolygons()
+
+        assert isinstance(polygons, dict)
+        assert "171" in polygons
+
     def test_buildMessage_structure(self, message_builder):
         """Test buildMessage returns correct structure"""
         static_map = {"overlays": [], "markers": []}
@@ -115,6 +291,60 @@ class TestAlertMessageBuilder:
 
         assert timestamp in result["text"]
 
+    def test_buildMessage_with_map(self, message_builder, sample_alert):
+        """Test a message with map data carries its static map"""
+        static_map = message_builder.addStaticMapData(sample_alert, {"overlays": [], "markers": []})
+
+        result = message_builder.buildMessage(static_map, 0, 1, "2023-12-04 16:59:09", "Nirim (Gaza Envelope)\n")
+
+        assert result["map"] is static_map
+
+    def test_buildMessage_with_outline_only(self, message_builder):
+        """Test a map of area outlines without pins is still attached"""
+        static_map = {"overlays": message_builder.buildUnionOverlays({745, 754}), "markers": []}
+
+        result = message_builder.buildMessage(static_map, 0, 1, "2023-12-04 16:59:09", "Confrontation Line: a, b\n")
+
+        assert result["map"] is static_map
+
+    def test_getMapImage_fetched_once(self, message_builder, sample_alert, tmp_path):
+        """Test the same places in any order reuse the map already downloaded"""
+        from map_cache import MapImageCache
+        message_builder.mapCache = MapImageCache(str(tmp_path / "maps"))
+        first = message_builder.addStaticMapData(sample_alert, {"overlays": [], "markers": []})
+        first = message_builder.addStaticMapData(dict(sample_alert, taCityId=178, lat=31.3, lon=34.4), first)
+        second = {"overlays": first["overlays"][::-1], "markers": first["markers"][::-1]}
+
+        with patch('message_builder.requests.get', return_value=Mock(content=b"png")) as get:
+            assert message_builder.getMapImage(first) == b"png"
+            assert message_builder.getMapImage(second) == b"png"
+
+        get.assert_called_once_with(message_builder.getMapURL(first))
+
+    def test_getMapImage_error_not_cached(self, message_builder, sample_alert, tmp_path):
+        """Test an error response from Mapbox raises and isn't cached"""
+        from map_cache import MapImageCache
+        message_builder.mapCache = MapImageCache(str(tmp_path / "maps"))
+        static_map = message_builder.addStaticMapData(sample_alert, {"overlays": [], "markers": []})
+        response = Mock(content=b'{"message": "Not Authorized"}')
+        response.raise_for_status.side_effect = Exception("401")
+
+        with patch('message_builder.requests.get', return_value=response):
+            with pytest.raises(Exception):
+                message_builder.getMapImage(static_map)
+
+        assert message_builder.mapCache.memory == {}
+        assert not (tmp_path / "maps").exists()
+
+    def test_WriteMapToFile(self, message_builder, sample_alert, tmp_path):
+        """Test the map image is written to the file"""
+        static_map = message_builder.addStaticMapData(sample_alert, {"overlays": [], "markers": []})
+
+        with patch.object(message_builder, 'getMapImage', return_value=b"png"):
+            message_builder.WriteMapToFile(static_map, str(tmp_path / "map.png"))
+
+        assert (tmp_path / "map.png").read_bytes() == b"png"
+
     def test_getMapURL_construction(self, message_builder):
         """Test getMapURL constructs valid URL"""
         static_map = {
@@ -127,6 +357,23 @@ class TestAlertMessageBuilder:
         assert "https://api.mapbox.com" in result
         assert "mapbox" in result.lower()
 
+    def test_getMapURL_overlays_without_markers(self, message_builder):
+        """Test a map of outlines alone, like a merged area, has no empty place in its URL"""
+        result = message_builder.getMapURL({"overlays": ["path+ff0000+bb1b1b(abc)", "path+ff0000+bb1b1b(def)"], "markers": []})
+
+        assert "/static/path+ff0000+bb1b1b(abc),path+ff0000+bb1b1b(def)/auto/" in result
+        assert message_builder.getMapURL({"overlays": [], "markers": ["pin-s+ff0000(34.39,31.33)"]}).count("/static/pin-s") == 1
+
+    def test_getMapURL_merged_area(self, message_builder, test_alerts_data):
+        """Test the packed map of two neighbours merged into one outline is a valid URL"""
+        from map_packer import MapPacker
+        _, staticMap = MapPacker(message_builder, areaUnions=True).pack(test_alerts_data[:2])[0]
+
+        result = message_builder.getMapURL(staticMap)
+
+        assert staticMap["markers"] == []
+        assert ",/auto/" not in result and "/static//" not in result
+
     def test_buildMessage_with_multiple_locations(self, message_builder):
         """Test buildMessage handles multiple alert locations"""
         static_map = {"overlays": [], "markers": []}
@@ -1,4 +1,5 @@
 import pytest
+import time
 from unittest.mock import Mock, patch, MagicMock, call
 from message_manager import MessageManager
 
@@ -190,3 +191,528 @@ class TestMessageManager:
 
         # Should contain newlines for multiple locations
         assert alert_locations.count('\n') >= 4  # At least 5 locations
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_postMessage_sink_failure_isolated(self, mock_builder_class, mock_telegram_class,
+                                               mock_mastodon_class, mock_env_vars, sample_event_data):
+        """Test a Telegram failure doesn't keep the message from Mastodon"""
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram.sendMessage.side_effect = Exception("Telegram error")
+        mock_telegram_class.return_value = mock_telegram
+
+        mock_mastodon = MagicMock()
+        mock_mastodon_class.return_value = mock_mastodon
+
+        manager = MessageManager()
+        manager.postMessage(sample_event_data)
+
+        mock_mastodon.sendMessage.assert_called_once_with("Alert message")
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_postMessage_attaches_map_image(self, mock_builder_class, mock_telegram_class,
+                                            mock_mastodon_class, mock_env_vars, sample_event_data):
+        """Test a message's static map is fetched and handed to every sink with its text"""
+        staticMap = {"overlays": [], "markers": ["pin-s+ff0000(34.3941,31.3357)"]}
+        mock_builder = MagicMock()
+        mock_builder.buildMessage.return_value = {"text": "Alert message", "map": staticMap}
+        mock_builder.getMapImage.return_value = b"png"
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        mock_mastodon = MagicMock()
+        mock_mastodon_class.return_value = mock_mastodon
+
+        manager = MessageManager()
+        manager.postMessage(sample_event_data)
+
+        mock_builder.getMapImage.assert_called_with(staticMap)
+        mock_telegram.sendMessage.assert_called_once_with("Alert message", b"png")
+        mock_mastodon.sendMessage.assert_called_once_with("Alert message", b"png")
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_postMessage_without_map_it_cant_fetch(self, mock_builder_class, mock_telegram_class,
+                                                   mock_mastodon_class, mock_env_vars, sample_event_data):
+        """Test a map that can't be fetched doesn't hold back the text"""
+        mock_builder = MagicMock()
+        mock_builder.buildMessage.return_value = {"text": "Alert message", "map": {"overlays": [], "markers": ["pin"]}}
+        mock_builder.getMapImage.side_effect = Exception("503 Server Error")
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        mock_mastodon = MagicMock()
+        mock_mastodon_class.return_value = mock_mastodon
+
+        manager = MessageManager()
+        manager.postMessage(sample_event_data)
+
+        mock_telegram.sendMessage.assert_called_once_with("Alert message")
+        mock_mastodon.sendMessage.assert_called_once_with("Alert message")
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_postMessage_sinks_run_concurrently(self, mock_builder_class, mock_telegram_class,
+                                                mock_mastodon_class, mock_env_vars, sample_event_data):
+        """Test posting takes as long as the slowest sink, not the sum"""
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram.sendMessage.side_effect = lambda text: time.sleep(0.3)
+        mock_telegram_class.return_value = mock_telegram
+
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.side_effect = lambda text: time.sleep(0.3)
+        mock_mastodon_class.return_value = mock_mastodon
+
+        manager = MessageManager()
+        start = time.monotonic()
+        manager.postMessage(sample_event_data)
+        duration = time.monotonic() - start
+
+        assert duration < 0.55
+        mock_telegram.sendMessage.assert_called_once()
+        mock_mastodon.sendMessage.assert_called_once()
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_postMessage_acks_outbox_per_sink(self, mock_builder_class, mock_telegram_class,
+                                              mock_mastodon_class, mock_env_vars, sample_event_data):
+        """Test each sink acks its outbox delivery, or parks it for a retry when posting failed"""
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram.sendMessage.return_value = True
+        mock_telegram_class.return_value = mock_telegram
+
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.return_value = False
+        mock_mastodon_class.return_value = mock_mastodon
+
+        outbox = MagicMock()
+        manager = MessageManager(outbox)
+        sample_event_data["outboxIds"] = [7, 8]
+        manager.postMessage(sample_event_data)
+
+        outbox.ack.assert_called_once_with([7, 8], "Telegram")
+        # Still owed by Mastodon: parked, not handed back to the outbox
+        outbox.release.assert_not_called()
+        assert len(manager.retryQueues["Mastodon"]) == 1
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_replayOutbox_posts_to_pending_sinks_only(self, mock_builder_class, mock_telegram_class,
+                                                      mock_mastodon_class, mock_env_vars, fresh_event_data):
+        """Test replayed events only go to the sinks that hadn't posted them"""
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.return_value = True
+        mock_mastodon_class.return_value = mock_mastodon
+
+        outbox = MagicMock()
+        outbox.pending.return_value = {3: (fresh_event_data, ["Mastodon"])}
+        manager = MessageManager(outbox)
+        manager.replayOutbox()
+
+        mock_telegram.sendMessage.assert_not_called()
+        mock_mastodon.sendMessage.assert_called_once_with("Alert message")
+        outbox.ack.assert_called_once_with([3], "Mastodon")
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_replayOutbox_dead_letters_unbuildable_event(self, mock_builder_class, mock_telegram_class,
+                                                         mock_mastodon_class, mock_env_vars, fresh_event_data):
+        """Test an event no message can be built from is dead-lettered for its pending sinks, and the rest still replay"""
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.return_value = True
+        mock_mastodon_class.return_value = mock_mastodon
+
+        outbox = MagicMock()
+        outbox.pending.return_value = {
+            3: ({"alertTypeId": 1}, ["Mastodon"]),
+            4: (fresh_event_data, ["Mastodon"]),
+        }
+        manager = MessageManager(outbox)
+        manager.replayOutbox()
+
+        outbox.deadLetter.assert_called_once_with([3], "Mastodon")
+        mock_mastodon.sendMessage.assert_called_once_with("Alert message")
+        outbox.ack.assert_called_once_with([4], "Mastodon")
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_unbuildable_coalesced_event_stays_pending(self, mock_builder_class, mock_telegram_class,
+                                                       mock_mastodon_class, mock_env_vars):
+        """Test a merged event that can't be built leaves its parts to be replayed one by one"""
+        mock_builder_class.return_value = MagicMock()
+        mock_telegram_class.return_value = MagicMock()
+        mock_mastodon_class.return_value = MagicMock()
+
+        outbox = MagicMock()
+        manager = MessageManager(outbox)
+        with pytest.raises(KeyError):
+            manager.postMessage({"alertTypeId": 1, "alerts": [{"name": "Nirim"}], "outboxIds": [5, 6]})
+
+        outbox.deadLetter.assert_not_called()
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_replayOutbox_summarizes_stale_events_once_per_sink(self, mock_builder_class, mock_telegram_class,
+                                                                mock_mastodon_class, mock_env_vars, fresh_event_data,
+                                                                monkeypatch):
+        """Test events that went stale while down are posted as one summary per sink, fresh ones in full"""
+        monkeypatch.setenv("DEADLINE_POLICY_TELEGRAM", "summarize")
+        monkeypatch.setenv("DEADLINE_POLICY_MASTODON", "drop")
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder.buildReplaySummary.return_value = {"text": "Replay summary"}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        mock_mastodon = MagicMock()
+        mock_mastodon_class.return_value = mock_mastodon
+
+        def stale(timeStamp, count):
+            return {"alertTypeId": 1, "alerts": [{"name": "Nirim", "timeStamp": timeStamp, "countdownSec": 15}] * count}
+
+        outbox = MagicMock()
+        outbox.pending.return_value = {
+            1: (stale("2023-12-04 16:59:09", 2), ["Telegram", "Mastodon"]),
+            2: (fresh_event_data, ["Telegram"]),
+            3: (stale("2023-12-04 17:20:00", 3), ["Telegram"]),
+            4: (stale("2023-12-04 16:00:00", 1), ["Mastodon"]),
+        }
+        manager = MessageManager(outbox)
+        manager.replayOutbox()
+
+        assert [c.args[0] for c in mock_telegram.sendMessage.call_args_list] == ["Alert message", "Replay summary"]
+        mock_builder.buildReplaySummary.assert_called_once_with(2, 5, "2023-12-04 16:59:09", "2023-12-04 17:20:00")
+        mock_mastodon.sendMessage.assert_not_called()
+        outbox.ack.assert_any_call([2], "Telegram")
+        outbox.ack.assert_any_call([1, 3], "Telegram")
+        outbox.ack.assert_any_call([1], "Mastodon")
+        outbox.ack.assert_any_call([4], "Mastodon")
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_breaker_parks_events_and_drains_on_recovery(self, mock_builder_class, mock_telegram_class,
+                                                         mock_mastodon_class, mock_env_vars):
+        """Test a failing sink is cut off, its events parked, and posted in order once it recovers"""
+        from circuit_breaker import CircuitBreaker, OPEN, CLOSED
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.side_effect = lambda alert: alert["name"]
+        mock_builder.buildMessage.side_effect = lambda staticMap, count, alertTypeId, timestamp, locations: {"text": locations}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram_class.return_value = MagicMock()
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.return_value = False
+        mock_mastodon_class.return_value = mock_mastodon
+
+        outbox = MagicMock()
+        manager = MessageManager(outbox)
+        manager.breakers["Mastodon"] = CircuitBreaker("mastodon", failureThreshold=2, resetTimeout=0.2)
+
+        def event(name, outboxId):
+            return {"alertTypeId": 1, "outboxIds": [outboxId],
+                    "alerts": [{"name": name, "timeStamp": "2023-12-04 16:59:09"}]}
+
+        # A fails and is parked; B is parked behind it, and A's retry
+        # opens the breaker
+        manager.postMessage(event("A", 1))
+        manager.postMessage(event("B", 2))
+        assert manager.breakers["Mastodon"].state == OPEN
+
+        # Fails fast while open: the sink isn't called, the event is parked
+        # and left pending in the outbox
+        manager.postMessage(event("C", 3))
+        manager.postMessage(event("D", 4))
+        assert mock_mastodon.sendMessage.call_count == 2
+        assert len(manager.retryQueues["Mastodon"]) == 4
+        outbox.release.assert_not_called()
+
+        mock_mastodon.sendMessage.return_value = True
+        deadline = time.monotonic() + 2
+        while manager.retryQueues["Mastodon"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert manager.breakers["Mastodon"].state == CLOSED
+        assert [c.args[0] for c in mock_mastodon.sendMessage.call_args_list[2:]] == ["A\n", "B\n", "C\n", "D\n"]
+        assert [c.args[0] for c in outbox.ack.call_args_list if c.args[1] == "Mastodon"] == [[1], [2], [3], [4]]
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_failed_post_is_retried_before_breaker_opens(self, mock_builder_class, mock_telegram_class,
+                                                         mock_mastodon_class, mock_env_vars, sample_event_data):
+        """Test a single failed post is parked and retried on its own, with no later event to push it"""
+        from circuit_breaker import CircuitBreaker, CLOSED
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder_class.return_value = mock_builder
+        mock_telegram_class.return_value = MagicMock()
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.side_effect = [False, True]
+        mock_mastodon_class.return_value = mock_mastodon
+
+        outbox = MagicMock()
+        manager = MessageManager(outbox)
+        manager.breakers["Mastodon"] = CircuitBreaker("mastodon", failureThreshold=3, resetTimeout=0.2)
+        sample_event_data["outboxIds"] = [9]
+        manager.postMessage(sample_event_data)
+        assert manager.breakers["Mastodon"].state == CLOSED
+        assert len(manager.retryQueues["Mastodon"]) == 1
+
+        deadline = time.monotonic() + 2
+        while manager.retryQueues["Mastodon"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert mock_mastodon.sendMessage.call_count == 2
+        outbox.ack.assert_any_call([9], "Mastodon")
+        outbox.release.assert_not_called()
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_throttled_sink_does_not_hold_up_others(self, mock_builder_class, mock_telegram_class,
+                                                    mock_mastodon_class, mock_env_vars):
+        """Test a rate-limited sink parks its events instead of stalling posting, and posts them once allowed"""
+        from circuit_breaker import CLOSED
+        from rate_limiter import Throttled
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.side_effect = lambda alert: alert["name"]
+        mock_builder.buildMessage.side_effect = lambda staticMap, count, alertTypeId, timestamp, locations: {"text": locations}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        throttledUntil = time.monotonic() + 0.3
+
+        def mastodonSend(text):
+            if time.monotonic() < throttledUntil:
+                raise Throttled("mastodon", throttledUntil - time.monotonic())
+            return True
+
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.side_effect = mastodonSend
+        mock_mastodon_class.return_value = mock_mastodon
+
+        outbox = MagicMock()
+        manager = MessageManager(outbox)
+        start = time.monotonic()
+        for outboxId, name in enumerate("ABC"):
+            manager.postMessage({"alertTypeId": 1, "outboxIds": [outboxId],
+                                 "alerts": [{"name": name, "timeStamp": "2023-12-04 16:59:09"}]})
+        duration = time.monotonic() - start
+
+        assert duration < 0.2
+        assert [c.args[0] for c in mock_telegram.sendMessage.call_args_list] == ["A\n", "B\n", "C\n"]
+        assert len(manager.retryQueues["Mastodon"]) == 3
+
+        deadline = time.monotonic() + 2
+        while manager.retryQueues["Mastodon"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        posted = [c.args[0] for c in mock_mastodon.sendMessage.call_args_list]
+        assert posted[-3:] == ["A\n", "B\n", "C\n"]
+        # Being throttled isn't failing
+        assert manager.breakers["Mastodon"].state == CLOSED
+        assert manager.breakers["Mastodon"].failures == 0
+        assert [c.args[0] for c in outbox.ack.call_args_list if c.args[1] == "Mastodon"] == [[0], [1], [2]]
+        outbox.release.assert_not_called()
+
+    @patch('message_manager.BREAKER_RETRY_QUEUE_SIZE', 2)
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_full_retry_queue_keeps_most_urgent(self, mock_builder_class, mock_telegram_class,
+                                                mock_mastodon_class, mock_env_vars):
+        """Test a full retry queue gives up the event parked first, not the one due soonest"""
+        outbox = MagicMock()
+        manager = MessageManager(outbox)
+        now = time.time()
+
+        for outboxId, deadline in enumerate((now + 60, now + 15, now + 30)):
+            manager.park("Mastodon", {"messages": [], "deadline": deadline, "summary": None, "outboxIds": [outboxId]})
+
+        assert sorted(entry[2]["outboxIds"][0] for entry in manager.retryQueues["Mastodon"]) == [1, 2]
+        outbox.release.assert_called_once_with([0], "Mastodon")
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_expired_event_follows_sink_policy(self, mock_builder_class, mock_telegram_class,
+                                               mock_mastodon_class, mock_env_vars, sample_event_data, monkeypatch):
+        """Test an event past its deadline is summarized on one sink and dropped on another"""
+        from metrics import metrics
+        metrics.reset()
+        monkeypatch.setenv("DEADLINE_POLICY_TELEGRAM", "summarize")
+        monkeypatch.setenv("DEADLINE_POLICY_MASTODON", "drop")
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.return_value = "Nirim (Gaza Envelope)"
+        mock_builder.buildMessage.return_value = {"text": "Alert message"}
+        mock_builder.buildLateSummary.return_value = {"text": "Late summary"}
+        mock_builder_class.return_value = mock_builder
+
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        mock_mastodon = MagicMock()
+        mock_mastodon_class.return_value = mock_mastodon
+
+        outbox = MagicMock()
+        manager = MessageManager(outbox)
+        sample_event_data["deadline"] = time.time() - 1
+        sample_event_data["outboxIds"] = [5]
+        manager.postMessage(sample_event_data)
+
+        mock_telegram.sendMessage.assert_called_once_with("Late summary")
+        mock_mastodon.sendMessage.assert_not_called()
+        # Dropping is a final outcome: the outbox doesn't replay it
+        outbox.ack.assert_any_call([5], "Mastodon")
+        assert metrics.counter("deadline.telegram.missed") == 1
+        assert metrics.counter("deadline.telegram.summarize") == 1
+        assert metrics.counter("deadline.mastodon.drop") == 1
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_retry_queue_drains_earliest_deadline_first(self, mock_builder_class, mock_telegram_class,
+                                                        mock_mastodon_class, mock_env_vars, monkeypatch):
+        """Test parked events are posted by deadline and those that expired while parked are dropped"""
+        from circuit_breaker import CircuitBreaker
+        monkeypatch.setenv("DEADLINE_POLICY_MASTODON", "drop")
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.side_effect = lambda alert: alert["name"]
+        mock_builder.buildMessage.side_effect = lambda staticMap, count, alertTypeId, timestamp, locations: {"text": locations}
+        mock_builder_class.return_value = mock_builder
+        mock_telegram_class.return_value = MagicMock()
+        mock_mastodon = MagicMock()
+        mock_mastodon.sendMessage.return_value = False
+        mock_mastodon_class.return_value = mock_mastodon
+
+        manager = MessageManager()
+        manager.breakers["Mastodon"] = CircuitBreaker("mastodon", failureThreshold=1, resetTimeout=0.3)
+        now = time.time()
+
+        def event(name, deadline):
+            return {"alertTypeId": 1, "deadline": deadline,
+                    "alerts": [{"name": name, "timeStamp": "2023-12-04 16:59:09"}]}
+
+        manager.postMessage(event("Opens breaker", now + 60))
+        manager.postMessage(event("Later", now + 60))
+        manager.postMessage(event("Sooner", now + 30))
+        manager.postMessage(event("Expires while parked", now + 0.1))
+
+        mock_mastodon.sendMessage.return_value = True
+        deadline = time.monotonic() + 2
+        while manager.retryQueues["Mastodon"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        posted = [c.args[0] for c in mock_mastodon.sendMessage.call_args_list[1:]]
+        assert posted == ["Sooner\n", "Opens breaker\n", "Later\n"]
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_postMessage_orders_locations_by_urgency(self, mock_builder_class, mock_telegram_class,
+                                                     mock_mastodon_class, mock_env_vars, test_alerts_data):
+        """Test the shortest countdowns are listed first, arrival order kept within a countdown"""
+        mock_builder = MagicMock()
+        mock_builder.buildAlert.side_effect = lambda alert: alert["englishName"]
+        mock_builder.buildMessage.side_effect = lambda staticMap, count, alertTypeId, timestamp, locations: {"text": locations}
+        mock_builder_class.return_value = mock_builder
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        mock_mastodon_class.return_value = MagicMock()
+
+        manager = MessageManager()
+        manager.postMessage({"alertTypeId": 1, "alerts": test_alerts_data})
+
+        listed = mock_telegram.sendMessage.call_args[0][0].splitlines()
+        expected = sorted(test_alerts_data, key=lambda alert: alert["countdownSec"])
+        assert listed == [alert["englishName"] for alert in expected]
+
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    @patch('message_manager.AlertMessageBuilder')
+    def test_postMessage_areas_layout(self, mock_builder_class, mock_telegram_class,
+                                      mock_mastodon_class, mock_env_vars, test_alerts_data):
+        """Test the areas layout lists locations by area instead of one per line"""
+        mock_builder = MagicMock()
+        mock_builder.layout = "areas"
+        mock_builder.buildAreaLocations.return_value = "Gaza Envelope: Nirim\n"
+        mock_builder.buildMessage.side_effect = lambda staticMap, count, alertTypeId, timestamp, locations: {"text": locations}
+        mock_builder_class.return_value = mock_builder
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        mock_mastodon_class.return_value = MagicMock()
+
+        manager = MessageManager()
+        manager.postMessage({"alertTypeId": 1, "alerts": test_alerts_data})
+
+        mock_builder.buildAlert.assert_not_called()
+        # Still handed over most urgent first
+        alerts = mock_builder.buildAreaLocations.call_args[0][0]
+        assert [alert["countdownSec"] for alert in alerts] == sorted(alert["countdownSec"] for alert in test_alerts_data)
+        mock_telegram.sendMessage.assert_called_once_with("Gaza Envelope: Nirim\n")
+
+    @patch('message_manager.STATIC_MAPS', 1)
+    @patch('message_manager.MastodonBot')
+    @patch('message_manager.TelegramBot')
+    def test_postMessage_one_message_per_map(self, mock_telegram_class, mock_mastodon_class,
+                                             mock_env_vars, test_alerts_data):
+        """Test static maps split the event into one message per map, listing that map's locations"""
+        mock_telegram = MagicMock()
+        mock_telegram_class.return_value = mock_telegram
+        mock_mastodon_class.return_value = MagicMock()
+
+        manager = MessageManager()
+        manager.mapPacker.maxLength = manager.mapPacker.baseLength + 1500
+        manager.postMessage({"alertTypeId": 1, "alerts": test_alerts_data})
+
+        texts = [call.args[0] for call in mock_telegram.sendMessage.call_args_list]
+        assert len(texts) > 1
+        listed = [line for text in texts for line in text.splitlines()[2:] if line]
+        assert sorted(listed) == sorted(manager.messageBuilder.buildAlert(alert) for alert in test_alerts_data)
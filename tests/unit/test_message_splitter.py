@@ -0,0 +1,62 @@
+import pytest
+from message_splitter import splitMessage, utf16Length
+
+
+@pytest.mark.unit
+class TestUtf16Length:
+    """Tests for utf16Length function"""
+
+    def test_bmp_text_counts_characters(self):
+        """Test Latin and Hebrew text count one unit per character"""
+        assert utf16Length("Sderot") == 6
+        assert utf16Length("שדרות") == 5
+
+    def test_astral_characters_count_twice(self):
+        """Test characters outside the BMP count as a surrogate pair"""
+        assert utf16Length("🚀") == 2
+        assert utf16Length("🚀 Sderot") == 9
+
+
+@pytest.mark.unit
+class TestSplitMessage:
+    """Tests for splitMessage function"""
+
+    def test_short_message_is_one_chunk(self):
+        """Test content under the limit comes back as a single chunk"""
+        assert splitMessage("Line 1\nLine 2\n", 100) == ["Line 1\nLine 2\n"]
+
+    def test_no_line_is_lost(self):
+        """Test every line ends up in exactly one chunk, in order"""
+        lines = [f"Location {index}" for index in range(200)]
+        chunks = splitMessage("\n".join(lines), 50)
+
+        assert "".join(chunks).splitlines() == lines
+        assert all(len(chunk) <= 50 for chunk in chunks)
+
+    def test_packs_chunks_full(self):
+        """Test lines are packed so a chunk ends only when the next line wouldn't fit"""
+        chunks = splitMessage("aaaa\nbbbb\ncccc\ndddd", 10)
+
+        assert chunks == ["aaaa\nbbbb\n", "cccc\ndddd\n"]
+
+    def test_overlong_line_is_cut(self):
+        """Test a line longer than the limit is cut instead of sent over the limit"""
+        chunks = splitMessage("short\n" + "x" * 25 + "\nafter", 10)
+
+        assert all(len(chunk) <= 10 for chunk in chunks)
+        assert "".join(chunks).replace("\n", "") == "short" + "x" * 25 + "after"
+
+    def test_utf16_limit(self):
+        """Test chunk size is measured with the given length function"""
+        line = "🚀" * 3
+        chunks = splitMessage("\n".join([line] * 4), 14, utf16Length)
+
+        assert all(utf16Length(chunk) <= 14 for chunk in chunks)
+        assert len(chunks) == 2
+
+    def test_overlong_utf16_line_is_cut(self):
+        """Test cutting counts surrogate pairs and never exceeds the limit"""
+        chunks = splitMessage("🚀" * 20, 9, utf16Length)
+
+        assert all(utf16Length(chunk) <= 9 for chunk in chunks)
+        assert "".join(chunks).replace("\n", "") == "🚀" * 20
@@ -0,0 +1,37 @@
+import json
+import pytest
+from metrics import Metrics
+
+
+@pytest.mark.unit
+class TestMetrics:
+    """Tests for Metrics class"""
+
+    def test_counters_and_gauges(self):
+        """Test counters accumulate and gauges keep the last value"""
+        registry = Metrics()
+        registry.increment("a")
+        registry.increment("a", 2)
+        registry.setGauge("g", 5)
+        registry.setGauge("g", 3)
+
+        assert registry.counter("a") == 3
+        assert registry.gauge("g") == 3
+        assert registry.counter("missing") == 0
+
+    def test_max_gauge(self):
+        """Test setMaxGauge only ever increases"""
+        registry = Metrics()
+        registry.setMaxGauge("m", 4)
+        registry.setMaxGauge("m", 2)
+        assert registry.gauge("m") == 4
+
+    def test_writeToFile(self, tmp_path):
+        """Test the snapshot is written as JSON"""
+        registry = Metrics()
+        registry.increment("a")
+        path = tmp_path / "metrics.json"
+
+        registry.writeToFile(path)
+
+        assert json.loads(path.read_text()) == {"counters": {"a": 1}, "gauges": {}}
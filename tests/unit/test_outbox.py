@@ -0,0 +1,135 @@
+import pytest
+from unittest.mock import MagicMock
+from outbox import Outbox, OutboxRecorder
+from alert_coalescer import AlertCoalescer
+from post_queue import PostQueue
+
+SINKS = ["Telegram", "Mastodon"]
+
+
+def event(name, alertTypeId=1):
+    return {"alertTypeId": alertTypeId, "alerts": [{"name": name, "timeStamp": "2023-12-04 16:59:09"}]}
+
+
+@pytest.fixture
+def outboxPath(tmp_path):
+    return str(tmp_path / "outbox.db")
+
+
+@pytest.mark.unit
+class TestOutbox:
+    """Tests for Outbox class"""
+
+    def test_enqueue_is_pending_for_every_sink(self, outboxPath):
+        """Test a new event is pending for all sinks"""
+        outbox = Outbox(outboxPath)
+        messageId = outbox.enqueue(event("A"), SINKS)
+
+        pending = outbox.pending()
+        assert list(pending) == [messageId]
+        assert pending[messageId] == (event("A"), SINKS)
+        outbox.close()
+
+    def test_ack_by_all_sinks_removes_event(self, outboxPath):
+        """Test the event is gone once every sink acked it"""
+        outbox = Outbox(outboxPath)
+        messageId = outbox.enqueue(event("A"), SINKS)
+
+        outbox.ack([messageId], "Telegram")
+        assert outbox.pending()[messageId][1] == ["Mastodon"]
+
+        outbox.ack([messageId], "Mastodon")
+        assert outbox.pending() == {}
+        assert outbox.connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+        outbox.close()
+
+    def test_survives_restart(self, outboxPath):
+        """Test undelivered events are still pending after reopening the file"""
+        outbox = Outbox(outboxPath, commitBatch=1000, commitIntervalMs=60000)
+        first = outbox.enqueue(event("A"), SINKS)
+        second = outbox.enqueue(event("B"), SINKS)
+        outbox.ack([first], "Telegram")
+        outbox.close()
+
+        reopened = Outbox(outboxPath)
+        pending = reopened.pending()
+        assert pending[first] == (event("A"), ["Mastodon"])
+        assert pending[second] == (event("B"), SINKS)
+        reopened.close()
+
+    def test_release_leaves_event_pending(self, outboxPath):
+        """Test a released delivery is replayed to its sink"""
+        outbox = Outbox(outboxPath)
+        messageId = outbox.enqueue(event("A"), SINKS)
+
+        outbox.release([messageId], "Telegram")
+
+        assert outbox.pending()[messageId] == (event("A"), SINKS)
+        outbox.close()
+
+    def test_dead_letter_is_not_replayed(self, outboxPath):
+        """Test a dead-lettered delivery isn't pending after a restart, but its event is kept"""
+        outbox = Outbox(outboxPath)
+        messageId = outbox.enqueue({"alertTypeId": 1}, SINKS)
+        outbox.deadLetter([messageId], "Telegram")
+        outbox.deadLetter([messageId], "Mastodon")
+        outbox.close()
+
+        reopened = Outbox(outboxPath)
+        assert reopened.pending() == {}
+        assert reopened.connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 1
+        reopened.close()
+
+    def test_commits_are_batched(self, outboxPath):
+        """Test enqueues are grouped into few commits"""
+        outbox = Outbox(outboxPath, commitBatch=10, commitIntervalMs=60000)
+        for index in range(30):
+            outbox.enqueue(event(str(index)), SINKS)
+        assert not outbox.connection.in_transaction
+        outbox.enqueue(event("last"), SINKS)
+        assert outbox.connection.in_transaction
+        outbox.flush()
+        assert not outbox.connection.in_transaction
+        outbox.close()
+
+
+@pytest.mark.unit
+class TestOutboxRecorder:
+    """Tests for OutboxRecorder class"""
+
+    def test_tags_event_and_forwards(self, outboxPath):
+        """Test events are recorded and passed on with their outbox id"""
+        outbox = Outbox(outboxPath)
+        nextStage = MagicMock()
+        recorder = OutboxRecorder(outbox, nextStage, SINKS)
+
+        recorder.put(event("A"))
+
+        forwarded = nextStage.put.call_args[0][0]
+        assert forwarded["outboxIds"] == list(outbox.pending())
+        outbox.close()
+
+    def test_forwards_when_outbox_fails(self):
+        """Test an outbox error doesn't keep the event from being posted"""
+        outbox = MagicMock()
+        outbox.enqueue.side_effect = Exception("disk full")
+        nextStage = MagicMock()
+        recorder = OutboxRecorder(outbox, nextStage, SINKS)
+
+        recorder.put(event("A"))
+
+        nextStage.put.assert_called_once()
+
+    def test_coalescing_keeps_every_outbox_id(self, outboxPath):
+        """Test merged events carry the outbox ids of all their parts"""
+        outbox = Outbox(outboxPath)
+        postQueue = PostQueue(maxSize=10)
+        recorder = OutboxRecorder(outbox, AlertCoalescer(postQueue, windowMs=50), SINKS)
+
+        recorder.put(event("A"))
+        recorder.put(event("B"))
+
+        merged = postQueue.get(timeout=1)
+        assert sorted(merged["outboxIds"]) == sorted(outbox.pending())
+        assert len(merged["outboxIds"]) == 2
+        outbox.close()
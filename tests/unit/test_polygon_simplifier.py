@@ -0,0 +1,53 @@
+import math
+import pytest
+from polygon_simplifier import MIN_RING_POINTS, coarsestLevel, extent, farthestPoint, simplify
+
+# A closed ring: a 1x1 square with a nearly straight, noisy top edge
+RING = [(0.0, 0.0), (0.0, 1.0), (0.25, 1.01), (0.5, 0.99), (0.75, 1.005), (1.0, 1.0), (1.0, 0.0), (0.0, 0.0)]
+
+
+def distanceToSegment(point, start, end):
+    return farthestPoint([start, point, end], 0, 2)[1]
+
+
+@pytest.mark.unit
+class TestPolygonSimplifier:
+    """Tests for Douglas-Peucker polygon simplification"""
+
+    def test_zero_tolerance_keeps_every_point(self):
+        """Test tolerance 0 is the polygon as published"""
+        assert simplify(RING, 0) == RING
+
+    def test_drops_points_within_tolerance(self):
+        """Test the noise along an edge is dropped and the corners kept"""
+        assert simplify(RING, 0.05) == [(0.0, 0.0), (0.0, 1.0), (1.0, 1.0), (1.0, 0.0), (0.0, 0.0)]
+
+    def test_keeps_points_beyond_tolerance(self):
+        """Test points further off than the tolerance survive"""
+        assert (0.25, 1.01) in simplify(RING, 0.001)
+
+    def test_error_bounded_by_tolerance(self):
+        """Test no dropped point is further than the tolerance from the outline"""
+        ring = [(math.cos(i / 50 * 2 * math.pi), math.sin(i / 50 * 2 * math.pi)) for i in range(50)]
+        ring.append(ring[0])
+        for tolerance in (0.01, 0.05, 0.2):
+            simplified = simplify(ring, tolerance)
+            assert len(simplified) < len(ring)
+            for point in ring:
+                assert min(distanceToSegment(point, a, b) for a, b in zip(simplified, simplified[1:])) <= tolerance + 1e-12
+
+    def test_ring_never_collapses(self):
+        """Test a ring too small for the tolerance is kept as it is"""
+        assert simplify(RING, 10) == RING
+        assert len(simplify(RING, 0.5)) >= MIN_RING_POINTS
+
+    def test_extent(self):
+        """Test a polygon's size is its bounding box diagonal"""
+        assert extent(RING) == pytest.approx(math.hypot(1, 1.01))
+
+    def test_coarsestLevel(self):
+        """Test the coarsest tolerance within fidelity of the size is picked"""
+        tolerances = (0, 0.01, 0.02, 0.05)
+        assert coarsestLevel(RING, tolerances, 0.02) == 2
+        assert coarsestLevel(RING, tolerances, 0.001) == 0
+        assert coarsestLevel(RING, tolerances, 1) == 3
@@ -0,0 +1,67 @@
+import pytest
+from polygon_simplifier import SIMPLIFY_TOLERANCES, simplify
+from polygon_store import PolygonStore, buildPolygonStore
+
+POLYGONS = {
+    "171": [[31.3357, 34.3941], [31.3301, 34.3988], [31.3289, 34.3901]],
+    "4": [[29.5792, 34.9778], [29.572, 34.9777]],
+    "1932": [[32.0001, -34.5]],
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "polygons.bin"
+    buildPolygonStore(POLYGONS, str(path))
+    store = PolygonStore(str(path))
+    yield store
+    store.close()
+
+
+@pytest.mark.unit
+class TestPolygonStore:
+    """Tests for the memory-mapped binary polygon store"""
+
+    def test_round_trip(self, store):
+        """Test every polygon reads back with the coordinates it was built from"""
+        for cityId, polygon in POLYGONS.items():
+            assert store.get(cityId) == [tuple(point) for point in polygon]
+
+    def test_simplification_levels(self, tmp_path):
+        """Test each polygon is stored at every simplification level"""
+        ring = [[31.0 + 0.01 * (i % 2) * 0.001, 34.0 + 0.0001 * i] for i in range(100)] + [[31.01, 34.005], [31.0, 34.0]]
+        path = tmp_path / "polygons.bin"
+        buildPolygonStore({"5": ring}, str(path))
+        store = PolygonStore(str(path))
+
+        assert store.tolerances == SIMPLIFY_TOLERANCES
+        counts = [len(store.get(5, level=level)) for level in range(len(SIMPLIFY_TOLERANCES))]
+        assert counts[0] == len(ring)
+        assert counts == sorted(counts, reverse=True)
+        assert counts[-1] < counts[0]
+        for level, tolerance in enumerate(SIMPLIFY_TOLERANCES):
+            assert store.get(5, level=level) == [tuple(point) for point in simplify(ring, tolerance)]
+        store.close()
+
+    def test_int_and_str_ids(self, store):
+        """Test a taCityId can be given as an int or a string"""
+        assert store.get(171) == store.get("171")
+        assert 4 in store
+        assert "4" in store
+
+    def test_missing_polygon(self, store):
+        """Test an unknown or malformed taCityId returns the default"""
+        assert store.get("999") is None
+        assert store.get("not-an-id", []) == []
+        assert 999 not in store
+
+    def test_len(self, store):
+        """Test the store counts its polygons"""
+        assert len(store) == 3
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test a file that isn't a polygon store is refused"""
+        path = tmp_path / "polygons.bin"
+        path.write_bytes(b"{" * 64)
+        with pytest.raises(ValueError):
+            PolygonStore(str(path))
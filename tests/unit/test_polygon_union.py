@@ -0,0 +1,67 @@
+import pytest
+from polygon_union import signedArea, unionPolygons
+
+
+def square(lat, lon, size=1.0, clockwise=False):
+    ring = [(lat, lon), (lat, lon + size), (lat + size, lon + size), (lat + size, lon), (lat, lon)]
+    return ring[::-1] if clockwise else ring
+
+
+def area(ring):
+    return abs(signedArea(ring[:-1])) / 2
+
+
+@pytest.mark.unit
+class TestPolygonUnion:
+    """Tests for merging neighbouring polygons into one outline"""
+
+    def test_single_polygon(self):
+        """Test a polygon bordering no other is left as it is"""
+        assert unionPolygons([square(0, 0)]) == ([], [0])
+
+    def test_shared_border_is_dropped(self):
+        """Test two polygons sharing an edge become one ring around both"""
+        rings, separate = unionPolygons([square(0, 0), square(0, 1)])
+
+        assert separate == []
+        assert len(rings) == 1
+        assert area(rings[0]) == 2
+        assert len(rings[0]) == 7
+        assert rings[0][0] == rings[0][-1]
+
+    def test_orientation_does_not_matter(self):
+        """Test rings given clockwise are merged the same"""
+        rings, _ = unionPolygons([square(0, 0), square(0, 1, clockwise=True), square(1, 0)])
+
+        assert len(rings) == 1
+        assert area(rings[0]) == 3
+
+    def test_separate_patches(self):
+        """Test polygons that don't touch are merged apart, and one touching none is left alone"""
+        rings, separate = unionPolygons([square(0, 0), square(0, 1), square(5, 5), square(9, 9), square(9, 10)])
+
+        assert separate == [2]
+        assert sorted(area(ring) for ring in rings) == [2, 2]
+
+    def test_hole_is_refused(self):
+        """Test a ring of polygons around a gap can't be drawn as one filled shape"""
+        around = [square(lat, lon) for lat in range(3) for lon in range(3) if (lat, lon) != (1, 1)]
+
+        assert unionPolygons(around) is None
+        assert len(unionPolygons(around, holeTolerance=1)[0]) == 1
+
+    def test_slivers_are_ignored(self):
+        """Test a sliver left where borders don't quite meet isn't taken for a hole"""
+        # The squares share the top half of their border; along the bottom
+        # half the right one's edge has a notch 0.001 deep
+        left = [(0, 0), (0, 1), (0.5, 1), (1, 1), (1, 0), (0, 0)]
+        right = [(0, 1), (0, 2), (1, 2), (1, 1), (0.5, 1), (0.25, 1.001), (0, 1)]
+
+        rings, _ = unionPolygons([left, right])
+
+        assert len(rings) == 1
+        assert area(rings[0]) == pytest.approx(2, abs=0.001)
+
+    def test_ignores_degenerate_polygons(self):
+        """Test polygons too small to have an area are left out"""
+        assert unionPolygons([square(0, 0), [(3, 3), (3, 4)], square(0, 1)])[1] == []
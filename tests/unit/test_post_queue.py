@@ -0,0 +1,159 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from metrics import metrics
+from post_queue import PostQueue, PostingWorkers, OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE
+
+
+def event(name, alertTypeId=1):
+    return {"alertTypeId": alertTypeId, "alerts": [{"name": name, "timeStamp": "2023-12-04 16:59:09"}]}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.unit
+class TestPostQueue:
+    """Tests for PostQueue class"""
+
+    def test_fifo_order(self):
+        """Test events come out in the order they were queued"""
+        queue = PostQueue(maxSize=10, overflowPolicy=OVERFLOW_DROP_OLDEST)
+        queue.put(event("A"))
+        queue.put(event("B"))
+
+        assert queue.get()["alerts"][0]["name"] == "A"
+        assert queue.get()["alerts"][0]["name"] == "B"
+
+    def test_earliest_deadline_first(self):
+        """Test a fresher alert queued later still waits behind a more urgent one, and vice versa"""
+        queue = PostQueue(maxSize=10, overflowPolicy=OVERFLOW_DROP_OLDEST)
+        queue.put(dict(event("late"), deadline=200))
+        queue.put(dict(event("unknown"), deadline=None))
+        queue.put(dict(event("urgent"), deadline=100))
+
+        assert [queue.get()["alerts"][0]["name"] for _ in range(3)] == ["urgent", "late", "unknown"]
+
+    def test_put_stamps_deadline(self):
+        """Test queued events carry the deadline computed from their alerts"""
+        queue = PostQueue(maxSize=10)
+        eventData = event("A")
+        eventData["alerts"][0]["countdownSec"] = 15
+
+        queue.put(eventData)
+
+        assert queue.get()["deadline"] is not None
+
+    def test_coalesce_keeps_freshest_deadline(self):
+        """Test merged events are kept until their freshest alert expires"""
+        queue = PostQueue(maxSize=1, overflowPolicy=OVERFLOW_COALESCE)
+        queue.put(dict(event("A"), deadline=100))
+        queue.put(dict(event("B"), deadline=300))
+
+        assert queue.get()["deadline"] == 300
+
+    def test_drop_oldest(self):
+        """Test a full drop-oldest queue discards the oldest event"""
+        queue = PostQueue(maxSize=2, overflowPolicy=OVERFLOW_DROP_OLDEST)
+        for name in ("A", "B", "C"):
+            queue.put(event(name))
+
+        assert [queue.get()["alerts"][0]["name"] for _ in range(2)] == ["B", "C"]
+        assert metrics.counter("post_queue.dropped") == 1
+
+    def test_drop_oldest_keeps_most_urgent(self):
+        """Test a full queue drops a stale event first, else the first queued, never the fresh urgent one"""
+        now = time.time()
+        queue = PostQueue(maxSize=2, overflowPolicy=OVERFLOW_DROP_OLDEST)
+        queue.put(dict(event("90s alert"), deadline=now + 60))
+        queue.put(dict(event("15s alert"), deadline=now + 15))
+        queue.put(dict(event("Next"), deadline=now + 30))
+
+        assert [queue.get()["alerts"][0]["name"] for _ in range(2)] == ["15s alert", "Next"]
+
+        queue.put(dict(event("Stale"), deadline=now - 1))
+        queue.put(dict(event("Fresh"), deadline=now + 60))
+        queue.put(dict(event("Fresher"), deadline=now + 90))
+
+        assert [queue.get()["alerts"][0]["name"] for _ in range(2)] == ["Fresh", "Fresher"]
+
+    def test_coalesce_same_alert_type(self):
+        """Test a full coalescing queue merges alerts of the same type"""
+        queue = PostQueue(maxSize=2, overflowPolicy=OVERFLOW_COALESCE)
+        queue.put(event("A", alertTypeId=1))
+        queue.put(event("B", alertTypeId=2))
+        queue.put(event("C", alertTypeId=1))
+
+        first = queue.get()
+        assert [alert["name"] for alert in first["alerts"]] == ["A", "C"]
+        assert len(queue) == 1
+        assert metrics.counter("post_queue.coalesced") == 1
+
+    def test_coalesce_falls_back_to_drop_oldest(self):
+        """Test coalescing drops the oldest event when no type matches"""
+        queue = PostQueue(maxSize=1, overflowPolicy=OVERFLOW_COALESCE)
+        queue.put(event("A", alertTypeId=1))
+        queue.put(event("B", alertTypeId=2))
+
+        assert queue.get()["alerts"][0]["name"] == "B"
+        assert metrics.counter("post_queue.dropped") == 1
+
+    def test_block_waits_for_free_slot(self):
+        """Test a full blocking queue holds put() until a worker takes an event"""
+        queue = PostQueue(maxSize=1, overflowPolicy=OVERFLOW_BLOCK)
+        queue.put(event("A"))
+        done = threading.Event()
+        thread = threading.Thread(target=lambda: (queue.put(event("B")), done.set()))
+        thread.start()
+
+        assert not done.wait(0.1)
+        queue.get()
+        assert done.wait(1)
+        thread.join()
+        assert metrics.counter("post_queue.blocked") == 1
+
+    def test_unknown_policy(self):
+        """Test an unknown overflow policy is rejected"""
+        with pytest.raises(ValueError):
+            PostQueue(overflowPolicy="explode")
+
+    def test_depth_metrics(self):
+        """Test queue depth and high-water mark are exported"""
+        queue = PostQueue(maxSize=10)
+        queue.put(event("A"))
+        queue.put(event("B"))
+        queue.get()
+
+        assert metrics.gauge("post_queue.depth") == 1
+        assert metrics.gauge("post_queue.max_depth") == 2
+        assert metrics.counter("post_queue.enqueued") == 2
+
+    def test_get_returns_none_when_closed(self):
+        """Test get returns None once the queue is closed and empty"""
+        queue = PostQueue(maxSize=10)
+        queue.close()
+        assert queue.get() is None
+
+
+@pytest.mark.unit
+class TestPostingWorkers:
+    """Tests for PostingWorkers class"""
+
+    def test_workers_post_everything(self):
+        """Test workers post every queued event and survive failures"""
+        queue = PostQueue(maxSize=10)
+        postMessage = MagicMock(side_effect=[Exception("boom"), None, None])
+        workers = PostingWorkers(queue, postMessage, count=2).start()
+        for name in ("A", "B", "C"):
+            queue.put(event(name))
+
+        workers.stop(timeout=2)
+
+        assert postMessage.call_count == 3
+        assert metrics.counter("post_queue.posted") == 2
+        assert metrics.counter("post_queue.failed") == 1
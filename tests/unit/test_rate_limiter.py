@@ -0,0 +1,156 @@
+import pytest
+from rate_limiter import RateLimiter, Throttled, TokenBucket
+
+
+class FakeClock:
+    """Clock that only moves when the limiter sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RateLimited(Exception):
+    def __init__(self, retryAfter):
+        self.retryAfter = retryAfter
+
+
+def retryAfter(error):
+    return error.retryAfter if isinstance(error, RateLimited) else None
+
+
+@pytest.mark.unit
+class TestTokenBucket:
+    """Tests for TokenBucket class"""
+
+    def test_burst_then_refill_rate(self):
+        """Test a full bucket allows a burst, then one token per 1/rate seconds"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+        for _ in range(3):
+            assert bucket.delay() == 0
+            bucket.take()
+        assert bucket.delay() == pytest.approx(0.5)
+
+    def test_pause_blocks_until_hint(self):
+        """Test a back-off hint holds every token back until it expires"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=10, clock=clock)
+
+        bucket.pause(4)
+
+        assert bucket.delay() == pytest.approx(4)
+        clock.now = 4
+        assert bucket.delay() == 0
+
+    def test_sync_with_server_remaining(self):
+        """Test the server's remaining count caps the local tokens"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=300, clock=clock)
+
+        bucket.sync(remaining=2, resetIn=60)
+        bucket.take()
+        bucket.take()
+        assert bucket.delay() == pytest.approx(1)
+
+        bucket.sync(remaining=0, resetIn=60)
+        assert bucket.delay() == pytest.approx(60)
+        clock.now = 60
+        assert bucket.delay() == 0
+
+
+@pytest.mark.unit
+class TestRateLimiter:
+    """Tests for RateLimiter class"""
+
+    def test_acquire_respects_slowest_bucket(self):
+        """Test requests are spaced by the most restrictive bucket"""
+        clock = FakeClock()
+        chat = TokenBucket(rate=1, capacity=1, clock=clock)
+        shared = TokenBucket(rate=30, capacity=30, clock=clock)
+        limiter = RateLimiter("test", [chat, shared], sleep=clock.sleep)
+
+        for _ in range(5):
+            limiter.acquire()
+
+        assert clock.now == pytest.approx(4)
+
+    def test_run_retries_after_hint(self):
+        """Test a rate-limited send is retried after the hinted delay instead of dropped"""
+        clock = FakeClock()
+        limiter = RateLimiter("test", [TokenBucket(rate=10, clock=clock)], sleep=clock.sleep, maxWait=5)
+        responses = [RateLimited(3), "sent"]
+        sentAt = []
+
+        def send():
+            sentAt.append(clock.now)
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        assert limiter.run(send, retryAfter) == "sent"
+        assert sentAt[1] - sentAt[0] == pytest.approx(3)
+
+    def test_run_gives_up_after_max_retries(self):
+        """Test a send that keeps being rate limited eventually fails"""
+        clock = FakeClock()
+        limiter = RateLimiter("test", [TokenBucket(rate=10, clock=clock)], sleep=clock.sleep, maxRetries=2)
+
+        def send():
+            raise RateLimited(1)
+
+        with pytest.raises(RateLimited):
+            limiter.run(send, retryAfter)
+
+    def test_run_does_not_retry_other_errors(self):
+        """Test errors without a back-off hint are raised right away"""
+        clock = FakeClock()
+        limiter = RateLimiter("test", [TokenBucket(rate=10, clock=clock)], sleep=clock.sleep)
+        calls = []
+
+        def send():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            limiter.run(send, retryAfter)
+        assert len(calls) == 1
+
+    def test_acquire_raises_instead_of_long_wait(self):
+        """Test a wait longer than maxWait raises Throttled without sleeping or taking a token"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+        limiter = RateLimiter("test", [bucket], sleep=clock.sleep, maxWait=0.5)
+        limiter.acquire()
+
+        with pytest.raises(Throttled) as throttled:
+            limiter.acquire()
+
+        assert throttled.value.retryIn == pytest.approx(1)
+        assert clock.now == 0
+        clock.now = 1
+        assert limiter.acquire() == 0
+
+    def test_run_raises_throttled_on_long_hint(self):
+        """Test a back-off hint longer than maxWait is handed to the caller, not slept through"""
+        clock = FakeClock()
+        limiter = RateLimiter("test", [TokenBucket(rate=10, clock=clock)], sleep=clock.sleep, maxWait=1)
+        calls = []
+
+        def send():
+            calls.append(clock.now)
+            raise RateLimited(3600)
+
+        with pytest.raises(Throttled) as throttled:
+            limiter.run(send, retryAfter)
+
+        assert throttled.value.retryIn == pytest.approx(3600)
+        assert calls == [0]
+        assert clock.now == 0
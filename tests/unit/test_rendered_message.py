@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import Mock
+from message_splitter import utf16Length
+from rendered_message import RenderedMessage
+
+TEXT = "Rocket alert 2023-12-04 16:59:09:\n\nNirim (Gaza Envelope)\n"
+
+
+@pytest.mark.unit
+class TestRenderedMessage:
+    """Tests for the per-format render cache of a message"""
+
+    def test_is_the_plain_text(self):
+        """Test a RenderedMessage can be used wherever the text is expected"""
+        message = RenderedMessage(TEXT)
+        assert message == TEXT
+        assert isinstance(message, str)
+        assert "Nirim" in message
+
+    def test_header(self):
+        """Test the header is the alert type and timestamp line"""
+        assert RenderedMessage(TEXT).header == "Rocket alert 2023-12-04 16:59:09:"
+
+    def test_variant_rendered_once(self):
+        """Test each format is rendered once however often it's asked for"""
+        message = RenderedMessage(TEXT)
+        render = Mock(side_effect=lambda text: f"{text}footer")
+
+        first = message.variant("footer", render, 4096)
+        second = message.variant("footer", render, 4096)
+
+        assert first == [f"{TEXT}footer"]
+        assert second is first
+        render.assert_called_once_with(TEXT)
+
+    def test_variants_are_separate(self):
+        """Test different formats and limits get their own chunks"""
+        message = RenderedMessage(TEXT)
+
+        plain = message.variant("plain", lambda text: text, 4096)
+        upper = message.variant("upper", str.upper, 4096)
+        short = message.variant("plain", lambda text: text, 30)
+
+        assert plain == [TEXT]
+        assert upper == [TEXT.upper()]
+        assert len(short) > 1
+        assert all(len(chunk) <= 30 for chunk in short)
+
+    def test_variant_split_by_length_function(self):
+        """Test the split measures length the way the sink does"""
+        message = RenderedMessage("\n".join(["🚀" * 10] * 3))
+
+        chunks = message.variant("telegram", lambda text: text, 25, utf16Length)
+
+        assert len(chunks) == 3
+        assert all(utf16Length(chunk) <= 25 for chunk in chunks)
@@ -1,6 +1,7 @@
 import pytest
-from unittest.mock import Mock, patch
-from rocket_alert_api import RocketAlertAPI
+import requests
+from unittest.mock import Mock, MagicMock, patch
+from rocket_alert_api import RocketAlertAPI, ReplayBuffer
 
 
 @pytest.mark.unit
@@ -108,3 +109,81 @@ class TestRocketAlertAPI:
         assert call_kwargs["headers"]["X-Test-Header"] == "test-value"
         assert call_kwargs["timeout"] == (10, 120)
         assert call_kwargs["stream"] is True
+
+    @patch('rocket_alert_api.requests.get')
+    def test_streamEvents_decodes_data_lines(self, mock_get, mock_env_vars):
+        """Test streamEvents yields decoded JSON events split across chunks"""
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.iter_content.return_value = iter([
+            b'data:{"alertTypeId": 1, "alerts": ',
+            b'[{"name": "Nirim"}]}\n\n',
+        ])
+        mock_get.return_value = mock_response
+
+        api = RocketAlertAPI()
+        event = next(api.streamEvents())
+
+        assert event == {"alertTypeId": 1, "alerts": [{"name": "Nirim"}]}
+
+    @patch('rocket_alert_api.time.sleep')
+    @patch('rocket_alert_api.requests.get')
+    def test_streamEvents_reconnects_after_connection_error(self, mock_get, mock_sleep, mock_env_vars):
+        """Test streamEvents reconnects instead of raising on connection errors"""
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.iter_content.return_value = iter([b'data: {"alertTypeId": 2, "alerts": []}\n\n'])
+        mock_get.side_effect = [requests.exceptions.ConnectionError("down"), mock_response]
+
+        api = RocketAlertAPI()
+        event = next(api.streamEvents())
+
+        assert event["alertTypeId"] == 2
+        assert mock_get.call_count == 2
+        mock_sleep.assert_called_once_with(5)
+
+    def test_isKeepAlive(self, keep_alive_event, sample_event_data):
+        """Test isKeepAlive only matches KEEP_ALIVE events"""
+        assert RocketAlertAPI.isKeepAlive(keep_alive_event) is True
+        assert RocketAlertAPI.isKeepAlive(sample_event_data) is False
+
+    @patch('rocket_alert_api.requests.get')
+    def test_listenToServerEvents_sends_last_event_id(self, mock_get, mock_env_vars):
+        """Test listenToServerEvents resumes from the last delivered event id"""
+        api = RocketAlertAPI()
+        api.lastEventId = "42"
+        api.listenToServerEvents()
+
+        headers = mock_get.call_args[1]["headers"]
+        assert headers["Last-Event-ID"] == "42"
+        assert "Last-Event-ID" not in api.headers
+
+    def test_isNewEvent_skips_delivered_ids(self, mock_env_vars):
+        """Test isNewEvent drops ids already delivered but not inherited ids"""
+        from sse_parser import SSEEvent
+        api = RocketAlertAPI()
+
+        assert api.isNewEvent(SSEEvent("message", "a", "1"), "") is True
+        assert api.isNewEvent(SSEEvent("message", "b", "1"), "1") is True
+        assert api.isNewEvent(SSEEvent("message", "a", "1"), "") is False
+        assert api.isNewEvent(SSEEvent("message", "c", ""), "") is True
+
+
+@pytest.mark.unit
+class TestReplayBuffer:
+    """Tests for ReplayBuffer class"""
+
+    def test_remember_rejects_duplicates(self):
+        """Test remember returns False for a key it already holds"""
+        buffer = ReplayBuffer(size=3)
+        assert buffer.remember("1") is True
+        assert buffer.remember("1") is False
+
+    def test_evicts_oldest(self):
+        """Test the buffer stays bounded and forgets the oldest key"""
+        buffer = ReplayBuffer(size=2)
+        for key in ("1", "2", "3"):
+            buffer.remember(key)
+        assert len(buffer) == 2
+        assert "1" not in buffer
+        assert "3" in buffer
@@ -0,0 +1,112 @@
+import pytest
+from sse_parser import SSEParser, SSEEvent
+
+
+@pytest.mark.unit
+class TestSSEParser:
+    """Tests for SSEParser class"""
+
+    def test_single_event(self):
+        """Test a complete data frame yields one message event"""
+        parser = SSEParser()
+        events = parser.feed(b'data: {"alertTypeId": 1}\n\n')
+        assert events == [SSEEvent("message", '{"alertTypeId": 1}', "")]
+
+    def test_data_prefix_is_not_a_character_set(self):
+        """Test only the field name is removed, unlike str.lstrip('data:')"""
+        parser = SSEParser()
+        events = parser.feed(b"data:data\n\n")
+        assert events[0].data == "data"
+
+    def test_event_split_across_chunks(self):
+        """Test frames are reassembled across arbitrary chunk boundaries"""
+        parser = SSEParser()
+        payload = b'id: 7\ndata: {"a": 1}\n\n'
+        events = []
+        for i in range(len(payload)):
+            events += parser.feed(payload[i:i + 1])
+        assert events == [SSEEvent("message", '{"a": 1}', "7")]
+
+    def test_multiline_data(self):
+        """Test multiple data fields are joined with newlines"""
+        parser = SSEParser()
+        events = parser.feed(b'data: {"a":\ndata: 1}\n\n')
+        assert events[0].data == '{"a":\n1}'
+        assert events[0].json() == {"a": 1}
+
+    def test_event_id_and_type(self):
+        """Test id and event fields are attached to the dispatched event"""
+        parser = SSEParser()
+        events = parser.feed(b"event: alert\nid: 42\ndata: x\n\n")
+        assert events[0].event == "alert"
+        assert events[0].id == "42"
+        assert parser.lastEventId == "42"
+
+    def test_last_event_id_persists(self):
+        """Test an event without an id inherits the last seen id"""
+        parser = SSEParser()
+        events = parser.feed(b"id: 1\ndata: a\n\ndata: b\n\n")
+        assert [event.id for event in events] == ["1", "1"]
+
+    def test_id_with_null_is_ignored(self):
+        """Test ids containing NUL don't replace the last event id"""
+        parser = SSEParser()
+        parser.feed(b"id: 1\ndata: a\n\nid: 2\x003\ndata: b\n\n")
+        assert parser.lastEventId == "1"
+
+    def test_retry(self):
+        """Test retry sets the reconnection time only for integer values"""
+        parser = SSEParser()
+        parser.feed(b"retry: 3000\n\nretry: soon\n\n")
+        assert parser.retry == 3000
+
+    def test_comments_and_unknown_fields_ignored(self):
+        """Test comment lines and unknown fields don't produce events"""
+        parser = SSEParser()
+        events = parser.feed(b": keepalive\nfoo: bar\n\ndata: x\n\n")
+        assert [event.data for event in events] == ["x"]
+
+    def test_empty_frame_not_dispatched(self):
+        """Test a frame without data fields is not dispatched"""
+        parser = SSEParser()
+        assert parser.feed(b"event: ping\n\n") == []
+
+    @pytest.mark.parametrize("newline", [b"\r\n", b"\r", b"\n"])
+    def test_line_endings(self, newline):
+        """Test CRLF, CR and LF line endings are all accepted"""
+        parser = SSEParser()
+        events = parser.feed(b"data: a" + newline + newline + b"data: b" + newline + newline)
+        assert [event.data for event in events] == ["a", "b"]
+
+    def test_crlf_split_between_chunks(self):
+        """Test a CRLF split across two chunks ends only one line"""
+        parser = SSEParser()
+        events = parser.feed(b"data: a\r")
+        events += parser.feed(b"\ndata: b\r\n\r\n")
+        assert [event.data for event in events] == ["a\nb"]
+
+    def test_leading_bom_is_stripped(self):
+        """Test a UTF-8 BOM at the start of the stream is dropped"""
+        parser = SSEParser()
+        events = parser.feed(b"\xef\xbb")
+        events += parser.feed(b"\xbfdata: a\n\n")
+        assert events[0].data == "a"
+
+    def test_field_without_colon(self):
+        """Test a field name on its own has an empty value"""
+        parser = SSEParser()
+        events = parser.feed(b"data\n\n")
+        assert events[0].data == ""
+
+    def test_hebrew_payload(self):
+        """Test UTF-8 payloads are decoded once complete"""
+        parser = SSEParser()
+        payload = 'data: {"name": "נירים"}\n\n'.encode("utf-8")
+        events = parser.feed(payload[:12]) + parser.feed(payload[12:])
+        assert events[0].json() == {"name": "נירים"}
+
+    def test_buffer_is_trimmed(self):
+        """Test consumed bytes are removed from the reusable buffer"""
+        parser = SSEParser()
+        parser.feed(b"data: a\n\ndata: partial")
+        assert bytes(parser.buffer) == b"data: partial"
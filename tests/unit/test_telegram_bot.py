@@ -1,5 +1,7 @@
+import time
 import pytest
 from unittest.mock import Mock, patch, MagicMock
+from rendered_message import RenderedMessage
 from telegram_bot import TelegramBot
 
 
@@ -130,6 +132,21 @@ class TestTelegramBot:
             for msg in result:
                 assert len(msg) <= 4096
 
+    def test_truncateToMaxMessageSize_counts_utf16(self, mock_env_vars):
+        """Test chunks stay within 4096 UTF-16 code units, not Python characters"""
+        with patch('telegram_bot.TeleBot') as mock_bot_class:
+            mock_bot = MagicMock()
+            mock_bot.get_me.return_value = MagicMock(username='TestBot')
+            mock_bot_class.return_value = mock_bot
+
+            bot = TelegramBot()
+            message = "🚀 שדרות\n" * 1000
+
+            result = bot.truncateToMaxMessageSize(message)
+
+            for msg in result:
+                assert len(msg.encode("utf-16-le")) // 2 <= 4096
+
     @patch('telegram_bot.TeleBot')
     def test_sendMessage_handles_list(self, mock_bot_class, mock_env_vars):
         """Test sendMessage handles pre-truncated message list"""
@@ -176,9 +193,10 @@ class TestTelegramBot:
 
         # Should not raise exception
         try:
-            bot.sendMessage("Test message")
+            delivered = bot.sendMessage("Test message")
         except Exception:
             pytest.fail("sendMessage should catch exceptions")
+        assert delivered is False
 
     def test_truncateToMaxMessageSize_empty_lines(self, mock_env_vars):
         """Test truncateToMaxMessageSize handles empty lines correctly"""
@@ -194,4 +212,200 @@ class TestTelegramBot:
 
             assert isinstance(result, list)
             # Should preserve structure
-            assert "\n\n" in result[0] or len(result) > 1
\ No newline at end of file
+            assert "\n\n" in result[0] or len(result) > 1
+    @patch('telegram_bot.TeleBot')
+    def test_sendMessage_retries_after_429(self, mock_bot_class, mock_env_vars):
+        """Test a 429 is retried after retry_after instead of losing the message"""
+        from telebot.apihelper import ApiTelegramException
+        mock_bot = MagicMock()
+        mock_bot.get_me.return_value = MagicMock(username='TestBot')
+        tooManyRequests = ApiTelegramException("sendMessage", None, {
+            "ok": False,
+            "error_code": 429,
+            "description": "Too Many Requests: retry after 1",
+            "parameters": {"retry_after": 1}
+        })
+        mock_bot.send_message = Mock(side_effect=[tooManyRequests, MagicMock()])
+        mock_bot_class.return_value = mock_bot
+
+        bot = TelegramBot()
+        start = time.monotonic()
+
+        assert bot.sendMessage("Test message") is True
+        assert mock_bot.send_message.call_count == 2
+        assert 1 <= time.monotonic() - start < 2
+
+    @patch('telegram_bot.TELEGRAM_EDIT_WINDOWS', 0)
+    @patch('telegram_bot.splitMessage')
+    @patch('rendered_message.splitMessage')
+    @patch('telegram_bot.TeleBot')
+    def test_sendMessage_reuses_rendered_chunks(self, mock_bot_class, mock_split, mock_bot_split, mock_env_vars):
+        """Test a RenderedMessage posted again after a failure is not split again and resumes where it stopped"""
+        mock_bot = MagicMock()
+        mock_bot.get_me.return_value = MagicMock(username='TestBot')
+        mock_bot.send_message.side_effect = [MagicMock(message_id=1), Exception("Bad Gateway"), MagicMock(message_id=2)]
+        mock_bot_class.return_value = mock_bot
+        mock_split.return_value = ["part 1\n", "part 2\n"]
+
+        bot = TelegramBot()
+        message = RenderedMessage("A" * 5000)
+        assert bot.sendMessage(message) is False
+        assert bot.sendMessage(message) is True
+        # Fully posted: nothing left to send
+        assert bot.sendMessage(message) is True
+
+        mock_split.assert_called_once()
+        mock_bot_split.assert_not_called()
+        assert [c.kwargs["text"] for c in mock_bot.send_message.call_args_list] == ["part 1\n", "part 2\n", "part 2\n"]
+
+    @patch('telegram_bot.TeleBot')
+    def test_sendMessage_throttled_resumes_at_next_chunk(self, mock_bot_class, mock_env_vars):
+        """Test a long rate-limit wait raises Throttled, and the next try posts only the chunks left"""
+        from rate_limiter import RateLimiter, Throttled, TokenBucket
+        mock_bot = MagicMock()
+        mock_bot.get_me.return_value = MagicMock(username='TestBot')
+        mock_bot.send_message.return_value = MagicMock(message_id=1)
+        mock_bot_class.return_value = mock_bot
+
+        bot = TelegramBot()
+        bucket = TokenBucket(rate=1, capacity=1)
+        bot.rateLimiters[bot.channel] = RateLimiter("telegram", [bucket], maxWait=0)
+        message = RenderedMessage(alertText("2023-12-04 16:59:09", *[f"Location number {index}" for index in range(300)]))
+
+        with pytest.raises(Throttled):
+            bot.sendMessage(message)
+        assert mock_bot.send_message.call_count == 1
+
+        bucket.tokens = 1
+        assert bot.sendMessage(message) is True
+        chunks = message.variant("telegram", None, 4096)
+        assert [c.kwargs["text"] for c in mock_bot.send_message.call_args_list] == chunks
+
+    @patch('telegram_bot.TELEGRAM_EDIT_WINDOWS', 0)
+    @patch('telegram_bot.TeleBot')
+    def test_sendMessage_posts_map_after_text(self, mock_bot_class, mock_env_vars):
+        """Test a map image is posted as a photo after the text, and not again once the message resumes"""
+        mock_bot = MagicMock()
+        mock_bot.get_me.return_value = MagicMock(username='TestBot')
+        mock_bot.send_message.return_value = MagicMock(message_id=1)
+        mock_bot.send_photo.side_effect = [Exception("Bad Gateway")]
+        mock_bot_class.return_value = mock_bot
+        manager = MagicMock()
+        manager.attach_mock(mock_bot.send_message, "send_message")
+        manager.attach_mock(mock_bot.send_photo, "send_photo")
+
+        bot = TelegramBot()
+        message = RenderedMessage(alertText("2023-12-04 16:59:09", "Nirim"))
+
+        # A map Telegram won't take is left out, the text still counts as posted
+        assert bot.sendMessage(message, b"png") is True
+        assert [name for name, _, _ in manager.mock_calls] == ["send_message", "send_photo"]
+        assert mock_bot.send_photo.call_args.kwargs == {"chat_id": "@RocketAlert", "photo": b"png"}
+
+        assert bot.sendMessage(message, b"png") is True
+        assert mock_bot.send_photo.call_count == 1
+
+
+def alertText(timestamp, *locations):
+    return f"Rocket alert {timestamp}:\n\n" + "".join(f"{location}\n" for location in locations) + "\n"
+
+
+@pytest.mark.unit
+class TestTelegramBotEditInPlace:
+    """Tests for appending locations to an alert window's message"""
+
+    @pytest.fixture
+    def bot(self, mock_env_vars):
+        with patch('telegram_bot.TeleBot') as mock_bot_class:
+            mock_bot = MagicMock()
+            mock_bot.get_me.return_value = MagicMock(username='TestBot')
+            mock_bot.send_message.return_value = MagicMock(message_id=42)
+            mock_bot_class.return_value = mock_bot
+            yield TelegramBot()
+
+    def test_same_window_edits_message(self, bot):
+        """Test a second event with the same timestamp edits the first message"""
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim"))
+        assert bot.sendMessage(alertText("2023-12-04 16:59:09", "Ein HaShlosha")) is True
+
+        bot.bot.send_message.assert_called_once()
+        edit = bot.bot.edit_message_text.call_args
+        assert edit.kwargs["message_id"] == 42
+        assert edit.args[0] == alertText("2023-12-04 16:59:09", "Nirim", "Ein HaShlosha") + "[RocketAlert.live](https://RocketAlert.live)"
+
+    def test_new_window_posts_message(self, bot):
+        """Test a different timestamp gets its own message"""
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim"))
+        bot.sendMessage(alertText("2023-12-04 17:05:00", "Nirim"))
+
+        assert bot.bot.send_message.call_count == 2
+        bot.bot.edit_message_text.assert_not_called()
+
+    def test_repeated_locations_not_edited(self, bot):
+        """Test an event listing nothing new makes no API call"""
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim"))
+        assert bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim")) is True
+
+        bot.bot.send_message.assert_called_once()
+        bot.bot.edit_message_text.assert_not_called()
+
+    def test_full_message_starts_new_one(self, bot):
+        """Test locations that would push the message past 4096 go into a new message"""
+        bot.sendMessage(alertText("2023-12-04 16:59:09", *[f"Location {index}" for index in range(300)]))
+        bot.sendMessage(alertText("2023-12-04 16:59:09", *[f"Place {index}" for index in range(100)]))
+
+        assert bot.bot.send_message.call_count == 2
+        bot.bot.edit_message_text.assert_not_called()
+
+    def test_failed_edit_falls_back_to_new_message(self, bot):
+        """Test a message that can't be edited doesn't lose the new locations"""
+        bot.bot.edit_message_text.side_effect = Exception("message to edit not found")
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim"))
+        assert bot.sendMessage(alertText("2023-12-04 16:59:09", "Ein HaShlosha")) is True
+
+        assert bot.bot.send_message.call_count == 2
+
+    def test_barrage_uses_one_message(self, bot):
+        """Test a barrage delivered as many events costs one post and edits"""
+        for index in range(20):
+            bot.sendMessage(alertText("2023-12-04 16:59:09", f"Location {index}"))
+
+        assert bot.bot.send_message.call_count == 1
+        assert bot.bot.edit_message_text.call_count == 19
+        lastText = bot.bot.edit_message_text.call_args.args[0]
+        assert all(f"Location {index}\n" in lastText for index in range(20))
+
+    def test_replayed_split_event_makes_no_api_call(self, bot):
+        """Test an event posted over several messages is recognised in full when it comes again"""
+        locations = [f"Location number {index} (Confrontation Line)" for index in range(200)]
+        bot.sendMessage(alertText("2023-12-04 16:59:09", *locations))
+        posts = bot.bot.send_message.call_count
+        assert posts > 1
+
+        assert bot.sendMessage(alertText("2023-12-04 16:59:09", *locations)) is True
+
+        assert bot.bot.send_message.call_count == posts
+        bot.bot.edit_message_text.assert_not_called()
+
+    def test_new_message_lists_only_new_locations(self, bot):
+        """Test locations already in the window aren't repeated when a new message is needed"""
+        bot.bot.edit_message_text.side_effect = Exception("message to edit not found")
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim"))
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim", "Ein HaShlosha"))
+
+        text = bot.bot.send_message.call_args.kwargs["text"]
+        assert "Ein HaShlosha" in text
+        assert "Nirim" not in text
+
+    def test_late_summary_kept_out_of_window(self, bot, message_builder):
+        """Test a late summary with the window's header neither joins nor replaces it"""
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Nirim"))
+        summary = message_builder.buildLateSummary(1, "2023-12-04 16:59:09", 12)["text"]
+        bot.bot.send_message.return_value = MagicMock(message_id=43)
+        assert bot.sendMessage(summary) is True
+        bot.sendMessage(alertText("2023-12-04 16:59:09", "Ein HaShlosha"))
+
+        assert bot.bot.send_message.call_count == 2
+        edit = bot.bot.edit_message_text.call_args
+        assert edit.kwargs["message_id"] == 42
+        assert "delayed" not in edit.args[0]
@@ -0,0 +1,99 @@
+import threading
+import pytest
+from itertools import islice
+from unittest.mock import patch
+from upstream_racer import UpstreamRacer, alertContentKey, createUpstream
+from rocket_alert_api import RocketAlertAPI
+
+
+class FakeUpstream:
+    """Upstream that yields its events once released"""
+
+    def __init__(self, baseURL, events, release=None):
+        self.baseURL = baseURL
+        self.events = events
+        self.release = release
+
+    def streamEvents(self):
+        if self.release is not None:
+            self.release.wait(5)
+        for event in self.events:
+            yield event
+        # Stay connected like a real stream
+        threading.Event().wait()
+
+
+def event(city, timestamp="2023-12-04 16:59:09", alertTypeId=1):
+    return {"alertTypeId": alertTypeId, "alerts": [{"name": city, "taCityId": None, "timeStamp": timestamp}]}
+
+
+@pytest.mark.unit
+class TestUpstreamRacer:
+    """Tests for UpstreamRacer class"""
+
+    def test_duplicate_events_posted_once(self):
+        """Test the same event from two upstreams is yielded once"""
+        racer = UpstreamRacer([
+            FakeUpstream("a", [event("Nirim"), event("Sderot")]),
+            FakeUpstream("b", [event("Nirim"), event("Sderot")]),
+        ])
+
+        received = list(islice(racer.streamEvents(), 2))
+
+        assert [e["alerts"][0]["name"] for e in received] == ["Nirim", "Sderot"]
+        assert sum(racer.wins) == 2
+
+    def test_stalled_upstream_does_not_delay_events(self):
+        """Test a stalled connection doesn't hold back the healthy one"""
+        stalled = threading.Event()
+        racer = UpstreamRacer([
+            FakeUpstream("stalled", [event("Nirim")], release=stalled),
+            FakeUpstream("healthy", [event("Nirim")]),
+        ])
+
+        received = next(racer.streamEvents())
+        stalled.set()
+
+        assert received["alerts"][0]["name"] == "Nirim"
+        assert racer.wins == [0, 1]
+
+    def test_keep_alive_not_deduplicated(self, keep_alive_event):
+        """Test keep-alives from every connection are passed through"""
+        racer = UpstreamRacer([
+            FakeUpstream("a", [keep_alive_event]),
+            FakeUpstream("b", [keep_alive_event]),
+        ])
+
+        received = list(islice(racer.streamEvents(), 2))
+
+        assert all(RocketAlertAPI.isKeepAlive(e) for e in received)
+
+    def test_alertContentKey_ignores_alert_order(self):
+        """Test the content key is the same regardless of alert order"""
+        first = {"alertTypeId": 1, "alerts": [
+            {"taCityId": 1, "timeStamp": "t"}, {"taCityId": 2, "timeStamp": "t"}]}
+        second = {"alertTypeId": 1, "alerts": [
+            {"taCityId": 2, "timeStamp": "t"}, {"taCityId": 1, "timeStamp": "t"}]}
+        assert alertContentKey(first) == alertContentKey(second)
+
+    def test_alertContentKey_distinguishes_type_and_time(self):
+        """Test different alert types or timestamps aren't merged"""
+        assert alertContentKey(event("Nirim", alertTypeId=1)) != alertContentKey(event("Nirim", alertTypeId=2))
+        assert alertContentKey(event("Nirim", "t1")) != alertContentKey(event("Nirim", "t2"))
+
+    def test_createUpstream_single(self, mock_env_vars):
+        """Test a single connection without mirrors returns a plain API client"""
+        with patch('upstream_racer.MIRROR_URLS', ""), patch('upstream_racer.CONNECTIONS_PER_URL', 1):
+            upstream = createUpstream()
+        assert isinstance(upstream, RocketAlertAPI)
+
+    def test_createUpstream_mirrors(self, mock_env_vars):
+        """Test mirrors and extra connections produce a racer over all of them"""
+        with patch('upstream_racer.MIRROR_URLS', "https://mirror.example.com"), \
+             patch('upstream_racer.CONNECTIONS_PER_URL', 2):
+            upstream = createUpstream()
+        assert isinstance(upstream, UpstreamRacer)
+        assert [api.baseURL for api in upstream.upstreams] == [
+            "https://test-api.example.com", "https://test-api.example.com",
+            "https://mirror.example.com", "https://mirror.example.com",
+        ]
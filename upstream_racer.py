@@ -0,0 +1,80 @@
+import os
+import queue
+import threading
+from datetime import datetime
+from rocket_alert_api import RocketAlertAPI, ReplayBuffer
+
+# Extra base URLs serving the same real-time stream, comma separated
+MIRROR_URLS = os.environ.get("RA_MIRROR_URLS", "")
+# Independent connections opened to every base URL
+CONNECTIONS_PER_URL = int(os.environ.get("RA_UPSTREAM_CONNECTIONS", 1))
+# Number of recently posted events remembered for deduplication
+DEDUPE_WINDOW = int(os.environ.get("RA_DEDUPE_WINDOW", 1024))
+
+# Returns a key identifying an event by what it alerts about, so the same
+# event delivered by two upstreams maps to the same key
+def alertContentKey(eventData):
+    alerts = eventData.get("alerts") or []
+    if not isinstance(alerts, list):
+        alerts = [alerts]
+    locations = sorted(
+        (str(alert.get("taCityId") or alert.get("name")), str(alert.get("timeStamp")))
+        for alert in alerts
+    )
+    return (eventData.get("alertTypeId"), tuple(locations))
+
+# Reads the same stream over several upstream connections at once and
+# merges them: whichever connection delivers an event first wins, later
+# copies are dropped. A stalled or half-open connection then only delays
+# its own copy instead of every alert.
+class UpstreamRacer:
+    isKeepAlive = staticmethod(RocketAlertAPI.isKeepAlive)
+
+    def __init__(self, upstreams, dedupeWindow=DEDUPE_WINDOW):
+        self.upstreams = upstreams
+        self.events = queue.Queue()
+        self.postedEvents = ReplayBuffer(dedupeWindow)
+        self.wins = [0] * len(upstreams)
+        self.threads = []
+
+    def start(self):
+        for index, upstream in enumerate(self.upstreams):
+            thread = threading.Thread(
+                target=self.readUpstream,
+                args=(index, upstream),
+                name=f"upstream-{index}",
+                daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def readUpstream(self, index, upstream):
+        for eventData in upstream.streamEvents():
+            self.events.put((index, eventData))
+
+    # Yields the merged, deduplicated stream
+    def streamEvents(self):
+        if not self.threads:
+            self.start()
+        while True:
+            index, eventData = self.events.get()
+            if eventData is None or self.isKeepAlive(eventData):
+                # Every connection's keepalive counts as proof of life
+                yield eventData
+                continue
+            if not self.postedEvents.remember(alertContentKey(eventData)):
+                print(f"{datetime.now()} - Dropping duplicate event from upstream {index}")
+                continue
+            self.wins[index] += 1
+            print(f"{datetime.now()} - Upstream {index} ({self.upstreams[index].baseURL}) delivered first, wins so far: {self.wins}")
+            yield eventData
+
+# Returns the event source main() listens to: a single RocketAlertAPI, or an
+# UpstreamRacer when mirrors or several connections are configured
+def createUpstream():
+    baseURLs = [os.environ["RA_BASEURL"]] + [url for url in MIRROR_URLS.split(",") if url.strip()]
+    upstreams = [RocketAlertAPI(url) for url in baseURLs for _ in range(max(CONNECTIONS_PER_URL, 1))]
+    if len(upstreams) == 1:
+        return upstreams[0]
+    print(f"DEBUG: Racing {len(upstreams)} upstream connections", flush=True)
+    return UpstreamRacer(upstreams)